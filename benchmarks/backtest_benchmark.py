@@ -0,0 +1,71 @@
+"""
+Compare the walk-forward backtest with refitting a model every day, and with one batched fit.
+
+Run from the repository root:
+
+    python -m benchmarks.backtest_benchmark --coins 300 --days 730
+"""
+import argparse
+import time
+import numpy as np
+from tabulate import tabulate
+
+from benchmarks.task4_reference import synthetic_coin_data
+from src.FeatureEngineering.time_series_features import create_time_series_features
+from src.Forecasting.backtest import walk_forward_backtest
+from src.Forecasting.regression import feature_columns, train_and_predict
+
+
+def daily_refit_time(features, coins, min_train):
+    """
+    Time a walk-forward backtest of some coins that refits a least-squares model every day.
+
+    :return: Wall time in seconds
+    """
+    feature_cols = feature_columns(features)
+    start = time.perf_counter()
+    for coin in coins:
+        rows = features[features['coin'] == coin].dropna(subset=feature_cols + ['target_price'])
+        X = np.c_[rows[feature_cols].to_numpy(dtype=np.float64), np.ones(len(rows))]
+        y = rows['target_price'].to_numpy(dtype=np.float64)
+        for day in range(min_train, len(rows)):
+            weights = np.linalg.lstsq(X[:day], y[:day], rcond=None)[0]
+            X[day] @ weights
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the walk-forward backtest")
+    parser.add_argument("--coins", type=int, default=300, help="Number of coins")
+    parser.add_argument("--days", type=int, default=730, help="Number of days per coin")
+    parser.add_argument("--window", type=int, default=180, help="Rows of the sliding window run")
+    parser.add_argument("--refit-coins", type=int, default=3,
+                        help="Coins backtested by daily refits, extrapolated to every coin")
+    args = parser.parse_args()
+
+    features = create_time_series_features(synthetic_coin_data(coins=args.coins, days=args.days), scale=False)
+    coins = features['coin'].unique()
+
+    rows = []
+    start = time.perf_counter()
+    train_and_predict(features)
+    fit_time = time.perf_counter() - start
+    rows.append(["one batched fit (train_and_predict)", f"{fit_time:.3f}", "1.0x"])
+
+    for name, window in [("walk-forward, expanding window", None),
+                         (f"walk-forward, {args.window}-row sliding window", args.window)]:
+        start = time.perf_counter()
+        walk_forward_backtest(features, window=window)
+        backtest_time = time.perf_counter() - start
+        rows.append([name, f"{backtest_time:.3f}", f"{backtest_time / fit_time:.1f}x"])
+
+    refit_time = daily_refit_time(features, coins[:args.refit_coins], 60) * len(coins) / args.refit_coins
+    rows.append([f"daily refits (extrapolated from {args.refit_coins} coins)", f"{refit_time:.3f}",
+                 f"{refit_time / fit_time:.1f}x"])
+
+    print(f"{len(features)} rows, {len(coins)} coins")
+    print(tabulate(rows, headers=["Run", "Time (s)", "Cost in fits"], tablefmt='pretty'))
+
+
+if __name__ == "__main__":
+    main()
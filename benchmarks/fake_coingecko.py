@@ -0,0 +1,265 @@
+"""
+A local stand-in for the CoinGecko API, to benchmark the ingestion pipeline without the network.
+
+It answers /api/v3/ping and /api/v3/coins/{id}/history like the real API, with deterministic prices,
+padded to a configurable payload size, after a configurable latency, and answers a share of the
+requests with 429 to exercise the client's backoff.
+
+Run it on its own to point the app at it:
+
+    python -m benchmarks.fake_coingecko --port 8765 --latency 0.05 --rate-limit-fraction 0.01
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_PREFIX = '/api/v3'
+
+
+def coin_price(coin_id, date):
+    """
+    Deterministic price of a coin on a day, so every run stores the same values.
+
+    :param coin_id: Coin identifier
+    :param date: Date in DD-MM-YYYY format, as /history takes it
+    :return: Price in USD
+    """
+    base = 1 + zlib.crc32(coin_id.encode()) % 50000
+    day = datetime.strptime(date, '%d-%m-%Y').toordinal()
+    # Within 5% of the coin's base price
+    return round(base * (0.95 + (zlib.crc32(f'{coin_id}:{day}'.encode()) % 1001) / 10000), 6)
+
+
+def seed_count(coin_id):
+    """Deterministic counter of a coin, for the community and developer fields"""
+    return zlib.crc32(coin_id.encode()) % 1000000
+
+
+def history_payload(coin_id, date, padding=''):
+    """
+    Build a /history payload shaped like the real one.
+
+    :param coin_id: Coin identifier
+    :param date: Date in DD-MM-YYYY format
+    :param padding: Filler stored under localization, to bring the payload to the wanted size
+    :return: Dict
+    """
+    price = coin_price(coin_id, date)
+    return {
+        'id': coin_id,
+        'symbol': coin_id[:4],
+        'name': coin_id.capitalize(),
+        'localization': {'en': coin_id.capitalize(), 'filler': padding},
+        'image': {'thumb': f'https://example.com/{coin_id}/thumb.png'},
+        'market_data': {
+            'current_price': {'usd': price, 'eur': price * 0.92},
+            'market_cap': {'usd': price * 1e7, 'eur': price * 0.92e7},
+            'total_volume': {'usd': price * 1e5, 'eur': price * 0.92e5}
+        },
+        'community_data': {'twitter_followers': seed_count(coin_id)},
+        'developer_data': {'forks': seed_count(coin_id) % 1000},
+        'public_interest_stats': {'alexa_rank': None, 'bing_matches': None}
+    }
+
+
+class FakeCoinGecko:
+    """
+    Threaded HTTP server imitating the CoinGecko endpoints the retriever uses.
+
+    Connections are kept alive (HTTP/1.1) and bodies are gzipped when the client accepts it,
+    as with the real API, so the client's connection pool and decompression are exercised too.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, payload_bytes=2000,
+                 rate_limit_fraction=0.0, retry_after=0.0, compress=True, seed=0):
+        """
+        Initialize the server, without starting it.
+
+        :param host: Interface to listen on
+        :param port: Port to listen on (0 for a free one)
+        :param latency: Seconds every response is delayed by
+        :param jitter: Maximum random extra delay in seconds, drawn uniformly
+        :param payload_bytes: Approximate size of a /history body before compression
+        :param rate_limit_fraction: Share of the requests answered with 429
+        :param retry_after: Retry-After header of the 429 responses, in seconds (None to omit it)
+        :param compress: Gzip the bodies of clients sending Accept-Encoding: gzip
+        :param seed: Seed of the latency jitter and of the 429 draws
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_fraction = rate_limit_fraction
+        self.retry_after = retry_after
+        self.compress = compress
+        self.random = random.Random(seed)
+        base_size = len(json.dumps(history_payload('bitcoin', '01-01-2024')))
+        # Hex digits compress about as well as the real payloads, unlike a repeated character
+        self.padding = random.Random(seed).randbytes(max(payload_bytes - base_size, 0) // 2).hex()
+
+        self.lock = threading.Lock()
+        self.reset_stats()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        """Base URL to use as CoinGekoRetriever.BASE_URL"""
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}{API_PREFIX}'
+
+    def reset_stats(self):
+        """
+        Reset the request counters.
+        """
+        with self.lock:
+            self.requests = 0
+            self.rate_limited = 0
+            self.bytes_sent = 0
+
+    def get_stats(self):
+        """
+        Return server statistics.
+
+        :return: Dict with the number of requests, 429 responses and body bytes sent
+        """
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'rate_limited': self.rate_limited,
+                'bytes_sent': self.bytes_sent
+            }
+
+    def start(self):
+        """
+        Serve requests from a background thread.
+
+        :return: The server itself
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving and close the listening socket.
+        """
+        if self.thread is not None:
+            self.server.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _draw(self):
+        """
+        Draw the delay of a response and whether it is rate limited.
+
+        :return: Tuple (delay in seconds, rate limited)
+        """
+        with self.lock:
+            self.requests += 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            limited = self.rate_limit_fraction > 0 and self.random.random() < self.rate_limit_fraction
+            if limited:
+                self.rate_limited += 1
+            return delay, limited
+
+    def _respond(self, handler):
+        """
+        Answer one GET request.
+
+        :param handler: BaseHTTPRequestHandler of the request
+        """
+        url = urlparse(handler.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        delay, limited = self._draw()
+        if delay > 0:
+            time.sleep(delay)
+
+        path = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else None
+        parts = path.strip('/').split('/') if path else []
+        headers = {}
+        if limited:
+            status, body = 429, {'status': {'error_code': 429, 'error_message': "You've exceeded the Rate Limit"}}
+            if self.retry_after is not None:
+                headers['Retry-After'] = f'{self.retry_after:g}'
+        elif 'x_cg_demo_api_key' not in params:
+            status, body = 401, {'status': {'error_code': 10002, 'error_message': 'API key missing'}}
+        elif parts == ['ping']:
+            status, body = 200, {'gecko_says': '(V3) To the Moon!'}
+        elif len(parts) == 3 and parts[0] == 'coins' and parts[2] == 'history':
+            try:
+                status, body = 200, history_payload(parts[1], params['date'], self.padding)
+            except (KeyError, ValueError):
+                status, body = 400, {'error': 'invalid date'}
+        else:
+            status, body = 404, {'error': 'Not found'}
+
+        data = json.dumps(body).encode()
+        if self.compress and 'gzip' in handler.headers.get('Accept-Encoding', ''):
+            data = gzip.compress(data, compresslevel=1)
+            headers['Content-Encoding'] = 'gzip'
+
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+        with self.lock:
+            self.bytes_sent += len(data)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately, Nagle would hold the body for a delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server._respond(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the CoinGecko API")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds every response is delayed by")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum random extra delay in seconds")
+    parser.add_argument("--payload-bytes", type=int, default=2000, help="Approximate size of a /history body")
+    parser.add_argument("--rate-limit-fraction", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Retry-After of the 429 responses, in seconds")
+    args = parser.parse_args()
+
+    server = FakeCoinGecko(args.host, args.port, args.latency, args.jitter, args.payload_bytes,
+                           args.rate_limit_fraction, args.retry_after)
+    print(f"Serving the CoinGecko stand-in at {server.url}, press Ctrl+C to stop")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare the feature engineering library with the Task 4 notebook functions it replaces.
+
+Run from the repository root:
+
+    python -m benchmarks.features_benchmark --coins 100 --days 730
+"""
+import argparse
+import time
+import pandas as pd
+from tabulate import tabulate
+
+from benchmarks.task4_reference import load_notebook_functions, synthetic_coin_data, compare_with_notebook
+from src.FeatureEngineering import time_series_features
+from src.FeatureEngineering.risk_levels import classify_risk_levels
+
+
+def notebook_risk_levels(coin_data):
+    """
+    Risk levels per coin and month as computed inside the notebook's add_features.
+    """
+    calculate_risk_level, = load_notebook_functions('calculate_risk_level')
+    coin_data['date'] = pd.to_datetime(coin_data['date'])
+    coin_data = coin_data.sort_values(['coin', 'date'])
+    coin_data['year_month'] = coin_data['date'].dt.to_period('M')
+    risk_levels = coin_data.groupby(['coin', 'year_month'])[['price']].apply(calculate_risk_level)
+    return risk_levels.rename('risk_level').reset_index()
+
+
+def best_time(function, coin_data, repeat):
+    """
+    Run a function several times on a fresh copy of the data.
+
+    :return: Tuple (best wall time in seconds, result of the last run)
+    """
+    timings = []
+    for _ in range(repeat):
+        data = coin_data.copy()
+        start = time.perf_counter()
+        result = function(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the feature engineering library against the notebook")
+    parser.add_argument("--coins", type=int, default=100, help="Number of coins")
+    parser.add_argument("--days", type=int, default=730, help="Number of days per coin")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per implementation, the best one is kept")
+    args = parser.parse_args()
+
+    coin_data = synthetic_coin_data(coins=args.coins, days=args.days)
+    implementations = [
+        ('create_time_series_features', *load_notebook_functions('create_time_series_features'),
+         time_series_features.create_time_series_features),
+        ('add_features', *load_notebook_functions('add_features'), time_series_features.add_features),
+        ('risk levels', notebook_risk_levels, classify_risk_levels)
+    ]
+    rows = []
+    for name, notebook_function, library_function in implementations:
+        notebook_time, expected = best_time(notebook_function, coin_data, args.repeat)
+        library_time, result = best_time(library_function, coin_data, args.repeat)
+        agreement = compare_with_notebook(result, expected)
+        rows.append([name, len(coin_data), f"{notebook_time:.3f}", f"{library_time:.3f}",
+                     f"{notebook_time / library_time:.1f}x",
+                     ', '.join(f"{column} {share:.2%}" for column, share in agreement.items())])
+
+    print(tabulate(rows, headers=["Function", "Rows", "Notebook (s)", "Library (s)", "Speedup",
+                                  "Rolling moments equal to the notebook"], tablefmt='pretty'))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Measure the throughput of bulk_process end to end, against the local CoinGecko stand-in.
+
+Every combination of worker count and storage mode runs in a fresh process, so its peak RSS is its
+own, and downloads the same coin-days from a FakeCoinGecko served by this process. Results are
+written as JSON, and a previous result file can be given to flag throughput regressions.
+
+Run from the repository root:
+
+    python -m benchmarks.ingestion_benchmark --coins 20 --days 30 --workers 1 4 16 \\
+        --storage none files parquet --latency 0.02 --output ingestion.json
+
+Add pg to --storage to also write to PostgreSQL, configured by the PG_* variables as for the app;
+each run empties cryptocurrency_daily_prices of the --pg-database database first.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from multiprocessing import get_context
+from pathlib import Path
+import numpy as np
+from tabulate import tabulate
+
+from benchmarks.fake_coingecko import FakeCoinGecko
+
+# bulk_process and the modules it uses import each other from src/, as in the app
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.append(str(SRC_DIR))
+
+from app import bulk_process  # noqa: E402
+from CoinGekoRetriever.coin_geko_retriever import CoinGekoRetriever  # noqa: E402
+from CoinGekoRetriever.rate_limiter import RateLimiter  # noqa: E402
+from ColumnarStore.columnar_store import ColumnarStore  # noqa: E402
+from PGConnector.pgconnector import PGConnector  # noqa: E402
+
+STORAGE_MODES = ('none', 'files', 'parquet', 'pg')
+
+
+class TimedRetriever(CoinGekoRetriever):
+    """
+    CoinGekoRetriever recording how long each request took, rate limiter waits and retries included.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def _make_request(self, endpoint, params=None, raw=False):
+        start = time.perf_counter()
+        try:
+            return super()._make_request(endpoint, params, raw)
+        finally:
+            # list.append is atomic, the workers can share the list
+            self.latencies.append(time.perf_counter() - start)
+
+
+def peak_rss_mb():
+    """
+    Return the peak resident set size of this process.
+
+    :return: Megabytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def count_stored(storage, coin_ids, start_date, end_date, file_dir=None, columnar_store=None, pg_connector=None):
+    """
+    Count the coin-days a run stored, to tell a fast run from one that dropped rows.
+
+    :return: Number of rows stored, or None for the none storage mode
+    """
+    if storage == 'files':
+        return len(os.listdir(file_dir)) if os.path.isdir(file_dir) else 0
+    if storage == 'parquet':
+        return len(columnar_store.read(coin_ids, start_date, end_date, columns=['coin_id', 'date']))
+    if storage == 'pg':
+        with pg_connector.borrow_connection() as (connection, cursor):
+            cursor.execute("SELECT COUNT(*) FROM cryptocurrency_daily_prices")
+            count = cursor.fetchone()[0]
+            connection.commit()
+        return count
+    return None
+
+
+def run_configuration(base_url, coin_ids, start_date, end_date, workers, storage, batch_size=500, pg_writers=1,
+                      pg_database='benchmark_database', requests_per_minute=600000, base_backoff=0.05):
+    """
+    Run bulk_process once against the stand-in and measure it.
+
+    Meant to run in a process of its own: peak RSS covers the whole life of the process.
+
+    :param base_url: Base URL of the FakeCoinGecko
+    :param coin_ids: Coins to download
+    :param start_date: First date
+    :param end_date: Last date
+    :param workers: Number of download workers
+    :param storage: One of STORAGE_MODES
+    :param batch_size: Rows written per batch
+    :param pg_writers: Number of PostgreSQL writer threads
+    :param pg_database: Database emptied and written to by the pg storage mode
+    :param requests_per_minute: Request budget of the client's rate limiter
+    :param base_backoff: Base delay in seconds of the retries after a 429
+    :return: Dict of measurements
+    """
+    logging.basicConfig(level=logging.WARNING)
+    os.environ.setdefault('GEKO_API_KEY', 'benchmark')
+    rate_limiter = RateLimiter(requests_per_minute=requests_per_minute, burst=workers, base_backoff=base_backoff)
+    client = TimedRetriever(pool_size=workers, rate_limiter=rate_limiter)
+    client.BASE_URL = base_url
+
+    pg_connector = None
+    with tempfile.TemporaryDirectory() as work_dir:
+        file_dir = os.path.join(work_dir, 'coin_data') if storage == 'files' else None
+        columnar_store = ColumnarStore(os.path.join(work_dir, 'parquet')) if storage == 'parquet' else None
+        if storage == 'pg':
+            pg_connector = PGConnector(pg_database)
+            pg_connector.create_database()
+            pg_connector.connect(pool_size=pg_writers)
+            pg_connector.create_tables(schema_dir=str(SRC_DIR / "PGConnector" / "schemas"))
+            with pg_connector.borrow_connection() as (connection, cursor):
+                cursor.execute("TRUNCATE cryptocurrency_daily_prices")
+                connection.commit()
+
+        try:
+            start = time.perf_counter()
+            bulk_process(client, coin_ids, start_date, end_date, max_workers=workers, pg_connector=pg_connector,
+                         batch_size=batch_size, pg_writers=pg_writers, columnar_store=columnar_store,
+                         file_dir=file_dir)
+            elapsed = time.perf_counter() - start
+            stored = count_stored(storage, coin_ids, start_date, end_date, file_dir, columnar_store, pg_connector)
+        finally:
+            client.close()
+            if pg_connector:
+                pg_connector.close_connection()
+
+    coin_days = len(coin_ids) * ((end_date - start_date).days + 1)
+    latencies = np.array(client.latencies) * 1000
+    return {
+        'storage': storage,
+        'workers': workers,
+        'coin_days': coin_days,
+        'stored_rows': stored,
+        'seconds': round(elapsed, 4),
+        'coin_days_per_second': round(coin_days / elapsed, 2),
+        'latency_p50_ms': round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+        'latency_p99_ms': round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+        'throttled': rate_limiter.get_stats()['throttled'],
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def git_commit():
+    """
+    Return the commit of the working tree, to tell result files apart.
+
+    :return: Commit hash, or None outside a git checkout
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=SRC_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline, results, tolerance):
+    """
+    Compare the throughput of the runs with the runs of a previous result file.
+
+    :param baseline: Parsed result file
+    :param results: Results of this run
+    :param tolerance: Largest accepted drop of throughput, as a share of the baseline
+    :return: Tuple (table rows, number of configurations slower than the tolerance)
+    """
+    previous = {(result['storage'], result['workers']): result for result in baseline['results']}
+    rows, regressions = [], 0
+    for result in results:
+        before = previous.get((result['storage'], result['workers']))
+        if before is None:
+            continue
+        change = result['coin_days_per_second'] / before['coin_days_per_second'] - 1
+        regressed = change < -tolerance
+        regressions += regressed
+        rows.append([result['storage'], result['workers'], before['coin_days_per_second'],
+                     result['coin_days_per_second'], f"{change:+.1%}", "REGRESSION" if regressed else ""])
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk_process against a local CoinGecko stand-in")
+    parser.add_argument("--coins", type=int, default=20, help="Number of coins")
+    parser.add_argument("--days", type=int, default=30, help="Number of days per coin")
+    parser.add_argument("--workers", type=int, nargs='+', default=[1, 4, 16], help="Worker counts to run")
+    parser.add_argument("--storage", nargs='+', choices=STORAGE_MODES, default=['none', 'files', 'parquet'],
+                        help="Storage modes to run")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds every response is delayed by")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Maximum random extra delay in seconds")
+    parser.add_argument("--payload-bytes", type=int, default=2000, help="Approximate size of a /history body")
+    parser.add_argument("--rate-limit-fraction", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Retry-After of the 429 responses, in seconds")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows written per batch")
+    parser.add_argument("--pg-writers", type=int, default=1, help="PostgreSQL writer threads of the pg runs")
+    parser.add_argument("--pg-database", default="benchmark_database",
+                        help="Database written by the pg runs; its cryptocurrency_daily_prices is emptied first")
+    parser.add_argument("--requests-per-minute", type=float, default=600000, help="Request budget of the client")
+    parser.add_argument("--base-backoff", type=float, default=0.05, help="Base delay in seconds of the 429 retries")
+    parser.add_argument("--output", help="JSON file the results are written to")
+    parser.add_argument("--compare", help="Previous JSON result file to compare the throughput with")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Throughput drop against --compare reported as a regression (exit status 1)")
+    args = parser.parse_args()
+
+    coin_ids = [f"coin-{index:04d}" for index in range(args.coins)]
+    end_date = datetime(2024, 12, 31)
+    start_date = end_date - timedelta(days=args.days - 1)
+
+    results = []
+    with FakeCoinGecko(latency=args.latency, jitter=args.jitter, payload_bytes=args.payload_bytes,
+                       rate_limit_fraction=args.rate_limit_fraction, retry_after=args.retry_after) as server:
+        for storage in args.storage:
+            for workers in args.workers:
+                server.reset_stats()
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                    result = pool.submit(run_configuration, server.url, coin_ids, start_date, end_date, workers,
+                                         storage, args.batch_size, args.pg_writers, args.pg_database,
+                                         args.requests_per_minute, args.base_backoff).result()
+                stats = server.get_stats()
+                result.update(requests=stats['requests'], rate_limited=stats['rate_limited'],
+                              response_bytes=stats['bytes_sent'])
+                results.append(result)
+
+    print(tabulate(
+        [[r['storage'], r['workers'], r['coin_days'], r['stored_rows'], r['seconds'], r['coin_days_per_second'],
+          r['latency_p50_ms'], r['latency_p99_ms'], r['rate_limited'], r['peak_rss_mb']] for r in results],
+        headers=["Storage", "Workers", "Coin-days", "Stored", "Time (s)", "Coin-days/s",
+                 "p50 (ms)", "p99 (ms)", "429s", "Peak RSS (MB)"],
+        tablefmt='pretty'
+    ))
+
+    if args.output:
+        report = {
+            'benchmark': 'ingestion',
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': vars(args),
+            'results': results
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows, regressions = compare_results(baseline, results, args.tolerance)
+        print(f"Compared with {args.compare} (commit {baseline.get('commit')})")
+        print(tabulate(rows, headers=["Storage", "Workers", "Before (coin-days/s)", "Now (coin-days/s)",
+                                      "Change", ""], tablefmt='pretty'))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
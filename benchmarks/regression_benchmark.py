@@ -0,0 +1,59 @@
+"""
+Compare the batched per-coin regression with the Task 4 notebook's train_and_predict loop.
+
+Run from the repository root:
+
+    python -m benchmarks.regression_benchmark --coins 300 --days 730
+"""
+import argparse
+import time
+import warnings
+import numpy as np
+from tabulate import tabulate
+
+from benchmarks.task4_reference import load_notebook_functions, synthetic_coin_data
+from src.FeatureEngineering.time_series_features import create_time_series_features
+from src.Forecasting.regression import train_and_predict
+
+
+def timed(function, *args, **kwargs):
+    """
+    Run a function once.
+
+    :return: Tuple (wall time in seconds, result)
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batched regression against the notebook")
+    parser.add_argument("--coins", type=int, default=300, help="Number of coins")
+    parser.add_argument("--days", type=int, default=730, help="Number of days per coin")
+    parser.add_argument("--processes", type=int, default=4, help="Processes of the process pool run")
+    args = parser.parse_args()
+
+    features = create_time_series_features(synthetic_coin_data(coins=args.coins, days=args.days))
+    notebook_function, = load_notebook_functions('train_and_predict')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        notebook_time, (expected, _) = timed(notebook_function, features)
+
+    runs = [
+        ('batched', {}),
+        (f'{args.processes} processes', {'processes': args.processes, 'max_chunk_values': 2 ** 20})
+    ]
+    rows = [['notebook', len(features), f"{notebook_time:.3f}", "1.0x", ""]]
+    for name, options in runs:
+        library_time, (result, _) = timed(train_and_predict, features, **options)
+        difference = np.abs(result['predicted_price'] - expected['predicted_price']) / np.abs(expected['predicted_price'])
+        rows.append([name, len(features), f"{library_time:.3f}", f"{notebook_time / library_time:.1f}x",
+                     f"{difference.max():.1e}"])
+
+    print(tabulate(rows, headers=["Implementation", "Rows", "Time (s)", "Speedup", "Max relative difference"],
+                   tablefmt='pretty'))
+
+
+if __name__ == "__main__":
+    main()
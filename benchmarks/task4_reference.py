@@ -0,0 +1,91 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import holidays
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LinearRegression
+
+NOTEBOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'Task_4',
+                             'pandas_and_regression.ipynb')
+
+
+def load_notebook_functions(*names, notebook_path=NOTEBOOK_PATH):
+    """
+    Load functions defined in the Task 4 notebook, to compare the library against them.
+
+    Only the cells defining functions are executed, with the imports of the notebook.
+
+    :param names: Function names, e.g. 'create_time_series_features'
+    :param notebook_path: Path of the notebook
+    :return: Tuple of functions, in the order of names
+    """
+    with open(notebook_path, 'r', encoding='utf-8') as f:
+        notebook = json.load(f)
+
+    namespace = {'pd': pd, 'np': np, 'holidays': holidays, 'StandardScaler': StandardScaler,
+                 'LinearRegression': LinearRegression}
+    for cell in notebook['cells']:
+        source = ''.join(cell['source'])
+        if cell['cell_type'] == 'code' and source.startswith('def '):
+            exec(compile(source, notebook_path, 'exec'), namespace)
+    return tuple(namespace[name] for name in names)
+
+
+def synthetic_coin_data(coins=3, days=365, start_date='2023-01-01', seed=0, volume=True, crash_rate=0.01):
+    """
+    Build a coin_data frame of random-walk prices, shaped like the Task 3 table.
+
+    :param coins: Number of coins
+    :param days: Number of days per coin
+    :param start_date: First date (YYYY-MM-DD)
+    :param seed: Seed of the random generator
+    :param volume: Add a volume column
+    :param crash_rate: Share of days starting a two-day price drop
+    :return: DataFrame with coin, date (YYYY-MM-DD strings) and price columns, and volume, in random row order
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start_date, periods=days, freq='D').strftime('%Y-%m-%d')
+    returns = rng.normal(0.0, 0.04, size=(coins, days))
+    # Two-day drops of 20% to 70%, so that every risk level shows up
+    crashes = np.argwhere(rng.random((coins, days - 1)) < crash_rate)
+    depths = rng.uniform(0.2, 0.7, size=len(crashes))
+    returns[crashes[:, 0], crashes[:, 1]] = returns[crashes[:, 0], crashes[:, 1] + 1] = -depths
+    prices = rng.uniform(0.5, 50000.0, size=(coins, 1)) * np.exp(np.cumsum(np.log1p(returns), axis=1))
+
+    frame = pd.DataFrame({
+        'coin': np.repeat([f'coin-{index}' for index in range(coins)], days),
+        'date': np.tile(dates, coins),
+        'price': prices.ravel()
+    })
+    if volume:
+        frame['volume'] = rng.lognormal(20.0, 1.0, size=len(frame))
+    return frame.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+# Rolling moments: pandas accumulates them with running sums, whose floating point error grows
+# along long histories with large price swings, while the library computes every window exactly
+ROLLING_MOMENT_SUFFIXES = ('_std', '_skew', '_variance')
+
+
+def compare_with_notebook(result, expected, rtol=1e-6):
+    """
+    Check that a library frame matches the notebook output.
+
+    :param result: Frame produced by the library
+    :param expected: Frame produced by the notebook
+    :param rtol: Relative tolerance of the float columns
+    :return: Dict mapping each rolling moment column to the share of its values within rtol of
+             the notebook; every other column must match, or AssertionError is raised
+    """
+    moments = [column for column in expected.columns if column.endswith(ROLLING_MOMENT_SUFFIXES)]
+    pd.testing.assert_frame_equal(result.drop(columns=moments), expected.drop(columns=moments),
+                                  check_dtype=False, rtol=rtol)
+    pd.testing.assert_index_equal(result.columns, expected.columns)
+
+    agreement = {}
+    for column in moments:
+        left, right = result[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float)
+        close = np.isclose(left, right, rtol=rtol, atol=0.0, equal_nan=True)
+        agreement[column] = float(close.mean()) if len(close) else 1.0
+    return agreement
@@ -0,0 +1,187 @@
+import os
+import json
+import asyncio
+import logging
+from datetime import datetime
+import aiohttp
+from dotenv import load_dotenv
+
+from .coin_geko_retriever import CoinGekoRetriever
+from .rate_limiter import RateLimiter
+from .shared_rate_limiter import SharedRateLimiter
+
+
+class AsyncCoinGekoRetriever:
+    """
+    asyncio client for the CoinGecko API, used by the async bulk engine.
+    Requires an API key stored in .env file as GEKO_API_KEY.
+    """
+
+    BASE_URL = CoinGekoRetriever.BASE_URL
+    RETRY_STATUS_CODES = CoinGekoRetriever.RETRY_STATUS_CODES
+
+    def __init__(self, max_connections=100, connect_timeout=5.0, read_timeout=30.0,
+                 requests_per_minute=30, max_retries=5, cache=None, rate_limiter=None):
+        """
+        Initialize the client. The HTTP session is created by open().
+
+        :param max_connections: Maximum number of simultaneous connections to the API
+        :param connect_timeout: Seconds to wait for a TCP/TLS connection to be established
+        :param read_timeout: Seconds to wait for the API to send a response
+        :param requests_per_minute: Request budget shared by every coroutine using this client
+        :param max_retries: Number of retries for rate-limited or unavailable responses
+        :param cache: Optional ResponseCache checked before any request is sent
+        :param rate_limiter: Optional limiter shared with other clients or processes, e.g. a
+                             SharedRateLimiter (default: a private one with requests_per_minute)
+        """
+        self.logger = logging.getLogger(__name__)
+
+        load_dotenv()
+        self.api_key = os.getenv('GEKO_API_KEY')
+        if not self.api_key:
+            error_msg = "GEKO_API_KEY not found in environment variables"
+            self.logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.rate_limiter = rate_limiter or RateLimiter(requests_per_minute=requests_per_minute)
+        self.max_retries = max_retries
+        self.cache = cache
+        self.session = None
+
+    async def open(self):
+        """
+        Create the pooled keep-alive HTTP session.
+        """
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers={'Accept-Encoding': 'gzip, deflate'}
+        )
+
+    async def close(self):
+        """
+        Close the HTTP session and every pooled connection.
+        """
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _make_request(self, endpoint, params=None, raw=False):
+        """
+        Make an API request with the API key included.
+
+        Rate-limited (429) and unavailable (5xx) responses are retried with exponential
+        backoff, honoring Retry-After.
+
+        :param endpoint: API endpoint to request
+        :param params: Optional query parameters dictionary
+        :param raw: Also return the response body as received
+        :return: Parsed response, or (parsed response, body bytes) if raw is set
+        """
+        if params is None:
+            params = {}
+
+        params['x_cg_demo_api_key'] = self.api_key
+
+        url = f"{self.BASE_URL}/{endpoint}"
+        try:
+            for attempt in range(self.max_retries + 1):
+                wait = await self._update_rate_limiter(self.rate_limiter.reserve)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                async with self.session.get(url, params=params) as response:
+                    if response.status in self.RETRY_STATUS_CODES and attempt < self.max_retries:
+                        retry_after = CoinGekoRetriever._parse_retry_after(response)
+                        if response.status == 429:
+                            await self._update_rate_limiter(self.rate_limiter.on_rate_limited, retry_after)
+                        delay = self.rate_limiter.backoff(attempt, retry_after)
+                        self.logger.warning(f"API returned {response.status} for {endpoint}, "
+                                            f"retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                        await asyncio.sleep(delay)
+                        continue
+
+                    response.raise_for_status()
+                    body = await response.read()
+                    data = json.loads(body)
+                    await self._update_rate_limiter(self.rate_limiter.on_success)
+                    return (data, body) if raw else data
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"API request failed: {str(e)}")
+            raise
+
+    async def _update_rate_limiter(self, method, *args):
+        """
+        Call a rate limiter method. A limiter shared through a file locks and rewrites it, which
+        runs in a thread so the other coroutines keep going while another process holds the lock.
+
+        :param method: Bound method of self.rate_limiter
+        :param args: Arguments of the method
+        :return: What the method returns
+        """
+        if isinstance(self.rate_limiter, SharedRateLimiter):
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def check_geko_api_status(self):
+        """
+        Check if the CoinGecko API is operational by making a request to /ping endpoint
+        Returns: bool indicating if API is operational
+        """
+        try:
+            await self._make_request('ping')
+            self.logger.info("API status check successful")
+            return True
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"API status check failed: {str(e)}")
+            return False
+
+    async def fetch_coin_data(self, coin, date):
+        """
+        Fetch historical data for a specific coin on a given date, without writing it anywhere.
+
+        :param coin: Coin identifier (e.g., 'bitcoin')
+        :param date: Date in ISO8601 format (YYYY-MM-DD)
+        :return: Tuple (parsed response, response body bytes); the body is None for cached responses
+        """
+        formatted_date = datetime.fromisoformat(date).strftime('%d-%m-%Y')
+
+        endpoint = f"coins/{coin}/history"
+        params = {'date': formatted_date}
+        if self.cache is not None:
+            key = self.cache.make_key(endpoint, params)
+            data = await asyncio.to_thread(self.cache.get, key)
+            if data is not None:
+                return data, None
+
+        data, body = await self._make_request(endpoint, params=dict(params), raw=True)
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.set, key, data, self.cache.ttl_for(date))
+        return data, body
+
+    async def download_coin_data_from(self, coin, date):
+        """
+        Download historical data for a specific coin on a given date.
+
+        The file is written in a worker thread so the event loop keeps serving requests.
+
+        :param coin: Coin identifier (e.g., 'bitcoin')
+        :param date: Date in ISO8601 format (YYYY-MM-DD)
+        :return: Parsed API response
+        """
+        data, _ = await self.fetch_coin_data(coin, date)
+
+        await asyncio.to_thread(CoinGekoRetriever.save_coin_data, coin, date, data)
+
+        self.logger.info(f"Successfully downloaded data for {coin} on {date}")
+        return data
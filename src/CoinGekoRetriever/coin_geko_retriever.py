@@ -1,10 +1,16 @@
 import os
+import time
 import requests
+from requests.adapters import HTTPAdapter
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 import json
 from dotenv import load_dotenv
 
+from .rate_limiter import RateLimiter
+from .response_recorder import RecordingAdapter, ReplayAdapter
+
 
 class CoinGekoRetriever:
     """
@@ -13,8 +19,31 @@ class CoinGekoRetriever:
     """
 
     BASE_URL = "https://api.coingecko.com/api/v3"
+    RETRY_STATUS_CODES = (429, 502, 503, 504)
+    # market_chart/range returns hourly points for ranges up to 90 days and daily points above
+    DAILY_GRANULARITY_MIN_DAYS = 91
+    MAX_RANGE_DAYS = 365
+
+    def __init__(self, pool_size=10, connect_timeout=5.0, read_timeout=30.0,
+                 requests_per_minute=30, max_retries=5, cache=None, rate_limiter=None, metrics=None,
+                 recorder=None, replayer=None):
+        """
+        Initialize the client and its pooled HTTP session.
 
-    def __init__(self):
+        :param pool_size: Maximum number of keep-alive connections to the API (match it to the worker count)
+        :param connect_timeout: Seconds to wait for a TCP/TLS connection to be established
+        :param read_timeout: Seconds to wait for the API to send a response
+        :param requests_per_minute: Request budget shared by every thread using this client
+        :param max_retries: Number of retries for rate-limited or unavailable responses
+        :param cache: Optional ResponseCache checked before any request is sent
+        :param rate_limiter: Optional limiter shared with other clients or processes, e.g. a
+                             SharedRateLimiter (default: a private one with requests_per_minute)
+        :param metrics: Optional PipelineMetrics recording the rate limiter waits, HTTP requests,
+                        JSON decoding and file writes
+        :param recorder: Optional ResponseRecorder every response is written to; closed with the client
+        :param replayer: Optional ResponseReplayer answering every request instead of the API. No API
+                         key is needed, and the default rate limiter follows the replay speed.
+        """
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -23,19 +52,116 @@ class CoinGekoRetriever:
 
         load_dotenv()
         self.api_key = os.getenv('GEKO_API_KEY')
-        if not self.api_key:
+        if not self.api_key and replayer is None:
             error_msg = "GEKO_API_KEY not found in environment variables"
             self.logger.error(error_msg)
             raise ValueError(error_msg)
 
+        self.timeout = (connect_timeout, read_timeout)
+        self.recorder = recorder
+        self.replayer = replayer
+        self.session = self._create_session(pool_size)
+        if rate_limiter is None and replayer is not None:
+            rate_limiter = replayer.create_rate_limiter(requests_per_minute, burst=pool_size)
+        self.rate_limiter = rate_limiter or RateLimiter(requests_per_minute=requests_per_minute)
+        self.max_retries = max_retries
+        self.cache = cache
+        self.metrics = metrics
+
         self.logger.info("CoinGeckoClient initialized successfully")
 
-    def _make_request(self, endpoint, params=None):
+    def _create_session(self, pool_size):
+        """
+        Create a requests session that keeps connections alive and negotiates gzip.
+
+        With a recorder its responses are recorded, with a replayer they are served from its archive.
+
+        :param pool_size: Maximum number of connections kept open per host
+        """
+        session = requests.Session()
+        # pool_block makes extra threads wait for a free connection instead of
+        # opening (and then discarding) one-off connections
+        if self.replayer is not None:
+            adapter = ReplayAdapter(self.replayer)
+        elif self.recorder is not None:
+            adapter = RecordingAdapter(self.recorder, pool_maxsize=pool_size, pool_block=True)
+        else:
+            adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=True)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive'
+        })
+        return session
+
+    def get_pool_stats(self):
+        """
+        Return connection pool statistics of the HTTP session.
+
+        :return: Dict with the number of requests sent, connections opened and connections reused
+        """
+        requests_sent = 0
+        connections_opened = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_sent += pool.num_requests
+                connections_opened += pool.num_connections
+
+        return {
+            'requests': requests_sent,
+            'connections_opened': connections_opened,
+            'connections_reused': max(requests_sent - connections_opened, 0)
+        }
+
+    def close(self):
+        """
+        Close the HTTP session and every pooled connection, and finish the recording, if any.
+        """
+        self.session.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.replayer is not None:
+            replay_stats = self.replayer.get_stats()
+            self.logger.info(f"Replayed {replay_stats['served']} responses, "
+                             f"{replay_stats['missing']} requests were not recorded")
+
+    @staticmethod
+    def _parse_retry_after(response):
+        """
+        Read the Retry-After header of a response.
+
+        :param response: HTTP response
+        :return: Seconds to wait, or None if the header is missing or invalid
+        """
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def _make_request(self, endpoint, params=None, raw=False):
         """
         Helper method to make API requests with the API key included.
 
+        Every request takes a token from the shared rate limiter. Rate-limited (429) and
+        unavailable (5xx) responses are retried with exponential backoff, honoring Retry-After.
+
         :param endpoint: API endpoint to request
         :param params: Optional query parameters dictionary
+        :param raw: Also return the response body as received
+        :return: Parsed response, or (parsed response, body bytes) if raw is set
         """
         if params is None:
             params = {}
@@ -44,13 +170,72 @@ class CoinGekoRetriever:
 
         url = f"{self.BASE_URL}/{endpoint}"
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
+            for attempt in range(self.max_retries + 1):
+                start = time.perf_counter()
+                self.rate_limiter.acquire()
+                if self.metrics is not None:
+                    self.metrics.observe('rate_limit_wait', time.perf_counter() - start)
+
+                start = time.perf_counter()
+                try:
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+                except requests.exceptions.RequestException:
+                    if self.metrics is not None:
+                        self.metrics.observe('http_request', time.perf_counter() - start, error=True)
+                    raise
+                if self.metrics is not None:
+                    self.metrics.observe('http_request', time.perf_counter() - start,
+                                         size=len(response.content), error=not response.ok)
+
+                if response.status_code in self.RETRY_STATUS_CODES and attempt < self.max_retries:
+                    retry_after = self._parse_retry_after(response)
+                    if response.status_code == 429:
+                        self.rate_limiter.on_rate_limited(retry_after)
+                    delay = self.rate_limiter.backoff(attempt, retry_after)
+                    if self.metrics is not None:
+                        self.metrics.add_retry('http_request')
+                        self.metrics.observe('retry_backoff', delay)
+                    self.logger.warning(f"API returned {response.status_code} for {endpoint}, "
+                                        f"retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                    time.sleep(delay)
+                    continue
+
+                response.raise_for_status()
+                self.rate_limiter.on_success()
+                start = time.perf_counter()
+                data = response.json()
+                if self.metrics is not None:
+                    self.metrics.observe('json_decode', time.perf_counter() - start, size=len(response.content))
+                if raw:
+                    return data, response.content
+                return data
         except requests.exceptions.RequestException as e:
             self.logger.error(f"API request failed: {str(e)}")
             raise
 
+    def _cached_request(self, endpoint, params, last_date, raw=False):
+        """
+        Serve a request from the response cache, or make it and cache the response.
+
+        The cache is checked before the rate limiter, so cached responses cost no API budget.
+
+        :param endpoint: API endpoint to request
+        :param params: Query parameters dictionary
+        :param last_date: Last date covered by the response (YYYY-MM-DD), used for its TTL
+        :param raw: Also return the response body, None when served from the cache
+        """
+        if self.cache is None:
+            return self._make_request(endpoint, params=params, raw=raw)
+
+        key = self.cache.make_key(endpoint, params)
+        data = self.cache.get(key)
+        if data is not None:
+            return (data, None) if raw else data
+
+        result = self._make_request(endpoint, params=dict(params), raw=raw)
+        self.cache.set(key, result[0] if raw else result, ttl=self.cache.ttl_for(last_date))
+        return result
+
     def check_geko_api_status(self):
         """
         Check if the CoinGecko API is operational by making a request to /ping endpoint
@@ -64,6 +249,45 @@ class CoinGekoRetriever:
             self.logger.error(f"API status check failed: {str(e)}")
             return False
 
+    @staticmethod
+    def save_coin_data(coin, date, data):
+        """
+        Save the data of a coin for a given date under coin_data/.
+
+        :param coin: Coin identifier (e.g., 'bitcoin')
+        :param date: Date in ISO8601 format (YYYY-MM-DD)
+        :param data: Parsed API response
+        :return: Filename the data was written to
+        """
+        os.makedirs('coin_data', exist_ok=True)
+
+        filename = f"coin_data/{coin}_{date}.json"
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=2)
+        return filename
+
+    def fetch_coin_data(self, coin, date):
+        """
+        Fetch historical data for a specific coin on a given date, without writing it anywhere.
+
+        :param coin: Coin identifier (e.g., 'bitcoin')
+        :param date: Date in ISO8601 format (YYYY-MM-DD)
+        :return: Tuple (parsed response, response body bytes); the body is None for cached responses
+        """
+        try:
+            parsed_date = datetime.fromisoformat(date)
+            formatted_date = parsed_date.strftime('%d-%m-%Y')
+
+            endpoint = f"coins/{coin}/history"
+            return self._cached_request(endpoint, {'date': formatted_date}, date, raw=True)
+
+        except ValueError as e:
+            self.logger.error(f"Invalid date format: {str(e)}")
+            raise
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Failed to download coin data: {str(e)}")
+            raise
+
     def download_coin_data_from(self, coin, date):
         """
         Download historical data for a specific coin on a given date.
@@ -76,13 +300,12 @@ class CoinGekoRetriever:
             formatted_date = parsed_date.strftime('%d-%m-%Y')
 
             endpoint = f"coins/{coin}/history"
-            data = self._make_request(endpoint, params={'date': formatted_date})
-
-            os.makedirs('coin_data', exist_ok=True)
+            data = self._cached_request(endpoint, {'date': formatted_date}, date)
 
-            filename = f"coin_data/{coin}_{date}.json"
-            with open(filename, 'w') as f:
-                json.dump(data, f, indent=2)
+            start = time.perf_counter()
+            filename = self.save_coin_data(coin, date, data)
+            if self.metrics is not None:
+                self.metrics.observe('file_write', time.perf_counter() - start, size=os.path.getsize(filename))
 
             self.logger.info(f"Successfully downloaded data for {coin} on {date}")
             return filename
@@ -97,4 +320,99 @@ class CoinGekoRetriever:
             self.logger.error(f"Failed to save data to file: {str(e)}")
             raise
 
+    @staticmethod
+    def _daily_points(points):
+        """
+        Reduce a market_chart series to one value per UTC day.
+
+        For each day the point closest to 00:00 UTC is kept, which is what /history reports.
+
+        :param points: List of [timestamp_ms, value] pairs
+        :return: Dict mapping YYYY-MM-DD to value
+        """
+        closest = {}
+        for timestamp_ms, value in points:
+            seconds = timestamp_ms / 1000
+            midnight = round(seconds / 86400) * 86400
+            day = datetime.fromtimestamp(midnight, tz=timezone.utc).strftime('%Y-%m-%d')
+            distance = abs(seconds - midnight)
+            if day not in closest or distance < closest[day][0]:
+                closest[day] = (distance, value)
+        return {day: value for day, (_, value) in closest.items()}
+
+    def fetch_coin_range(self, coin, start, end):
+        """
+        Fetch daily prices, market caps and volumes of a coin for a date range in one request.
 
+        Ranges shorter than DAILY_GRANULARITY_MIN_DAYS are widened backwards in the request so the
+        API answers with daily points; only the requested dates are kept. Each day is laid out as
+        /history, restricted to the price, market cap and volume.
+
+        :param coin: Coin identifier (e.g., 'bitcoin')
+        :param start: First date in ISO8601 format (YYYY-MM-DD)
+        :param end: Last date in ISO8601 format (YYYY-MM-DD), at most MAX_RANGE_DAYS after start
+        :return: Dict mapping each date (YYYY-MM-DD) with data to its /history-like payload
+        """
+        try:
+            start_date = datetime.fromisoformat(start).replace(tzinfo=timezone.utc)
+            end_date = datetime.fromisoformat(end).replace(tzinfo=timezone.utc)
+            if end_date < start_date:
+                raise ValueError(f"Range end {end} is before its start {start}")
+            if (end_date - start_date).days >= self.MAX_RANGE_DAYS:
+                raise ValueError(f"Ranges are limited to {self.MAX_RANGE_DAYS} days")
+
+            request_start = min(start_date, end_date - timedelta(days=self.DAILY_GRANULARITY_MIN_DAYS))
+            endpoint = f"coins/{coin}/market_chart/range"
+            data = self._cached_request(endpoint, {
+                'vs_currency': 'usd',
+                'from': int(request_start.timestamp()),
+                'to': int((end_date + timedelta(days=1)).timestamp())
+            }, end)
+
+            prices = self._daily_points(data.get('prices', []))
+            market_caps = self._daily_points(data.get('market_caps', []))
+            volumes = self._daily_points(data.get('total_volumes', []))
+
+            payloads = {}
+            for day in sorted(prices):
+                if not start <= day <= end:
+                    continue
+                payloads[day] = {
+                    'id': coin,
+                    'market_data': {
+                        'current_price': {'usd': prices[day]},
+                        'market_cap': {'usd': market_caps.get(day)},
+                        'total_volume': {'usd': volumes.get(day)}
+                    }
+                }
+
+            self.logger.info(f"Successfully downloaded {len(payloads)} days of data for {coin} from {start} to {end}")
+            return payloads
+
+        except ValueError as e:
+            self.logger.error(f"Invalid date range: {str(e)}")
+            raise
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Failed to download coin range: {str(e)}")
+            raise
+
+    def download_coin_range(self, coin, start, end):
+        """
+        Download daily prices, market caps and volumes of a coin for a date range in one request,
+        saving each day under coin_data/ unless a file of that day is already there.
+
+        :param coin: Coin identifier (e.g., 'bitcoin')
+        :param start: First date in ISO8601 format (YYYY-MM-DD)
+        :param end: Last date in ISO8601 format (YYYY-MM-DD), at most MAX_RANGE_DAYS after start
+        :return: Dict mapping each date (YYYY-MM-DD) with data to its /history-like payload
+        """
+        payloads = self.fetch_coin_range(coin, start, end)
+        try:
+            for day, payload in payloads.items():
+                # Keep the full /history payload of days downloaded before
+                if not os.path.exists(f"coin_data/{coin}_{day}.json"):
+                    self.save_coin_data(coin, day, payload)
+        except IOError as e:
+            self.logger.error(f"Failed to save data to file: {str(e)}")
+            raise
+        return payloads
@@ -0,0 +1,133 @@
+import random
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by every worker that calls the CoinGecko API.
+
+    The budget shrinks when the API answers 429 and slowly recovers after a run of
+    successful requests, so a long backfill settles at the fastest rate the API accepts.
+    """
+
+    def __init__(self, requests_per_minute=30, burst=1, min_requests_per_minute=1,
+                 recovery_successes=20, base_backoff=1.0, max_backoff=60.0):
+        """
+        Initialize the token bucket.
+
+        :param requests_per_minute: Maximum request budget per minute
+        :param burst: Number of requests that may be sent back to back
+        :param min_requests_per_minute: Floor for the budget when it shrinks after 429s
+        :param recovery_successes: Successful requests needed before the budget grows again
+        :param base_backoff: Base delay in seconds for the exponential backoff
+        :param max_backoff: Maximum delay in seconds for a single backoff
+        """
+        self.max_rate = requests_per_minute / 60.0
+        self.min_rate = min(min_requests_per_minute, requests_per_minute) / 60.0
+        self.rate = self.max_rate
+        self.capacity = burst
+        self.recovery_successes = recovery_successes
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.clock = time.monotonic
+        self.tokens = float(burst)
+        self.last_refill = self.clock()
+        self.blocked_until = 0.0
+        self.next_shrink = 0.0
+        self.successes = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    @property
+    def requests_per_minute(self):
+        """Current request budget per minute"""
+        return self.rate * 60.0
+
+    def _refill(self, now):
+        """Add the tokens earned since the last refill"""
+        elapsed = now - self.last_refill
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.last_refill = now
+
+    def reserve(self):
+        """
+        Take one token and return how long the caller has to wait before using it.
+
+        Tokens may go negative: each reservation queues behind the previous ones, so
+        concurrent callers are spaced out instead of all waking up at the same time.
+
+        :return: Seconds to wait before sending the request
+        """
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self):
+        """
+        Block until the caller is allowed to send a request.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_success(self):
+        """
+        Record a successful request, growing the budget back after enough of them.
+        """
+        with self.lock:
+            self.successes += 1
+            if self.successes >= self.recovery_successes and self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+                self.successes = 0
+
+    def on_rate_limited(self, retry_after=None):
+        """
+        Record a 429 response: pause every worker and shrink the budget.
+
+        The budget is halved at most once per cooldown window, so a burst of 429s
+        coming back from requests that were already in flight counts only once.
+
+        :param retry_after: Seconds the API asked us to wait, if it sent Retry-After
+        """
+        with self.lock:
+            now = self.clock()
+            self.throttled += 1
+            self.successes = 0
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, now + pause)
+
+            if now >= self.next_shrink:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.tokens = min(self.tokens, 0.0)
+                self.next_shrink = now + max(pause, 1.0 / self.rate)
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Compute the delay before retrying a request.
+
+        :param attempt: Zero-based number of the failed attempt
+        :param retry_after: Seconds the API asked us to wait, if any
+        :return: Delay in seconds (exponential with jitter, never below retry_after)
+        """
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def get_stats(self):
+        """
+        Return limiter statistics.
+
+        :return: Dict with the current budget and the number of 429s seen
+        """
+        with self.lock:
+            return {
+                'requests_per_minute': round(self.rate * 60.0, 2),
+                'throttled': self.throttled
+            }
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of CoinGecko API responses.
+
+    Entries are keyed by a hash of the endpoint and its query parameters, may carry a TTL,
+    and the least recently used ones are evicted once the cache grows beyond max_bytes.
+    """
+
+    def __init__(self, cache_dir='.coin_geko_cache', max_bytes=1024 * 1024 * 1024, recent_ttl=3600):
+        """
+        Initialize the cache and index the entries already on disk.
+
+        :param cache_dir: Directory holding the cached responses
+        :param max_bytes: Maximum total size of the cached responses
+        :param recent_ttl: Seconds before a response about today's data expires
+        """
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.recent_ttl = recent_ttl
+
+        self.index = OrderedDict()  # key -> size in bytes, least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Index the entries on disk, ordered by their last access time"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.json'):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, name[:-len('.json')], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self.index[key] = size
+            self.total_bytes += size
+        self.logger.info(f"Response cache loaded with {len(self.index)} entries ({self.total_bytes} bytes)")
+
+    @staticmethod
+    def make_key(endpoint, params=None):
+        """
+        Compute the cache key of a request.
+
+        :param endpoint: API endpoint
+        :param params: Query parameters, without the API key
+        :return: Hex digest identifying the request
+        """
+        payload = json.dumps({'endpoint': endpoint, 'params': params or {}}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def ttl_for(self, last_date):
+        """
+        Return the TTL of a response covering data up to last_date.
+
+        :param last_date: Last date covered by the response (YYYY-MM-DD)
+        :return: None for past dates, whose data never changes, else recent_ttl
+        """
+        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        return None if last_date < today else self.recent_ttl
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _remove(self, key):
+        """Drop an entry from the index and the disk. The caller must hold the lock."""
+        self.total_bytes -= self.index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key):
+        """
+        Return a cached response.
+
+        :param key: Cache key from make_key()
+        :return: The cached response, or None if it is missing or expired
+        """
+        with self.lock:
+            if key not in self.index:
+                self.misses += 1
+                return None
+
+        try:
+            with open(self._path(key), 'r') as f:
+                entry = json.load(f)
+        except (IOError, ValueError):
+            entry = None
+
+        with self.lock:
+            expires_at = entry.get('expires_at') if entry else None
+            if entry is None or (expires_at is not None and expires_at < time.time()):
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if key in self.index:
+                self.index.move_to_end(key)
+
+        # The access time survives restarts through the file's mtime
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+        return entry['data']
+
+    def set(self, key, data, ttl=None):
+        """
+        Store a response, evicting the least recently used entries if the cache is full.
+
+        :param key: Cache key from make_key()
+        :param data: JSON-serializable response
+        :param ttl: Seconds before the entry expires, or None for responses that never change
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {'expires_at': time.time() + ttl if ttl is not None else None, 'data': data}
+
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+
+        with self.lock:
+            self.total_bytes += size - self.index.pop(key, 0)
+            self.index[key] = size
+            while self.total_bytes > self.max_bytes and len(self.index) > 1:
+                oldest = next(iter(self.index))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_stats(self):
+        """
+        Return cache statistics.
+
+        :return: Dict with hits, misses, evictions, number of entries and total size in bytes
+        """
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.index),
+                'bytes': self.total_bytes
+            }
@@ -0,0 +1,317 @@
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+import zlib
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlsplit
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from .rate_limiter import RateLimiter
+
+ARCHIVE_FORMAT = 'coingecko-recording'
+ARCHIVE_VERSION = 1
+# Every archive starts with this, the header written by ResponseRecorder
+HEADER_PREFIX = json.dumps({'format': ARCHIVE_FORMAT})[:-1].encode('utf-8')
+# Compressed bytes read to check the header of an existing archive
+HEADER_READ_BYTES = 64 * 1024
+# Query parameters never written to an archive
+SECRET_PARAMS = ('x_cg_demo_api_key', 'x_cg_pro_api_key')
+# Budget of the rate limiter of a replay as fast as possible
+UNLIMITED_REQUESTS_PER_MINUTE = 60_000_000
+
+
+def request_key(url):
+    """
+    Identify a request by its path and query parameters, without host and API key.
+
+    :param url: Full request URL
+    :return: Tuple (path, dict of the query parameters)
+    """
+    parts = urlsplit(url)
+    params = {key: value for key, value in parse_qsl(parts.query) if key not in SECRET_PARAMS}
+    return parts.path, params
+
+
+def _lookup_key(path, params):
+    return f"{path}?{json.dumps(params, sort_keys=True)}"
+
+
+class ResponseRecorder:
+    """
+    Writes every API response, with its timing, to a compact archive: gzip-compressed JSON lines.
+
+    The first line describes the archive, each other line one response: its path and query
+    parameters (never the API key), status, Retry-After header, decoded body, how long it took
+    and when it started relative to the start of the recording of its run. Payloads of one
+    endpoint look alike, so the archive is a fraction of the size of the bodies.
+    """
+
+    def __init__(self, path):
+        """
+        Open an archive. A recording already at path is carried over, up to its last whole
+        response, and the new responses are appended to it, so a resumed run extends the
+        recording of the run it resumes.
+
+        :param path: Archive file, e.g. 'coingecko.jsonl.gz'
+        :raises ValueError: If path holds something other than a recording
+        """
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.count = 0
+        self.kept = 0
+        # The previous run may have been interrupted mid-write: rewrite its whole lines to a new
+        # file rather than appending after a truncated gzip stream
+        temp_path = f"{path}.tmp"
+        self.file = gzip.open(temp_path, 'wt', encoding='utf-8')
+        try:
+            if not self._copy_recording(path):
+                self.file.write(json.dumps({
+                    'format': ARCHIVE_FORMAT,
+                    'version': ARCHIVE_VERSION,
+                    'created_at': datetime.now(timezone.utc).isoformat()
+                }) + '\n')
+        except Exception:
+            self.file.close()
+            os.remove(temp_path)
+            raise
+        os.replace(temp_path, path)
+        if self.kept:
+            self.logger.info(f"Appending to the {self.kept} responses recorded in {path}")
+
+    def _copy_recording(self, path):
+        """
+        Copy the header and whole responses of the recording at path to the new archive.
+
+        :param path: Archive file
+        :return: False if there is no recording to carry over: no file, an empty one, or a
+                 recording interrupted before its header was written
+        :raises ValueError: If the file is not a recording
+        """
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return False
+        with open(path, 'rb') as f:
+            start = f.read(HEADER_READ_BYTES)
+        try:
+            # Unlike gzip.open, decompresses what a gzip stream cut off early holds
+            text = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS).decompress(start)
+        except zlib.error:
+            raise ValueError(f"{path} is not a CoinGecko recording")
+        if b'\n' not in text:
+            if HEADER_PREFIX.startswith(text) or text.startswith(HEADER_PREFIX):
+                # Interrupted before its header was written
+                return False
+            raise ValueError(f"{path} is not a CoinGecko recording")
+        try:
+            header = json.loads(text.split(b'\n', 1)[0])
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get('format') != ARCHIVE_FORMAT:
+            raise ValueError(f"{path} is not a CoinGecko recording")
+
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            self.file.write(f.readline())
+            try:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+                    self.file.write(line)
+                    self.kept += 1
+            except (EOFError, OSError, zlib.error):
+                self.logger.warning(f"{path} is truncated, keeping its first {self.kept} responses")
+        return True
+
+    def record(self, response, started, elapsed):
+        """
+        Append a response to the archive.
+
+        :param response: requests Response, its body already read
+        :param started: time.perf_counter() when the request was sent
+        :param elapsed: Seconds until the body was read
+        """
+        path, params = request_key(response.request.url if response.request else response.url)
+        body = response.content or b''
+        try:
+            entry_body, encoding = body.decode('utf-8'), None
+        except UnicodeDecodeError:
+            entry_body, encoding = zlib.compress(body).hex(), 'zlib-hex'
+        entry = {
+            'offset': round(started - self.started, 6),
+            'elapsed': round(elapsed, 6),
+            'path': path,
+            'params': params,
+            'status': response.status_code,
+            'retry_after': response.headers.get('Retry-After'),
+            'body': entry_body
+        }
+        if encoding:
+            entry['encoding'] = encoding
+        line = json.dumps(entry) + '\n'
+        with self.lock:
+            if self.file is not None:
+                self.file.write(line)
+                self.count += 1
+
+    def close(self):
+        """
+        Finish the archive.
+        """
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.close()
+            self.file = None
+        self.logger.info(f"Recorded {self.count} responses to {self.path}")
+
+
+class ResponseReplayer:
+    """
+    Serves the responses of a ResponseRecorder archive back, without the network.
+
+    Responses to the same request are served in the order they were recorded, so a recorded
+    429 followed by its retry is replayed as such; the last one is served again once they are
+    used up. Requests that were not recorded get a 404, except /ping, which always succeeds.
+    """
+
+    def __init__(self, path, speed=0.0):
+        """
+        Load an archive.
+
+        :param path: Archive written by ResponseRecorder
+        :param speed: 1 to wait for each response as long as it took when recorded, 10 to wait ten
+                      times less, 0 (default) to answer at once and ignore Retry-After
+        """
+        self.path = path
+        self.speed = speed
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.responses = defaultdict(deque)
+        self.served = 0
+        self.missing = 0
+        self._load()
+
+    def _load(self):
+        """Index the responses of the archive by request"""
+        count = 0
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline() or '{}')
+            if header.get('format') != ARCHIVE_FORMAT:
+                raise ValueError(f"{self.path} is not a CoinGecko recording")
+            try:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry.get('encoding') == 'zlib-hex':
+                        entry['body'] = zlib.decompress(bytes.fromhex(entry['body']))
+                    else:
+                        entry['body'] = entry['body'].encode('utf-8')
+                    self.responses[_lookup_key(entry['path'], entry['params'])].append(entry)
+                    count += 1
+            except (EOFError, json.JSONDecodeError):
+                # A recording interrupted before close() ends with a truncated line
+                self.logger.warning(f"{self.path} is truncated, replaying its first {count} responses")
+        self.logger.info(f"Loaded {count} recorded responses from {self.path}")
+
+    def next_entry(self, url):
+        """
+        Take the next recorded response to a request.
+
+        :param url: Full request URL
+        :return: Recorded entry, or None if the request was not recorded
+        """
+        path, params = request_key(url)
+        with self.lock:
+            entries = self.responses.get(_lookup_key(path, params))
+            if not entries:
+                # /ping is answered anyway
+                self.missing += not path.endswith('/ping')
+                return None
+            self.served += 1
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def create_rate_limiter(self, requests_per_minute=30, burst=1):
+        """
+        Create the rate limiter of a client replaying this archive, as fast as the replay speed.
+
+        :param requests_per_minute: Budget the recording was made with
+        :param burst: Number of requests that may be sent back to back
+        :return: RateLimiter
+        """
+        if not self.speed:
+            return RateLimiter(requests_per_minute=UNLIMITED_REQUESTS_PER_MINUTE, burst=burst, base_backoff=0.0)
+        return RateLimiter(requests_per_minute=requests_per_minute * self.speed, burst=burst,
+                           base_backoff=1.0 / self.speed)
+
+    def get_stats(self):
+        """
+        Return replay statistics.
+
+        :return: Dict with the number of responses served and of requests that were not recorded,
+                 /ping aside
+        """
+        with self.lock:
+            return {'served': self.served, 'missing': self.missing}
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter writing every response it receives to a ResponseRecorder.
+    """
+
+    def __init__(self, recorder, **kwargs):
+        self.recorder = recorder
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        # Read the body here, so its transfer counts in the recorded latency
+        response.content
+        self.recorder.record(response, started, time.perf_counter() - started)
+        return response
+
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    HTTPAdapter answering every request from a ResponseReplayer instead of the network.
+    """
+
+    def __init__(self, replayer, **kwargs):
+        self.replayer = replayer
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        entry = self.replayer.next_entry(request.url)
+        speed = self.replayer.speed
+        headers = CaseInsensitiveDict({'Content-Type': 'application/json'})
+        if entry is None:
+            if request_key(request.url)[0].endswith('/ping'):
+                status, body = 200, b'{"gecko_says": "(V3) To the Moon!"}'
+            else:
+                self.replayer.logger.warning(f"No recorded response for {request_key(request.url)}")
+                status, body = 404, b'{"error": "Not recorded"}'
+        else:
+            status, body = entry['status'], entry['body']
+            if entry.get('retry_after') is not None:
+                try:
+                    headers['Retry-After'] = f"{float(entry['retry_after']) / speed:g}" if speed else '0'
+                except ValueError:
+                    headers['Retry-After'] = entry['retry_after']
+            if speed:
+                time.sleep(entry['elapsed'] / speed)
+
+        response = Response()
+        response.status_code = status
+        response.headers = headers
+        response._content = body
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.reason = 'OK' if status < 400 else 'Replayed error'
+        return response
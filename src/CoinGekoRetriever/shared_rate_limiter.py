@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from .rate_limiter import RateLimiter
+
+
+class _FileStateLock:
+    """
+    Lock guarding a RateLimiter whose state lives in a file.
+
+    Entering takes the thread lock, then an exclusive lock on <state_file>.lock, and loads the
+    shared state into the limiter; leaving saves the state back and releases both locks.
+    """
+
+    def __init__(self, limiter, state_file):
+        self.limiter = limiter
+        self.state_file = state_file
+        self.thread_lock = threading.Lock()
+        self.lock_fd = None
+
+    def _lock_file(self):
+        self.lock_fd = os.open(f"{self.state_file}.lock", os.O_RDWR | os.O_CREAT)
+        if fcntl:
+            fcntl.flock(self.lock_fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(self.lock_fd, msvcrt.LK_LOCK, 1)
+
+    def _unlock_file(self):
+        try:
+            if fcntl:
+                fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self.lock_fd, 0, os.SEEK_SET)
+                msvcrt.locking(self.lock_fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self.lock_fd)
+            self.lock_fd = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            self._lock_file()
+            self.limiter._load_state()
+        except BaseException:
+            if self.lock_fd is not None:
+                self._unlock_file()
+            self.thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.limiter._save_state()
+        finally:
+            self._unlock_file()
+            self.thread_lock.release()
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Token bucket shared by several processes on the same host through a state file.
+
+    Every process sharding a backfill points at the same file, so they spend one global request
+    budget, pause together on a 429 and shrink or grow the budget together.
+    """
+
+    SHARED_FIELDS = ('tokens', 'last_refill', 'blocked_until', 'rate', 'next_shrink', 'successes')
+
+    def __init__(self, state_file, requests_per_minute=30, **kwargs):
+        """
+        Initialize the limiter. The first process to use the file sets its budget.
+
+        :param state_file: JSON file holding the bucket shared by the processes
+        :param requests_per_minute: Maximum request budget per minute, across every process
+        :param kwargs: Other RateLimiter parameters
+        """
+        super().__init__(requests_per_minute=requests_per_minute, **kwargs)
+        # Wall-clock time, so every process reads the same clock
+        self.clock = time.time
+        self.last_refill = self.clock()
+        self.state_file = state_file
+        self.lock = _FileStateLock(self, state_file)
+
+    def _load_state(self):
+        """Load the shared bucket, if a process already wrote it"""
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (IOError, ValueError):
+            return
+        for field in self.SHARED_FIELDS:
+            if field in state:
+                setattr(self, field, state[field])
+
+    def _save_state(self):
+        """Write the shared bucket back"""
+        tmp_path = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({field: getattr(self, field) for field in self.SHARED_FIELDS}, f)
+        os.replace(tmp_path, self.state_file)
@@ -0,0 +1,214 @@
+import os
+import json
+import uuid
+import zlib
+import logging
+from datetime import datetime, date, timezone
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class ColumnarStore:
+    """
+    Partitioned Parquet storage for daily coin data.
+
+    Rows are appended as Parquet files partitioned by coin and month:
+    <root_dir>/coin=<coin_id>/month=<YYYY-MM>/part-<timestamp>-<id>.parquet
+    The raw API payload is kept zlib-compressed in the raw_payload column.
+    """
+
+    SCHEMA = pa.schema([
+        ('coin_id', pa.string()),
+        ('date', pa.date32()),
+        ('price_usd', pa.float64()),
+        ('market_cap_usd', pa.float64()),
+        ('volume_usd', pa.float64()),
+        ('raw_payload', pa.binary())
+    ])
+    VALUE_COLUMNS = ['coin_id', 'date', 'price_usd', 'market_cap_usd', 'volume_usd']
+
+    def __init__(self, root_dir='coin_data_parquet', compression='zstd'):
+        """
+        Initialize the store.
+
+        :param root_dir: Directory holding the partitions
+        :param compression: Parquet compression codec
+        """
+        self.root_dir = root_dir
+        self.compression = compression
+        self.logger = logging.getLogger(__name__)
+
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _partition_dir(self, coin_id, month):
+        return os.path.join(self.root_dir, f"coin={coin_id}", f"month={month}")
+
+    @staticmethod
+    def _to_date(value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return date.fromisoformat(value)
+
+    @staticmethod
+    def _months(start_date, end_date):
+        """List the YYYY-MM months between two dates"""
+        months = []
+        year, month = start_date.year, start_date.month
+        while (year, month) <= (end_date.year, end_date.month):
+            months.append(f"{year:04d}-{month:02d}")
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return months
+
+    @staticmethod
+    def _compress_payload(row):
+        raw = row.get('raw_response')
+        if raw is None:
+            raw = json.dumps(row.get('full_response'))
+        return zlib.compress(raw.encode('utf-8') if isinstance(raw, str) else raw)
+
+    def append(self, rows):
+        """
+        Append daily rows, writing one new Parquet file per (coin, month) partition touched.
+
+        :param rows: List of dicts with coin_id, date (YYYY-MM-DD), price_usd, market_cap_usd,
+                     volume_usd and full_response keys; the response body under raw_response,
+                     if any, is compressed as is instead of serializing full_response. Rows with
+                     prices_only set keep the payload already stored for their coin-day, if any.
+        :return: Number of rows written
+        """
+        partitions = {}
+        for row in rows:
+            row_date = self._to_date(row['date'])
+            partitions.setdefault((row['coin_id'], row_date.strftime('%Y-%m')), []).append((row_date, row))
+
+        written_at = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        for (coin_id, month), partition_rows in partitions.items():
+            stored_payloads = {}
+            if any(row.get('prices_only') for _, row in partition_rows):
+                row_dates = [row_date for row_date, _ in partition_rows]
+                stored = self._read_partitions([coin_id], min(row_dates), max(row_dates),
+                                               ['coin_id', 'date', 'raw_payload'])
+                stored_payloads = dict(zip(stored['date'], stored['raw_payload']))
+            table = pa.Table.from_pydict({
+                'coin_id': [coin_id] * len(partition_rows),
+                'date': [row_date for row_date, _ in partition_rows],
+                'price_usd': [row.get('price_usd') for _, row in partition_rows],
+                'market_cap_usd': [row.get('market_cap_usd') for _, row in partition_rows],
+                'volume_usd': [row.get('volume_usd') for _, row in partition_rows],
+                'raw_payload': [
+                    stored_payloads.get(row_date) if row.get('prices_only') and row_date in stored_payloads
+                    else self._compress_payload(row)
+                    for row_date, row in partition_rows
+                ]
+            }, schema=self.SCHEMA)
+
+            partition_dir = self._partition_dir(coin_id, month)
+            os.makedirs(partition_dir, exist_ok=True)
+            pq.write_table(
+                table,
+                os.path.join(partition_dir, f"part-{written_at}-{uuid.uuid4().hex[:8]}.parquet"),
+                compression=self.compression
+            )
+
+        self.logger.info(f"Appended {len(rows)} rows to {len(partitions)} partitions")
+        return len(rows)
+
+    def _partition_files(self, coin_id, month):
+        """List the part files of a partition, oldest first"""
+        partition_dir = self._partition_dir(coin_id, month)
+        if not os.path.isdir(partition_dir):
+            return []
+        return sorted(
+            os.path.join(partition_dir, name)
+            for name in os.listdir(partition_dir) if name.endswith('.parquet')
+        )
+
+    def _read_partitions(self, coin_ids, start_date, end_date, columns):
+        """Read the rows of the requested partitions, keeping the latest version of each coin-day"""
+        start_date, end_date = self._to_date(start_date), self._to_date(end_date)
+        filters = [('date', '>=', start_date), ('date', '<=', end_date)]
+
+        tables = []
+        for coin_id in coin_ids:
+            for month in self._months(start_date, end_date):
+                for path in self._partition_files(coin_id, month):
+                    table = pq.read_table(path, columns=columns, filters=filters)
+                    tables.append(table.append_column('_part', pa.array([len(tables)] * table.num_rows, pa.int64())))
+
+        if not tables:
+            return pd.DataFrame(columns=columns)
+
+        df = pa.concat_tables(tables).to_pandas()
+        df = df.sort_values(['coin_id', 'date', '_part'])
+        df = df.drop_duplicates(['coin_id', 'date'], keep='last').drop(columns='_part')
+        return df.reset_index(drop=True)
+
+    def read(self, coin_ids, start_date, end_date, columns=None, include_raw=False):
+        """
+        Load the rows of a set of coins over a date range.
+
+        Only the (coin, month) partitions overlapping the range are opened.
+
+        :param coin_ids: List of coin identifiers
+        :param start_date: First date (YYYY-MM-DD, date or datetime)
+        :param end_date: Last date (YYYY-MM-DD, date or datetime)
+        :param columns: Value columns to load (default: all but raw_payload)
+        :param include_raw: Also load the raw payloads, decompressed into a full_response column
+        :return: DataFrame sorted by coin and date
+        """
+        columns = list(columns or self.VALUE_COLUMNS)
+        for key in ('coin_id', 'date'):
+            if key not in columns:
+                columns.append(key)
+        if include_raw:
+            columns.append('raw_payload')
+
+        df = self._read_partitions(coin_ids, start_date, end_date, columns)
+        if include_raw:
+            df['full_response'] = [json.loads(zlib.decompress(raw)) for raw in df.pop('raw_payload')]
+        return df
+
+    def load_raw_payload(self, coin_id, day):
+        """
+        Load the raw API payload of a coin-day.
+
+        :param coin_id: Coin identifier
+        :param day: Date (YYYY-MM-DD, date or datetime)
+        :return: Parsed payload, or None if the coin-day is not stored
+        """
+        df = self._read_partitions([coin_id], day, day, ['coin_id', 'date', 'raw_payload'])
+        if df.empty:
+            return None
+        return json.loads(zlib.decompress(df['raw_payload'].iloc[-1]))
+
+    def compact(self, coin_id, month):
+        """
+        Merge the part files of a partition into one, keeping the latest version of each coin-day.
+
+        :param coin_id: Coin identifier
+        :param month: Month of the partition (YYYY-MM)
+        :return: Number of rows in the compacted partition
+        """
+        files = self._partition_files(coin_id, month)
+        if len(files) <= 1:
+            return sum(pq.read_metadata(path).num_rows for path in files)
+
+        first_day = date.fromisoformat(f"{month}-01")
+        last_day = (pd.Timestamp(first_day) + pd.offsets.MonthEnd(0)).date()
+        df = self._read_partitions([coin_id], first_day, last_day, list(self.SCHEMA.names))
+
+        table = pa.Table.from_pandas(df, schema=self.SCHEMA, preserve_index=False)
+        written_at = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        pq.write_table(
+            table,
+            os.path.join(self._partition_dir(coin_id, month), f"part-{written_at}-compacted.parquet"),
+            compression=self.compression
+        )
+        for path in files:
+            os.remove(path)
+
+        self.logger.info(f"Compacted {len(files)} files of {coin_id} {month} into one")
+        return table.num_rows
@@ -0,0 +1,216 @@
+import logging
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+
+from .time_series_features import group_positions, lag_matrix, window_stats
+
+FEATURES_TABLE = 'cryptocurrency_daily_features'
+
+# Features of the table: price_lag_1 ... price_lag_7, price_7d_mean/std/skew over the day and
+# the 6 before it, and price_7d_variance over the day and the 7 before it (as in add_features)
+LAGS = 7
+WINDOW = 7
+TREND_DAYS = 7
+# Stored days before a day that its features depend on
+CONTEXT_DAYS = max(LAGS, WINDOW - 1, TREND_DAYS)
+
+FEATURE_COLUMNS = (['price_usd'] + [f'price_lag_{lag}' for lag in range(1, LAGS + 1)] +
+                   [f'price_{WINDOW}d_mean', f'price_{WINDOW}d_std', f'price_{WINDOW}d_skew',
+                    f'price_{TREND_DAYS}d_variance'])
+
+
+def compute_features(coins, prices):
+    """
+    Compute the stored features of every row, over arrays sorted by coin and date.
+
+    Rows only see the rows before them in the arrays, so the first CONTEXT_DAYS rows of a coin
+    get incomplete lags and windows unless they are the first days of its history.
+
+    :param coins: Array of coin identifiers
+    :param prices: Float array
+    :return: Float array of shape (rows, len(FEATURE_COLUMNS))
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    positions, _ = group_positions(np.asarray(coins))
+    price_lags = lag_matrix(prices, positions, CONTEXT_DAYS)
+    mean, std, skew, _ = window_stats(price_lags[:, :WINDOW])
+    _, _, _, variance = window_stats(price_lags[:, :TREND_DAYS + 1], min_periods=TREND_DAYS + 1)
+    return np.column_stack([prices, price_lags[:, 1:LAGS + 1], mean, std, skew, variance])
+
+
+class FeatureStore:
+    """
+    Keeps the lag and rolling window features of every stored coin-day in cryptocurrency_daily_features.
+
+    Features are computed when prices are stored, from the prices themselves and the CONTEXT_DAYS
+    stored days before them, so a daily run costs O(new days x window) whatever the length of the
+    history. Days stored after the new ones are recomputed as well, since a backfilled gap shifts
+    their lags, but rows whose features did not change are left untouched: appending a day only
+    inserts its row.
+    """
+
+    def __init__(self, pg_connector):
+        """
+        Initialize the store.
+
+        :param pg_connector: Connected PGConnector; the table is created by its create_tables()
+        """
+        self.pg_connector = pg_connector
+        self.logger = logging.getLogger(__name__)
+
+    def update(self, coin_dates):
+        """
+        Compute the features of coin-days whose prices were just stored, in one transaction.
+
+        :param coin_dates: Iterable of (coin_id, date) pairs, dates as YYYY-MM-DD, date or datetime
+        :return: Number of feature rows inserted or changed, or None if the update failed
+        """
+        ranges = {}
+        for coin_id, day in coin_dates:
+            day = pd.Timestamp(day).date()
+            first, last = ranges.get(coin_id, (day, day))
+            ranges[coin_id] = (min(first, day), max(last, day))
+        if not ranges:
+            return 0
+
+        try:
+            count = self._update_ranges(ranges)
+            self.logger.info(f"Updated {count} feature rows of {len(ranges)} coins")
+            return count
+        except (Exception, psycopg2.Error) as error:
+            self.logger.error(f"Error updating features: {error}")
+            return None
+
+    def _update_ranges(self, ranges):
+        """
+        Recompute the features from the first to the last date of every coin, and of the
+        CONTEXT_DAYS stored days after it.
+
+        :param ranges: Dict mapping coin_id to (first date, last date)
+        :return: Number of feature rows inserted or changed
+        """
+        # Writers updating the same coin wait for each other, in the same order to avoid deadlocks
+        lock_query = f"""
+        SELECT pg_advisory_xact_lock(hashtext('{FEATURES_TABLE}:' || coin_id))
+        FROM unnest(%s::varchar[]) AS c(coin_id);
+        """
+        # The stored days read for each coin: its context, its range and the days that depend on it
+        prices_query = f"""
+        SELECT k.coin_id, p.date, p.price_usd::float8, p.date >= k.first_date AS written
+        FROM unnest(%s::varchar[], %s::date[], %s::date[]) AS k(coin_id, first_date, last_date)
+        CROSS JOIN LATERAL (
+            (SELECT date, price_usd FROM cryptocurrency_daily_prices
+             WHERE coin_id = k.coin_id AND date < k.first_date
+             ORDER BY date DESC LIMIT {CONTEXT_DAYS})
+            UNION ALL
+            (SELECT date, price_usd FROM cryptocurrency_daily_prices
+             WHERE coin_id = k.coin_id AND date BETWEEN k.first_date AND k.last_date)
+            UNION ALL
+            (SELECT date, price_usd FROM cryptocurrency_daily_prices
+             WHERE coin_id = k.coin_id AND date > k.last_date
+             ORDER BY date LIMIT {CONTEXT_DAYS})
+        ) p
+        ORDER BY k.coin_id, p.date;
+        """
+        columns = ', '.join(FEATURE_COLUMNS)
+        updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in FEATURE_COLUMNS)
+        excluded = ', '.join(f'EXCLUDED.{column}' for column in FEATURE_COLUMNS)
+        upsert_query = f"""
+        INSERT INTO {FEATURES_TABLE} AS f (coin_id, date, {columns})
+        VALUES %s
+        ON CONFLICT (coin_id, date) DO UPDATE
+        SET {updates}, computed_at = CURRENT_TIMESTAMP
+        WHERE ({', '.join(f'f.{column}' for column in FEATURE_COLUMNS)}) IS DISTINCT FROM ({excluded})
+        RETURNING 1;
+        """
+        coin_ids = sorted(ranges)
+        with self.pg_connector.borrow_connection() as (connection, cursor):
+            cursor.execute(lock_query, (coin_ids,))
+            cursor.execute(prices_query, (coin_ids, [ranges[coin_id][0] for coin_id in coin_ids],
+                                          [ranges[coin_id][1] for coin_id in coin_ids]))
+            records = cursor.fetchall()
+            count = 0
+            if records:
+                coins, dates, prices, written = (np.array(column, dtype=object) for column in zip(*records))
+                features = compute_features(coins, prices.astype(np.float64))
+                written = written.astype(bool)
+                # NULL rather than NaN for the lags and windows that do not exist
+                values = [
+                    (coin_id, day, *(None if np.isnan(value) else float(value) for value in row))
+                    for coin_id, day, row in zip(coins[written], dates[written], features[written])
+                ]
+                if values:
+                    count = len(execute_values(cursor, upsert_query, values, page_size=len(values), fetch=True))
+            connection.commit()
+        return count
+
+    def rebuild(self, coin_ids=None):
+        """
+        Compute the features of the whole stored history, one coin and transaction at a time.
+
+        Used to fill the table for prices stored before it existed; rows already up to date are
+        left untouched.
+
+        :param coin_ids: Coins to rebuild (default: every coin)
+        :return: Number of feature rows inserted or changed, or None if a coin failed
+        """
+        ranges_query = """
+        SELECT coin_id, MIN(date), MAX(date)
+        FROM cryptocurrency_daily_prices
+        WHERE %(coin_ids)s::varchar[] IS NULL OR coin_id = ANY(%(coin_ids)s::varchar[])
+        GROUP BY coin_id
+        ORDER BY coin_id;
+        """
+        try:
+            with self.pg_connector.borrow_connection() as (connection, cursor):
+                cursor.execute(ranges_query, {'coin_ids': list(coin_ids) if coin_ids else None})
+                ranges = cursor.fetchall()
+                connection.commit()
+
+            count = 0
+            for coin_id, first, last in ranges:
+                count += self._update_ranges({coin_id: (first, last)})
+            self.logger.info(f"Rebuilt {count} feature rows of {len(ranges)} coins")
+            return count
+        except (Exception, psycopg2.Error) as error:
+            self.logger.error(f"Error rebuilding features: {error}")
+            return None
+
+    def load(self, coin_ids=None, start_date=None, end_date=None, chunk_size=10000):
+        """
+        Read the stored features, with the price of the next stored day as target_price.
+
+        :param coin_ids: Coins to read (default: every coin)
+        :param start_date: First date (YYYY-MM-DD, default: no lower bound)
+        :param end_date: Last date (YYYY-MM-DD, default: no upper bound)
+        :param chunk_size: Rows fetched from the server at a time
+        :return: DataFrame with coin_id, date (datetime64), the feature columns and target_price,
+                 sorted by coin and date
+        """
+        load_query = f"""
+        SELECT f.coin_id, f.date, {', '.join(f'f.{column}' for column in FEATURE_COLUMNS)},
+               n.price_usd::float8 AS target_price
+        FROM {FEATURES_TABLE} f
+        LEFT JOIN LATERAL (
+            SELECT price_usd FROM cryptocurrency_daily_prices p
+            WHERE p.coin_id = f.coin_id AND p.date > f.date
+            ORDER BY p.date LIMIT 1
+        ) n ON TRUE
+        WHERE (%(coin_ids)s::varchar[] IS NULL OR f.coin_id = ANY(%(coin_ids)s::varchar[]))
+          AND (%(start_date)s::date IS NULL OR f.date >= %(start_date)s::date)
+          AND (%(end_date)s::date IS NULL OR f.date <= %(end_date)s::date)
+        ORDER BY f.coin_id, f.date;
+        """
+        params = {
+            'coin_ids': list(coin_ids) if coin_ids else None,
+            'start_date': start_date,
+            'end_date': end_date
+        }
+        columns = ['coin_id', 'date'] + FEATURE_COLUMNS + ['target_price']
+        dtypes = {column: 'float64' for column in FEATURE_COLUMNS + ['target_price']}
+        chunks = list(self.pg_connector.iter_query(load_query, chunk_size, params, dtypes=dtypes))
+        frame = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns).astype(dtypes)
+        frame['date'] = pd.to_datetime(frame['date'])
+        return frame
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+RISK_LEVELS = np.array(['Low Risk', 'Medium Risk', 'High Risk'], dtype=object)
+
+
+def month_groups(coins, dates):
+    """
+    Index the (coin, month) groups of rows sorted by coin and date.
+
+    :param coins: Array of coin identifiers
+    :param dates: datetime64 array
+    :return: Tuple (group index of every row, first row of every group)
+    """
+    months = dates.astype('datetime64[M]')
+    starts = np.ones(len(coins), dtype=bool)
+    starts[1:] = (coins[1:] != coins[:-1]) | (months[1:] != months[:-1])
+    return np.cumsum(starts) - 1, np.flatnonzero(starts)
+
+
+def _forward_fill(values, group_ids):
+    """
+    Replace NaN with the last value of the same group before them, as pct_change pads prices.
+    """
+    rows = np.arange(len(values))
+    last_valid = np.maximum.accumulate(np.where(np.isnan(values), -1, rows))
+    filled = values[np.maximum(last_valid, 0)]
+    filled[(last_valid < 0) | (group_ids[np.maximum(last_valid, 0)] != group_ids)] = np.nan
+    return filled
+
+
+def monthly_risk_levels(coins, dates, prices, high_drop=0.5, medium_drop=0.2):
+    """
+    Classify every (coin, month) by its consecutive daily price drops, over arrays sorted by coin and date.
+
+    A month is 'High Risk' if the price dropped by high_drop or more on two consecutive days,
+    'Medium Risk' for medium_drop or more, and 'Low Risk' otherwise. Drops are daily changes
+    within the month: the first day of a month is not compared with the last day of the previous one.
+
+    :param coins: Array of coin identifiers
+    :param dates: datetime64 array
+    :param prices: Float array
+    :param high_drop: Daily drop of a high-risk month, as a fraction (0.5 for 50%)
+    :param medium_drop: Daily drop of a medium-risk month, as a fraction
+    :return: Tuple (group index of every row, first row of every group, risk level of every group)
+    """
+    group_ids, group_starts = month_groups(coins, dates)
+    if not len(group_starts):
+        return group_ids, group_starts, RISK_LEVELS[:0]
+
+    prices = _forward_fill(np.asarray(prices, dtype=np.float64), group_ids)
+    same_group = group_ids[1:] == group_ids[:-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        changes = np.where(same_group, prices[1:] / prices[:-1] - 1, np.nan)
+
+    levels = np.zeros(len(group_starts), dtype=np.int64)
+    for level, drop in ((1, medium_drop), (2, high_drop)):
+        drops = changes <= -drop
+        # changes[i] is the change of row i + 1, so two drops in a row end on row i + 2
+        consecutive = np.zeros(len(prices), dtype=np.int64)
+        consecutive[2:] = drops[1:] & drops[:-1]
+        levels = np.maximum(levels, level * np.maximum.reduceat(consecutive, group_starts))
+    return group_ids, group_starts, RISK_LEVELS[levels]
+
+
+def classify_risk_levels(coin_data, high_drop=0.5, medium_drop=0.2):
+    """
+    Classify the risk of every coin and month, in one pass over the whole frame.
+
+    Vectorized replacement of the notebook's groupby(['coin', 'year_month']).apply(calculate_risk_level).
+
+    :param coin_data: DataFrame with coin, date and price columns
+    :param high_drop: Daily drop of a high-risk month, as a fraction (0.5 for 50%)
+    :param medium_drop: Daily drop of a medium-risk month, as a fraction
+    :return: DataFrame with coin, year_month (monthly Period) and risk_level columns, sorted by coin and month
+    """
+    frame = coin_data[['coin', 'date', 'price']].copy()
+    frame['date'] = pd.to_datetime(frame['date'])
+    frame = frame.sort_values(['coin', 'date'])
+
+    dates = frame['date'].to_numpy()
+    _, group_starts, levels = monthly_risk_levels(frame['coin'].to_numpy(), dates, frame['price'].to_numpy(),
+                                                  high_drop, medium_drop)
+    return pd.DataFrame({
+        'coin': frame['coin'].to_numpy()[group_starts],
+        'year_month': pd.PeriodIndex(dates[group_starts], freq='M'),
+        'risk_level': levels
+    })
@@ -0,0 +1,237 @@
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import holidays
+
+from .risk_levels import monthly_risk_levels
+
+# Holiday flag columns (is_<name>_holiday) and the country whose calendar they use
+HOLIDAY_COUNTRIES = {'us': 'US', 'china': 'CN'}
+
+
+def group_positions(coins):
+    """
+    Locate every row within its coin, for rows sorted by coin.
+
+    :param coins: Array of coin identifiers, each coin's rows contiguous
+    :return: Tuple (position of the row within its coin, 0-based index of its coin)
+    """
+    count = len(coins)
+    starts = np.ones(count, dtype=bool)
+    starts[1:] = coins[1:] != coins[:-1]
+    rows = np.arange(count)
+    start_rows = np.maximum.accumulate(np.where(starts, rows, 0)) if count else rows
+    return rows - start_rows, np.cumsum(starts) - 1
+
+
+def lag_matrix(values, positions, lags):
+    """
+    Stack the values of the previous days of each row.
+
+    :param values: Float array sorted by coin and date
+    :param positions: Positions of the rows within their coin, from group_positions()
+    :param lags: Number of previous days
+    :return: Array of shape (rows, lags + 1) whose column k holds the value k days earlier,
+             NaN before the first day of the coin
+    """
+    matrix = np.full((len(values), lags + 1), np.nan)
+    for lag in range(lags + 1):
+        matrix[lag:, lag] = values[:len(values) - lag]
+        matrix[positions < lag, lag] = np.nan
+    return matrix
+
+
+def next_values(values, group_ids):
+    """
+    Return the value of the next day of each row, NaN on the last day of a coin.
+
+    :param values: Float array sorted by coin and date
+    :param group_ids: Coin index of every row, from group_positions()
+    :return: Float array
+    """
+    result = np.full(len(values), np.nan)
+    same_coin = group_ids[1:] == group_ids[:-1]
+    result[:-1][same_coin] = values[1:][same_coin]
+    return result
+
+
+def window_stats(windows, min_periods=1):
+    """
+    Compute the mean, sample standard deviation and skewness of each row of a window matrix,
+    ignoring NaN, with the conventions of pandas rolling windows.
+
+    :param windows: Array of shape (rows, window), e.g. the first columns of a lag_matrix()
+    :param min_periods: Minimum number of values for a result, NaN otherwise
+    :return: Tuple of float arrays (mean, std, skew, variance)
+    """
+    valid = ~np.isnan(windows)
+    count = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(valid, windows, 0.0).sum(axis=1) / count
+        deviations = np.where(valid, windows - mean[:, None], 0.0)
+        squares = deviations * deviations
+        m2 = squares.sum(axis=1)
+        m3 = (squares * deviations).sum(axis=1)
+
+        variance = np.where(count >= 2, m2 / (count - 1), np.nan)
+        b = m2 / count
+        skew = np.sqrt(count * (count - 1.0)) * (m3 / count) / ((count - 2.0) * b * np.sqrt(b))
+    constant = (np.where(valid, windows, np.inf).min(axis=1) == np.where(valid, windows, -np.inf).max(axis=1))
+    # Same conventions as pandas: no skew below 3 values, 0 for a constant window and
+    # NaN for variances lost in floating point noise
+    skew = np.where(count < 3, np.nan, np.where(constant, 0.0, np.where(b <= 1e-14, np.nan, skew)))
+
+    too_few = count < min_periods
+    mean[too_few] = variance[too_few] = skew[too_few] = np.nan
+    return mean, np.sqrt(variance), skew, variance
+
+
+def standardize_by_group(matrix, group_ids):
+    """
+    Standardize every column to zero mean and unit variance within each coin, like a
+    StandardScaler fitted per coin: NaN are ignored and constant columns are only centered.
+
+    :param matrix: Float array of shape (rows, columns)
+    :param group_ids: Coin index of every row, from group_positions()
+    :return: Standardized copy of matrix
+    """
+    groups = group_ids[-1] + 1 if len(group_ids) else 0
+    result = np.empty_like(matrix)
+    for column in range(matrix.shape[1]):
+        values = matrix[:, column]
+        valid = ~np.isnan(values)
+        count = np.bincount(group_ids, weights=valid, minlength=groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.bincount(group_ids, weights=np.where(valid, values, 0.0), minlength=groups) / count
+            deviations = np.where(valid, values - mean[group_ids], 0.0)
+            variance = np.bincount(group_ids, weights=deviations ** 2, minlength=groups) / count
+        # Constant columns keep a scale of 1, as in StandardScaler
+        eps = np.finfo(np.float64).eps
+        scale = np.sqrt(variance)
+        scale[variance <= count * eps * variance + (count * mean * eps) ** 2] = 1.0
+        result[:, column] = (values - mean[group_ids]) / scale[group_ids]
+    return result
+
+
+@lru_cache(maxsize=None)
+def holiday_dates(country, first_year, last_year):
+    """
+    Return the holidays of a country over some years, computed once per process.
+
+    :param country: Country code of the holidays package, e.g. 'US'
+    :param first_year: First year
+    :param last_year: Last year (included)
+    :return: Sorted datetime64[D] array, observed days included
+    """
+    calendar = holidays.country_holidays(country, years=range(first_year, last_year + 1))
+    return np.array(sorted(calendar), dtype='datetime64[D]')
+
+
+def holiday_flags(dates, country):
+    """
+    Flag the dates that are holidays in a country.
+
+    :param dates: datetime64 array
+    :param country: Country code of the holidays package, e.g. 'US'
+    :return: int64 array of 0/1 flags
+    """
+    days = dates.astype('datetime64[D]')
+    if not len(days):
+        return np.zeros(0, dtype=np.int64)
+    years = days.astype('datetime64[Y]').astype(int) + 1970
+    return np.isin(days, holiday_dates(country, int(years.min()), int(years.max()))).astype(np.int64)
+
+
+def _sorted_frame(coin_data):
+    """
+    Copy the frame with datetime dates, sorted by coin and date, with the positions of its rows.
+    """
+    frame = coin_data.copy()
+    frame['date'] = pd.to_datetime(frame['date'])
+    frame = frame.sort_values(['coin', 'date'])
+    positions, group_ids = group_positions(frame['coin'].to_numpy())
+    return frame, positions, group_ids
+
+
+def create_time_series_features(coin_data, lags=7, window=7, scale=True):
+    """
+    Create the features of the Task 4 regression: lagged prices, next day's price as target,
+    calendar and holiday flags, rolling price (and volume) statistics.
+
+    Produces the same frame as the Task 4 notebook function of the same name, computed in one
+    pass over the rows sorted by coin and date: the lags and windows are columns of a lag
+    matrix, and the holidays are looked up in per-country date arrays computed once.
+
+    :param coin_data: DataFrame with coin, date and price columns, and optionally volume
+    :param lags: Number of lagged prices (price_lag_1 ... price_lag_<lags>)
+    :param window: Days of the rolling statistics (price_<window>d_mean, ...)
+    :param scale: Standardize the prices, lags and volume features within each coin
+    :return: New DataFrame sorted by coin and date, keeping the original index
+    """
+    frame, positions, group_ids = _sorted_frame(coin_data)
+    prices = frame['price'].to_numpy(dtype=np.float64)
+    price_lags = lag_matrix(prices, positions, max(lags, window - 1))
+
+    for lag in range(1, lags + 1):
+        frame[f'price_lag_{lag}'] = price_lags[:, lag]
+    frame['target_price'] = next_values(prices, group_ids)
+
+    dates = frame['date']
+    frame['day_of_week'] = dates.dt.dayofweek
+    frame['is_weekend'] = frame['day_of_week'].isin([5, 6]).astype(int)
+    frame['week_of_year'] = dates.dt.isocalendar().week
+    frame['month'] = dates.dt.month
+    frame['quarter'] = dates.dt.quarter
+    frame['day_of_month'] = dates.dt.day
+
+    for name, country in HOLIDAY_COUNTRIES.items():
+        frame[f'is_{name}_holiday'] = holiday_flags(dates.to_numpy(), country)
+    frame['is_any_holiday'] = (frame[[f'is_{name}_holiday' for name in HOLIDAY_COUNTRIES]].sum(axis=1) > 0).astype(int)
+
+    mean, std, skew, _ = window_stats(price_lags[:, :window])
+    frame[f'price_{window}d_mean'] = mean
+    frame[f'price_{window}d_std'] = std
+    frame[f'price_{window}d_skew'] = skew
+
+    numerical_cols = ['price'] + [f'price_lag_{lag}' for lag in range(1, lags + 1)]
+    if 'volume' in frame.columns:
+        volumes = frame['volume'].to_numpy(dtype=np.float64)
+        mean, std, _, _ = window_stats(lag_matrix(volumes, positions, window - 1))
+        frame[f'volume_{window}d_mean'] = mean
+        frame[f'volume_{window}d_std'] = std
+        frame['price_volume_ratio'] = frame['price'] / frame['volume']
+        numerical_cols.extend(['volume', f'volume_{window}d_mean', f'volume_{window}d_std', 'price_volume_ratio'])
+
+    if scale:
+        frame[numerical_cols] = standardize_by_group(frame[numerical_cols].to_numpy(dtype=np.float64), group_ids)
+    return frame
+
+
+def add_features(coin_data, trend_days=7, high_drop=0.5, medium_drop=0.2):
+    """
+    Add the Task 4 question 2 features: monthly risk level, variance of the price over the last
+    trend_days + 1 days, and price trend against trend_days days before.
+
+    Produces the same frame as the Task 4 notebook function of the same name.
+
+    :param coin_data: DataFrame with coin, date and price columns
+    :param trend_days: Days between the two prices compared by price_trend
+    :param high_drop: Daily drop of a high-risk month, see risk_levels.monthly_risk_levels
+    :param medium_drop: Daily drop of a medium-risk month
+    :return: New DataFrame sorted by coin and date, with a fresh RangeIndex
+    """
+    frame, positions, _ = _sorted_frame(coin_data)
+    frame = frame.reset_index(drop=True)
+
+    prices = frame['price'].to_numpy(dtype=np.float64)
+    month_ids, _, risk_levels = monthly_risk_levels(frame['coin'].to_numpy(), frame['date'].to_numpy(), prices,
+                                                    high_drop, medium_drop)
+    frame['risk_level'] = risk_levels[month_ids]
+
+    price_lags = lag_matrix(prices, positions, trend_days)
+    _, _, _, variance = window_stats(price_lags, min_periods=trend_days + 1)
+    frame[f'price_{trend_days}d_variance'] = variance
+
+    previous = price_lags[:, trend_days]
+    frame['price_trend'] = np.where(prices > previous, 'Upward', np.where(prices < previous, 'Downward', 'Stable'))
+    return frame
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+
+from .regression import feature_columns, _group_metrics
+
+
+class RecursiveLeastSquares:
+    """
+    A batch of linear regressions with intercept, updated one observation at a time.
+
+    Each model keeps the means of its observations, the scatter matrix of its centered features
+    (X'X around the means) and P, the inverse of that matrix plus ridge * I. Adding or removing
+    an observation changes the scatter matrix by a rank-one term (Welford's update), so P and the
+    coefficients follow with a Sherman-Morrison update in O(features^2), instead of a refit in
+    O(rows x features^2). As in LinearRegression the intercept is not penalized, and a feature
+    constant over the observations gets a zero coefficient. The scatter matrices are kept as
+    well, so P can be inverted again from them now and then to shed rounding drift.
+    """
+
+    def __init__(self, models, features, ridge=1e-6):
+        """
+        Initialize models fitted on no observation.
+
+        :param models: Number of models
+        :param features: Number of features
+        :param ridge: Ridge penalty; it keeps P defined while some features have not varied yet
+        """
+        self.ridge = ridge
+        self.counts = np.zeros(models, dtype=np.int64)
+        self.means = np.zeros((models, features))
+        self.target_means = np.zeros(models)
+        self.scatter = np.zeros((models, features, features))
+        self.cross = np.zeros((models, features))
+        self.inverse = np.tile(np.eye(features) / ridge, (models, 1, 1))
+        self.coefficients = np.zeros((models, features))
+
+    def predict(self, X, models=slice(None)):
+        """
+        Predict one observation per model.
+
+        :param X: Float array of shape (models, features)
+        :param models: Models predicting, a slice or index array matching the rows of X
+        :return: Float array of predictions
+        """
+        return self.target_means[models] + np.einsum('mf,mf->m', X - self.means[models], self.coefficients[models])
+
+    def _update(self, X, y, models, sign):
+        counts = self.counts[models]
+        new_counts = counts + sign
+        x_deviations = X - self.means[models]
+        y_deviations = y - self.target_means[models]
+        # The scatter changes by n / (n + 1) d d' for an added row, n / (n - 1) d d' for a removed one
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weights = np.where(new_counts > 0, counts / new_counts, 0.0)
+            steps = np.where(new_counts > 0, 1.0 / new_counts, 0.0)
+        u = x_deviations * np.sqrt(weights)[:, None]
+        t = y_deviations * np.sqrt(weights)
+
+        pu = np.einsum('mij,mj->mi', self.inverse[models], u)
+        gain = pu / (1.0 + sign * np.einsum('mi,mi->m', u, pu))[:, None]
+        residuals = t - np.einsum('mi,mi->m', u, self.coefficients[models])
+        self.coefficients[models] += sign * gain * residuals[:, None]
+        self.inverse[models] -= sign * np.einsum('mi,mj->mij', gain, pu)
+        self.scatter[models] += sign * np.einsum('mi,mj->mij', u, u)
+        self.cross[models] += sign * u * t[:, None]
+
+        self.means[models] += sign * x_deviations * steps[:, None]
+        self.target_means[models] += sign * y_deviations * steps
+        self.counts[models] = new_counts
+
+    def add(self, X, y, models=slice(None)):
+        """
+        Add one observation to each model.
+
+        :param X: Float array of shape (models, features)
+        :param y: Float array of targets
+        :param models: Models updated, a slice or index array matching the rows of X
+        """
+        self._update(X, y, models, 1)
+
+    def remove(self, X, y, models=slice(None)):
+        """
+        Remove an observation added before from each model, e.g. the oldest one of a sliding window.
+
+        :param X: Float array of shape (models, features)
+        :param y: Float array of targets
+        :param models: Models updated, a slice or index array matching the rows of X
+        """
+        self._update(X, y, models, -1)
+
+    def refresh(self, models=slice(None)):
+        """
+        Invert the regularized scatter matrices again, discarding the rounding errors of the updates.
+
+        :param models: Models refreshed
+        """
+        features = self.scatter.shape[1]
+        self.inverse[models] = np.linalg.inv(self.scatter[models] + self.ridge * np.eye(features))
+        self.coefficients[models] = np.einsum('mij,mj->mi', self.inverse[models], self.cross[models])
+
+    @property
+    def intercepts(self):
+        """Intercept of every model"""
+        return self.target_means - np.einsum('mf,mf->m', self.means, self.coefficients)
+
+
+def walk_forward_backtest(df, window=None, min_train=60, ridge=1e-6, refresh_every=50):
+    """
+    Backtest the per-coin linear regression of train_and_predict day by day, without look-ahead.
+
+    Every row of a coin is predicted by a model trained on the coin's rows before it only, with
+    an expanding window (every row before) or a sliding one (the last window rows), then added
+    to the model. Models are updated with RecursiveLeastSquares and every coin advances at
+    once: step k predicts and adds the k-th row of every coin long enough, so the whole backtest
+    costs about as much as one fit.
+
+    Rank-one updates lose precision on badly scaled features (raw prices next to 0/1 flags), so
+    each coin's features are standardized with the mean and deviation of its first min_train
+    rows, the models are fitted exactly on those rows, then updated and refreshed every
+    refresh_every steps. The ridge penalty applies to the standardized features; it only tells
+    the predictions apart from a refit where features are nearly collinear within the window.
+
+    Features scaled over the whole history (create_time_series_features(scale=True)) leak the
+    future into the past: build the frame with scale=False.
+
+    :param df: Frame built by create_time_series_features
+    :param window: Number of rows of the sliding window (default: expanding window)
+    :param min_train: Rows a model is trained on before its first prediction
+    :param ridge: Ridge penalty of the models, see RecursiveLeastSquares
+    :param refresh_every: Steps between two refreshes of the models (None to only fit them once)
+    :return: Tuple (rows without missing features, grouped by coin and sorted by date, with
+             predicted_price, NaN before min_train, and the error columns; dict mapping each coin
+             to the metrics of its predictions and its last coefficients)
+    """
+    if window is not None and window < min_train:
+        raise ValueError(f"The sliding window ({window} rows) must hold at least min_train ({min_train}) rows")
+
+    feature_cols = feature_columns(df)
+    complete = df[feature_cols + ['target_price']].notna().all(axis=1).to_numpy()
+    frame = df[complete].copy()
+    frame['date'] = pd.to_datetime(frame['date'])
+    coin_codes, coins = pd.factorize(frame['coin'])
+    frame = frame.iloc[np.lexsort((frame['date'].to_numpy(), coin_codes))]
+    coin_codes = np.sort(coin_codes)
+
+    X = frame[feature_cols].to_numpy(dtype=np.float64)
+    y = frame['target_price'].to_numpy(dtype=np.float64)
+    counts = np.bincount(coin_codes, minlength=len(coins))
+    starts = np.cumsum(counts) - counts
+
+    # Standardize with the rows every coin's first model is trained on, so nothing leaks from later rows
+    warmup = (np.arange(len(y)) - starts[coin_codes]) < min_train
+    warmup_counts = np.bincount(coin_codes[warmup], minlength=len(coins))[:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        offsets = np.stack([np.bincount(coin_codes[warmup], weights=X[warmup, column], minlength=len(coins))
+                            for column in range(X.shape[1])], axis=1) / warmup_counts
+        deviations = X[warmup] - offsets[coin_codes[warmup]]
+        scales = np.sqrt(np.stack([np.bincount(coin_codes[warmup], weights=deviations[:, column] ** 2,
+                                               minlength=len(coins))
+                                   for column in range(X.shape[1])], axis=1) / warmup_counts)
+    scales[~(scales > 0)] = 1.0
+    X = (X - offsets[coin_codes]) / scales[coin_codes]
+
+    # Longest histories first, so the coins still running at step k are the first models
+    order = np.argsort(-counts, kind='stable')
+    sorted_starts, sorted_counts = starts[order], counts[order]
+    models = RecursiveLeastSquares(len(coins), len(feature_cols), ridge)
+    predictions = np.full(len(y), np.nan)
+
+    for step in range(int(sorted_counts.max(initial=0))):
+        active = slice(0, int(np.searchsorted(-sorted_counts, -step, side='left')))
+        rows = sorted_starts[active] + step
+        if step >= min_train:
+            predictions[rows] = models.predict(X[rows], active)
+        models.add(X[rows], y[rows], active)
+        if window is not None and step >= window:
+            models.remove(X[rows - window], y[rows - window], active)
+        if step + 1 == min_train or (refresh_every and step >= min_train and (step + 1 - min_train) % refresh_every == 0):
+            models.refresh(active)
+
+    predicted = ~np.isnan(predictions)
+    metrics = _group_metrics(y[predicted], predictions[predicted], coin_codes[predicted], len(coins))
+    coef = np.empty_like(models.coefficients)
+    intercept = np.empty_like(models.intercepts)
+    coef[order], intercept[order] = models.coefficients, models.intercepts
+    # Back to the units of the features
+    coef = coef / scales
+    intercept = intercept - np.einsum('cf,cf->c', coef, offsets)
+
+    metrics_by_coin = {}
+    for code, coin in enumerate(coins):
+        metrics_by_coin[coin] = {
+            'mse': metrics['mse'][code],
+            'rmse': np.sqrt(metrics['mse'][code]),
+            'mae': metrics['mae'][code],
+            'r2': metrics['r2'][code],
+            'mape': metrics['mape'][code],
+            'feature_coefficients': dict(zip(feature_cols, coef[code])),
+            'intercept': intercept[code],
+            'n_predictions': int(metrics['count'][code])
+        }
+
+    frame['predicted_price'] = predictions
+    frame['prediction_error'] = frame['target_price'] - frame['predicted_price']
+    frame['absolute_error'] = abs(frame['prediction_error'])
+    frame['percentage_error'] = (frame['prediction_error'] / frame['target_price']) * 100
+    return frame, metrics_by_coin
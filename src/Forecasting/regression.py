@@ -0,0 +1,239 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+# Features of the Task 4 regression, and those added when the frame has a volume column
+FEATURE_COLUMNS = [
+    'price_lag_1', 'price_lag_2', 'price_lag_3', 'price_lag_4',
+    'price_lag_5', 'price_lag_6', 'price_lag_7',
+    'day_of_week', 'is_weekend', 'week_of_year', 'month',
+    'price_7d_mean', 'price_7d_std', 'price_7d_skew',
+    'is_us_holiday', 'is_china_holiday'
+]
+VOLUME_FEATURE_COLUMNS = ['volume_7d_mean', 'volume_7d_std', 'price_volume_ratio']
+
+
+def feature_columns(df):
+    """
+    Return the feature columns the regression uses for a frame.
+
+    :param df: Frame built by create_time_series_features
+    :return: List of column names
+    """
+    return FEATURE_COLUMNS + (VOLUME_FEATURE_COLUMNS if 'volume' in df.columns else [])
+
+
+@lru_cache(maxsize=None)
+def _cached_test_positions(count, test_size, random_state):
+    return np.sort(train_test_split(np.arange(count), test_size=test_size, random_state=random_state)[1])
+
+
+def split_test_positions(count, test_size=0.2, random_state=42):
+    """
+    Return the rows train_test_split puts in the test set, for a coin with count rows.
+
+    The split only depends on the number of rows, so with an integer random_state it is drawn
+    once per history length instead of once per coin.
+
+    :param count: Number of rows of the coin
+    :param test_size: Share of the rows in the test set
+    :param random_state: Seed of train_test_split (None for a different split every call)
+    :return: Sorted positions of the test rows
+    """
+    if isinstance(random_state, (int, np.integer)):
+        return _cached_test_positions(count, test_size, int(random_state))
+    return np.sort(train_test_split(np.arange(count), test_size=test_size, random_state=random_state)[1])
+
+
+def solve_padded_least_squares(X, y, counts, tol=1e-6):
+    """
+    Fit one linear regression with intercept per group, all groups at once.
+
+    Each group's rows are centered and copied into a zero-padded (groups, rows, features) array;
+    padding rows do not change a least-squares solution, so one batched SVD solves every group.
+    Singular values below tol times the largest are dropped, as LinearRegression(tol=tol) does
+    through scipy's lstsq, which gives the same minimum-norm solution on rank-deficient groups.
+
+    :param X: Float array of shape (rows, features), the rows of each group contiguous
+    :param y: Float array of shape (rows,)
+    :param counts: Number of rows of each group, in row order
+    :return: Tuple (coefficients of shape (groups, features), intercepts of shape (groups,)),
+             NaN for groups without rows
+    """
+    counts = np.asarray(counts)
+    groups, features = len(counts), X.shape[1]
+    group_ids = np.repeat(np.arange(groups), counts)
+    positions = np.arange(len(y)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = np.stack([np.bincount(group_ids, weights=X[:, column], minlength=groups)
+                           for column in range(features)], axis=1) / counts[:, None]
+        y_mean = np.bincount(group_ids, weights=y, minlength=groups) / counts
+
+    padded_X = np.zeros((groups, max(counts.max(initial=0), 1), features))
+    padded_y = np.zeros(padded_X.shape[:2])
+    padded_X[group_ids, positions] = X - x_mean[group_ids]
+    padded_y[group_ids, positions] = y - y_mean[group_ids]
+
+    U, S, Vt = np.linalg.svd(padded_X, full_matrices=False)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        inverse = np.where(S > tol * S[:, :1], 1.0 / S, 0.0)
+    coef = np.einsum('gkf,gk->gf', Vt, inverse * np.einsum('grk,gr->gk', U, padded_y))
+    intercept = y_mean - np.einsum('gf,gf->g', x_mean, coef)
+    coef[counts == 0] = np.nan
+    return coef, intercept
+
+
+def solve_grouped_least_squares(X, y, group_ids, groups=None, tol=1e-6, max_chunk_values=2 ** 24, processes=1):
+    """
+    Fit one linear regression with intercept per group, in batches of groups of similar size.
+
+    Groups are sorted by number of rows and cut into chunks whose padded array holds at most
+    max_chunk_values floats, each solved by solve_padded_least_squares. With processes above 1
+    the chunks are solved in a process pool, for models too large to solve in one process.
+
+    :param X: Float array of shape (rows, features)
+    :param y: Float array of shape (rows,)
+    :param group_ids: 0-based group index of every row, in any order
+    :param groups: Number of groups (default: the largest group index + 1)
+    :param tol: Relative cutoff of the singular values, as in LinearRegression
+    :param max_chunk_values: Maximum size of the padded array of a chunk
+    :param processes: Number of processes solving chunks in parallel
+    :return: Tuple (coefficients of shape (groups, features), intercepts of shape (groups,))
+    """
+    X, y, group_ids = np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64), np.asarray(group_ids)
+    if groups is None:
+        groups = int(group_ids.max()) + 1 if len(group_ids) else 0
+    counts = np.bincount(group_ids, minlength=groups)
+    group_order = np.argsort(counts, kind='stable')
+    ranks = np.empty(groups, dtype=np.int64)
+    ranks[group_order] = np.arange(groups)
+    rows = np.argsort(ranks[group_ids], kind='stable')
+    sorted_counts = counts[group_order]
+    offsets = np.concatenate([[0], np.cumsum(sorted_counts)])
+
+    # Counts are ascending, so the last group of a chunk sets the padded size of the chunk
+    chunks, start = [], 0
+    for end in range(1, groups + 1):
+        if end - 1 > start and (end - start) * sorted_counts[end - 1] * X.shape[1] > max_chunk_values:
+            chunks.append((start, end - 1))
+            start = end - 1
+    if groups:
+        chunks.append((start, groups))
+
+    arguments = [
+        (X[rows[offsets[first]:offsets[last]]], y[rows[offsets[first]:offsets[last]]], sorted_counts[first:last], tol)
+        for first, last in chunks
+    ]
+    if processes > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(solve_padded_least_squares, *zip(*arguments)))
+    else:
+        results = [solve_padded_least_squares(*chunk_arguments) for chunk_arguments in arguments]
+
+    coef = np.full((groups, X.shape[1]), np.nan)
+    intercept = np.full(groups, np.nan)
+    for (first, last), (chunk_coef, chunk_intercept) in zip(chunks, results):
+        coef[group_order[first:last]] = chunk_coef
+        intercept[group_order[first:last]] = chunk_intercept
+    return coef, intercept
+
+
+def _group_metrics(y, predictions, keys, size):
+    """
+    Compute the regression metrics of every group of rows at once, as the sklearn metrics do.
+
+    :return: Dict of arrays of length size: count, mse, mae, r2 and mape (in %)
+    """
+    count = np.bincount(keys, minlength=size)
+    residuals = y - predictions
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(keys, weights=y, minlength=size) / count
+        ss_res = np.bincount(keys, weights=residuals * residuals, minlength=size)
+        deviations = y - mean[keys]
+        ss_tot = np.bincount(keys, weights=deviations * deviations, minlength=size)
+        # r2_score: NaN below 2 samples, 1 for a perfect fit of a constant target, 0 for other constant targets
+        r2 = np.where(ss_tot != 0, 1 - ss_res / ss_tot, np.where(ss_res != 0, 0.0, 1.0))
+        r2[count < 2] = np.nan
+        return {
+            'count': count,
+            'mse': ss_res / count,
+            'mae': np.bincount(keys, weights=np.abs(residuals), minlength=size) / count,
+            'r2': r2,
+            'mape': np.bincount(keys, weights=np.abs(residuals / y), minlength=size) / count * 100
+        }
+
+
+def train_and_predict(df, test_size=0.2, random_state=42, tol=1e-6, max_chunk_values=2 ** 24, processes=1):
+    """
+    Train a linear regression per coin on a random train/test split and predict every row.
+
+    Produces the same predictions frame and metrics_by_coin as the Task 4 notebook function of
+    the same name, which filters the frame and fits a LinearRegression once per coin. Here the
+    frame is grouped once, every coin gets the split train_test_split would give it, and all the
+    least-squares problems are solved together by solve_grouped_least_squares.
+
+    :param df: Frame built by create_time_series_features
+    :param test_size: Share of each coin's rows in the test set
+    :param random_state: Seed of the split of each coin
+    :param tol: Relative cutoff of the singular values, as in LinearRegression
+    :param max_chunk_values: Maximum size of the padded array of the coins solved at once
+    :param processes: Number of processes solving chunks of coins in parallel
+    :return: Tuple (rows without missing features, grouped by coin, with predicted_price, is_test
+             and the error columns; dict mapping each coin to its metrics and coefficients)
+    """
+    feature_cols = feature_columns(df)
+    coin_codes, _ = pd.factorize(df['coin'])
+    complete = df[feature_cols + ['target_price']].notna().all(axis=1).to_numpy()
+
+    # Coins in order of first appearance, like df['coin'].unique(), each one's rows in frame order
+    rows = np.flatnonzero(complete)
+    rows = rows[np.argsort(coin_codes[rows], kind='stable')]
+    frame = df.iloc[rows].copy()
+    _, group_ids = np.unique(coin_codes[rows], return_inverse=True)
+    coins = pd.unique(frame['coin'].to_numpy())
+    counts = np.bincount(group_ids, minlength=len(coins))
+
+    is_test = np.zeros(len(rows), dtype=bool)
+    for start, count in zip(np.cumsum(counts) - counts, counts):
+        is_test[start + split_test_positions(int(count), test_size, random_state)] = True
+
+    X = frame[feature_cols].to_numpy(dtype=np.float64)
+    y = frame['target_price'].to_numpy(dtype=np.float64)
+    coef, intercept = solve_grouped_least_squares(X[~is_test], y[~is_test], group_ids[~is_test], len(coins),
+                                                  tol, max_chunk_values, processes)
+    predictions = np.einsum('rf,rf->r', X, coef[group_ids]) + intercept[group_ids]
+
+    # One group per coin and set: 2 * coin for the train rows, 2 * coin + 1 for the test rows
+    metrics = _group_metrics(y, predictions, 2 * group_ids + is_test, 2 * len(coins))
+    p = len(feature_cols)
+    metrics_by_coin = {}
+    for group, coin in enumerate(coins):
+        train, test = 2 * group, 2 * group + 1
+        n = metrics['count'][test]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            test_adjusted_r2 = 1 - (1 - metrics['r2'][test]) * (n - 1) / np.float64(n - p - 1)
+        metrics_by_coin[coin] = {
+            'test_mse': metrics['mse'][test],
+            'test_rmse': np.sqrt(metrics['mse'][test]),
+            'test_mae': metrics['mae'][test],
+            'test_r2': metrics['r2'][test],
+            'test_adjusted_r2': test_adjusted_r2,
+            'test_mape': metrics['mape'][test],
+            'train_mse': metrics['mse'][train],
+            'train_r2': metrics['r2'][train],
+            'train_mape': metrics['mape'][train],
+            'feature_coefficients': dict(zip(feature_cols, coef[group])),
+            'intercept': intercept[group],
+            'n_observations_train': int(metrics['count'][train]),
+            'n_observations_test': int(n)
+        }
+
+    frame['predicted_price'] = predictions
+    frame['is_test'] = is_test.astype(object)
+    frame['prediction_error'] = frame['target_price'] - frame['predicted_price']
+    frame['absolute_error'] = abs(frame['prediction_error'])
+    frame['percentage_error'] = (frame['prediction_error'] / frame['target_price']) * 100
+    return frame, metrics_by_coin
@@ -0,0 +1,212 @@
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+
+
+class TaskLedger:
+    """
+    Durable record of bulk jobs and of the state of each of their (coin, date) tasks, kept in SQLite.
+
+    Every task starts pending and ends done or failed; failed tasks keep their attempt count and
+    last error. A job interrupted at any point can be resumed from its pending tasks. The jobs of
+    the shards of one multi-process run share a run identifier, so they can be resumed together.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT NOT NULL,
+        params TEXT NOT NULL,
+        run_id TEXT
+    );
+    CREATE TABLE IF NOT EXISTS tasks (
+        job_id INTEGER NOT NULL REFERENCES jobs(job_id),
+        coin_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        state TEXT NOT NULL DEFAULT 'pending' CHECK (state IN ('pending', 'done', 'failed')),
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        updated_at TEXT,
+        PRIMARY KEY (job_id, coin_id, date)
+    );
+    CREATE INDEX IF NOT EXISTS tasks_job_state ON tasks (job_id, state);
+    """
+
+    def __init__(self, path='coin_geko_tasks.sqlite'):
+        """
+        Open the ledger, creating its tables if needed.
+
+        :param path: SQLite database file
+        """
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+
+        # Shared by the download and writer threads, serialized by the lock; sharded runs also
+        # share the file between processes, which wait up to the timeout for each other's writes
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+        # Ledgers created before run identifiers were recorded
+        job_columns = [row[1] for row in self.connection.execute("PRAGMA table_info(jobs)")]
+        if 'run_id' not in job_columns:
+            self.connection.execute("ALTER TABLE jobs ADD COLUMN run_id TEXT")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS jobs_run ON jobs (run_id)")
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc).isoformat()
+
+    def create_job(self, params, coin_dates, run_id=None):
+        """
+        Record a new job and its tasks, all pending.
+
+        :param params: JSON-serializable parameters needed to run the job again
+        :param coin_dates: Dict mapping each coin to its dates (YYYY-MM-DD)
+        :param run_id: Identifier shared by the jobs of the shards of one run, if sharded
+        :return: Identifier of the job
+        """
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO jobs (created_at, params, run_id) VALUES (?, ?, ?)",
+                (self._now(), json.dumps(params), run_id)
+            )
+            job_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO tasks (job_id, coin_id, date) VALUES (?, ?, ?)",
+                ((job_id, coin_id, date) for coin_id, dates in coin_dates.items() for date in dates)
+            )
+        self.logger.info(f"Created job {job_id} with {sum(len(dates) for dates in coin_dates.values())} tasks")
+        return job_id
+
+    def latest_job_id(self):
+        """
+        Return the identifier of the most recent job.
+
+        :return: Job identifier, or None if the ledger is empty
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT MAX(job_id) FROM jobs").fetchone()
+        return row[0]
+
+    def run_job_ids(self, job_id):
+        """
+        Return the jobs of the run a job belongs to.
+
+        :param job_id: Job identifier
+        :return: Sorted job identifiers sharing the run of the job, the job alone if it has no run,
+                 or an empty list if it does not exist
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT run_id FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return []
+            if row[0] is None:
+                return [job_id]
+            rows = self.connection.execute(
+                "SELECT job_id FROM jobs WHERE run_id = ? ORDER BY job_id", (row[0],)
+            ).fetchall()
+        return [run_job_id for run_job_id, in rows]
+
+    def get_job_params(self, job_id):
+        """
+        Return the parameters a job was created with.
+
+        :param job_id: Job identifier
+        :return: Parameters dict, or None if the job does not exist
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT params FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pending_tasks(self, job_id):
+        """
+        Return the tasks of a job that are not finished.
+
+        :param job_id: Job identifier
+        :return: Dict mapping each coin to its pending dates (YYYY-MM-DD)
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT coin_id, date FROM tasks WHERE job_id = ? AND state = 'pending' ORDER BY coin_id, date",
+                (job_id,)
+            ).fetchall()
+
+        pending = {}
+        for coin_id, date in rows:
+            pending.setdefault(coin_id, []).append(date)
+        return pending
+
+    def mark_done(self, job_id, tasks):
+        """
+        Mark tasks as done.
+
+        :param job_id: Job identifier
+        :param tasks: List of (coin_id, date) pairs
+        """
+        now = self._now()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "UPDATE tasks SET state = 'done', attempts = attempts + 1, last_error = NULL, updated_at = ? "
+                "WHERE job_id = ? AND coin_id = ? AND date = ?",
+                ((now, job_id, coin_id, date) for coin_id, date in tasks)
+            )
+
+    def mark_failed(self, job_id, tasks, error):
+        """
+        Mark tasks as failed and record the error.
+
+        :param job_id: Job identifier
+        :param tasks: List of (coin_id, date) pairs
+        :param error: Error message
+        """
+        now = self._now()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "UPDATE tasks SET state = 'failed', attempts = attempts + 1, last_error = ?, updated_at = ? "
+                "WHERE job_id = ? AND coin_id = ? AND date = ?",
+                ((str(error), now, job_id, coin_id, date) for coin_id, date in tasks)
+            )
+
+    def reset_failed(self, job_id, max_attempts=None):
+        """
+        Put the failed tasks of a job back to pending.
+
+        :param job_id: Job identifier
+        :param max_attempts: Leave failed the tasks already attempted this many times (default: no limit)
+        :return: Number of tasks reset
+        """
+        query = "UPDATE tasks SET state = 'pending', updated_at = ? WHERE job_id = ? AND state = 'failed'"
+        params = [self._now(), job_id]
+        if max_attempts is not None:
+            query += " AND attempts < ?"
+            params.append(max_attempts)
+
+        with self.lock, self.connection:
+            count = self.connection.execute(query, params).rowcount
+        self.logger.info(f"Reset {count} failed tasks of job {job_id}")
+        return count
+
+    def get_stats(self, job_id):
+        """
+        Count the tasks of a job per state.
+
+        :param job_id: Job identifier
+        :return: Dict with the number of pending, done and failed tasks
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT state, COUNT(*) FROM tasks WHERE job_id = ? GROUP BY state", (job_id,)
+            ).fetchall()
+        stats = {'pending': 0, 'done': 0, 'failed': 0}
+        stats.update(dict(rows))
+        return stats
+
+    def close(self):
+        """
+        Close the SQLite connection.
+        """
+        self.connection.close()
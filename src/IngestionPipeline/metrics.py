@@ -0,0 +1,238 @@
+import os
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tabulate import tabulate
+
+# Upper bounds in seconds of the latency histogram buckets, from in-memory parsing to slow API answers
+DURATION_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class StageStats:
+    """
+    Counters and latency histogram of one stage of the pipeline.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.count = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.items = 0
+        self.errors = 0
+        self.retries = 0
+
+    def observe(self, seconds, size, items, error):
+        self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.bytes += size
+        self.items += items
+        self.errors += bool(error)
+
+    def quantile(self, q):
+        """
+        Estimate a latency quantile from the histogram, interpolating within its bucket as
+        Prometheus' histogram_quantile does.
+
+        :param q: Quantile between 0 and 1
+        :return: Seconds, or None before the first observation
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+
+class PipelineMetrics:
+    """
+    Thread-safe registry of per-stage latencies, byte counts, retries and queue depths of an ingestion run.
+
+    The client, the sinks and the PostgreSQL connector report to it when they are given one; it
+    exports the Prometheus text format, to a file (for node_exporter's textfile collector) or over
+    HTTP, and renders an end-of-run summary table.
+    """
+
+    def __init__(self, prefix='coingecko_ingestion', buckets=DURATION_BUCKETS):
+        """
+        Initialize an empty registry.
+
+        :param prefix: Prefix of the exported metric names
+        :param buckets: Sorted upper bounds in seconds of the latency histogram buckets
+        """
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.stages = {}
+        self.queues = {}
+        self.lock = threading.Lock()
+
+    def _stage(self, stage):
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = StageStats(self.buckets)
+        return stats
+
+    def observe(self, stage, seconds, size=0, items=1, error=False):
+        """
+        Record one run of a stage.
+
+        :param stage: Stage name, e.g. 'http_request'
+        :param seconds: Time the run took
+        :param size: Bytes the run read or wrote
+        :param items: Rows or files the run handled
+        :param error: The run failed
+        """
+        with self.lock:
+            self._stage(stage).observe(seconds, size, items, error)
+
+    def add_retry(self, stage, count=1):
+        """
+        Record retries of a stage.
+
+        :param stage: Stage name
+        :param count: Number of retries
+        """
+        with self.lock:
+            self._stage(stage).retries += count
+
+    def set_queue_depth(self, queue, depth):
+        """
+        Record the current depth of a queue, keeping its maximum.
+
+        :param queue: Queue name, e.g. 'downloads'
+        :param depth: Number of items waiting
+        """
+        with self.lock:
+            _, peak = self.queues.get(queue, (0, 0))
+            self.queues[queue] = (depth, max(peak, depth))
+
+    def get_stats(self):
+        """
+        Return the statistics of every stage.
+
+        :return: Dict mapping each stage to a dict with count, errors, retries, bytes, items,
+                 seconds (total) and the estimated p50 and p99 latencies in seconds
+        """
+        with self.lock:
+            return {
+                stage: {
+                    'count': stats.count,
+                    'errors': stats.errors,
+                    'retries': stats.retries,
+                    'bytes': stats.bytes,
+                    'items': stats.items,
+                    'seconds': stats.seconds,
+                    'p50': stats.quantile(0.5),
+                    'p99': stats.quantile(0.99)
+                }
+                for stage, stats in sorted(self.stages.items())
+            }
+
+    def to_prometheus(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        :return: Text ending with a newline
+        """
+        name = self.prefix
+        lines = [
+            f"# HELP {name}_stage_duration_seconds Time spent per run of each pipeline stage",
+            f"# TYPE {name}_stage_duration_seconds histogram"
+        ]
+        with self.lock:
+            stages = sorted(self.stages.items())
+            for stage, stats in stages:
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ('+Inf',), stats.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_stage_duration_seconds_sum{{stage="{stage}"}} {stats.seconds!r}')
+                lines.append(f'{name}_stage_duration_seconds_count{{stage="{stage}"}} {stats.count}')
+
+            for metric, description in (('bytes', 'Bytes read or written'), ('items', 'Rows or files handled'),
+                                        ('errors', 'Failed runs'), ('retries', 'Retried runs')):
+                lines.append(f"# HELP {name}_stage_{metric}_total {description} by each pipeline stage")
+                lines.append(f"# TYPE {name}_stage_{metric}_total counter")
+                lines.extend(f'{name}_stage_{metric}_total{{stage="{stage}"}} {getattr(stats, metric)}'
+                             for stage, stats in stages)
+
+            queues = sorted(self.queues.items())
+            for metric, index, description in (('queue_depth', 0, 'Items waiting in each queue'),
+                                               ('queue_depth_max', 1, 'Largest number of items seen waiting')):
+                lines.append(f"# HELP {name}_{metric} {description}")
+                lines.append(f"# TYPE {name}_{metric} gauge")
+                lines.extend(f'{name}_{metric}{{queue="{queue}"}} {depths[index]}' for queue, depths in queues)
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """
+        Write the metrics to a file, atomically so a scraper never reads half of it.
+
+        :param path: File to write, e.g. a .prom file of node_exporter's textfile directory
+        """
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(temporary_path, path)
+
+    def serve(self, port, host=''):
+        """
+        Serve the metrics over HTTP from a background thread, at any path.
+
+        :param port: Port to listen on
+        :param host: Interface to listen on (default: all)
+        :return: The HTTP server; call its shutdown() to stop it
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def summary_table(self):
+        """
+        Render the statistics of every stage and queue as a table.
+
+        :return: Text table
+        """
+        def milliseconds(seconds):
+            return None if seconds is None else round(seconds * 1000, 2)
+
+        rows = [
+            [stage, stats['count'], round(stats['seconds'], 3),
+             milliseconds(stats['seconds'] / stats['count'] if stats['count'] else None),
+             milliseconds(stats['p50']), milliseconds(stats['p99']), stats['items'], stats['bytes'],
+             stats['retries'], stats['errors']]
+            for stage, stats in self.get_stats().items()
+        ]
+        table = tabulate(rows, headers=["Stage", "Runs", "Total (s)", "Mean (ms)", "p50 (ms)", "p99 (ms)",
+                                        "Items", "Bytes", "Retries", "Errors"], tablefmt='pretty')
+        with self.lock:
+            queues = sorted(self.queues.items())
+        if queues:
+            table += '\n' + tabulate([[queue, depth, peak] for queue, (depth, peak) in queues],
+                                     headers=["Queue", "Depth", "Max depth"], tablefmt='pretty')
+        return table
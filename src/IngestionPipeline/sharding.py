@@ -0,0 +1,35 @@
+import zlib
+
+
+def shard_of(coin_id, date, shards):
+    """
+    Return the shard a coin-day belongs to.
+
+    Coin-days are assigned per (coin, month) with a stable hash, so every process and host computes
+    the same split, range requests stay contiguous within a month, and no two shards ever write
+    the monthly aggregates of the same month.
+
+    :param coin_id: Coin identifier
+    :param date: Date (YYYY-MM-DD, date or datetime)
+    :param shards: Number of shards
+    :return: Shard index in [0, shards)
+    """
+    month = date[:7] if isinstance(date, str) else date.strftime('%Y-%m')
+    return zlib.crc32(f"{coin_id}:{month}".encode('utf-8')) % shards
+
+
+def shard_coin_dates(coin_dates, shards, shard_index):
+    """
+    Keep the coin-days of one shard.
+
+    :param coin_dates: Dict mapping each coin to its dates
+    :param shards: Number of shards
+    :param shard_index: Shard to keep, in [0, shards)
+    :return: Dict mapping each coin to the dates of the shard
+    """
+    if not 0 <= shard_index < shards:
+        raise ValueError(f"Shard index {shard_index} is not in [0, {shards})")
+    return {
+        coin_id: [date for date in dates if shard_of(coin_id, date, shards) == shard_index]
+        for coin_id, dates in coin_dates.items()
+    }
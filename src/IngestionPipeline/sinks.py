@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FileSink:
+    """
+    Keeps one JSON file per coin-day, <directory>/<coin_id>_<date>.json.
+
+    The response body is written as received; only rows without one (cached or range payloads)
+    are serialized. Range payloads never replace a file already written.
+    """
+
+    name = 'files'
+
+    def __init__(self, directory='coin_data', metrics=None):
+        """
+        Initialize the sink.
+
+        :param directory: Directory the files are written to
+        :param metrics: Optional PipelineMetrics recording every file write
+        """
+        self.directory = directory
+        self.metrics = metrics
+        self.logger = logging.getLogger(__name__)
+
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, coin_id, date):
+        """
+        Return the file of a coin-day.
+
+        :param coin_id: Coin identifier
+        :param date: Date (YYYY-MM-DD)
+        :return: Path of the file
+        """
+        return os.path.join(self.directory, f"{coin_id}_{date}.json")
+
+    def write(self, rows):
+        """
+        Write the file of every row.
+
+        :param rows: List of dicts with coin_id, date and full_response keys, and optionally raw_response
+                     and prices_only
+        :return: Number of rows stored, files kept as they were included
+        """
+        for row in rows:
+            start = time.perf_counter()
+            path = self.path_for(row['coin_id'], row['date'])
+            if row.get('prices_only') and os.path.exists(path):
+                continue
+            body = row.get('raw_response')
+            if body is None:
+                body = json.dumps(row['full_response'], indent=2).encode('utf-8')
+            with open(path, 'wb') as f:
+                f.write(body)
+            if self.metrics is not None:
+                self.metrics.observe('file_write', time.perf_counter() - start, size=len(body))
+        return len(rows)
+
+
+class PostgresSink:
+    """
+    Writes rows to PostgreSQL through a PGConnector.
+
+    With a feature store, the features of the rows are updated as soon as their prices are stored.
+    """
+
+    name = 'postgres'
+
+    def __init__(self, pg_connector, batched=True, feature_store=None):
+        """
+        Initialize the sink.
+
+        :param pg_connector: Connected PGConnector
+        :param batched: Write each call in one transaction with insert_daily_prices_bulk, instead of
+                        one insert_daily_price and update_monthly_aggregates per row
+        :param feature_store: Optional FeatureStore updated after each write
+        """
+        self.pg_connector = pg_connector
+        self.batched = batched
+        self.feature_store = feature_store
+
+    def write(self, rows):
+        """
+        Store the rows and update their monthly aggregates, and their features with a feature store.
+
+        :param rows: List of dicts with coin_id, price_usd, date and full_response keys, and optionally raw_response
+        :return: Number of rows written
+        """
+        if self.batched:
+            count = self.pg_connector.insert_daily_prices_bulk(rows)
+            if count and self.feature_store:
+                self.feature_store.update([(row['coin_id'], row['date']) for row in rows])
+            return count
+
+        count = 0
+        for row in rows:
+            inserted = self.pg_connector.insert_daily_price(
+                coin_id=row['coin_id'],
+                price_usd=row['price_usd'],
+                date=row['date'],
+                full_response=row['full_response'],
+                raw_response=row.get('raw_response'),
+                prices_only=row.get('prices_only', False)
+            )
+            if not inserted:
+                continue
+            count += 1
+            self.pg_connector.update_monthly_aggregates(
+                coin_id=row['coin_id'],
+                date=row['date'],
+                price_usd=row['price_usd']
+            )
+            if self.feature_store:
+                self.feature_store.update([(row['coin_id'], row['date'])])
+        return count
+
+
+class ColumnarSink:
+    """
+    Appends rows to a ColumnarStore.
+    """
+
+    name = 'parquet'
+
+    def __init__(self, columnar_store):
+        """
+        Initialize the sink.
+
+        :param columnar_store: ColumnarStore the rows are appended to
+        """
+        self.columnar_store = columnar_store
+
+    def write(self, rows):
+        """
+        Append the rows.
+
+        :param rows: List of dicts as built by build_daily_row
+        :return: Number of rows written
+        """
+        return self.columnar_store.append(rows)
+
+
+class SinkPipeline:
+    """
+    Hands the same in-memory rows to several sinks.
+
+    With more than one sink each write runs the sinks in parallel, so a slow sink (e.g. files)
+    does not delay the others, and a failing sink does not stop them.
+    """
+
+    def __init__(self, sinks, metrics=None):
+        """
+        Initialize the pipeline.
+
+        :param sinks: Sinks with a name and a write(rows) method
+        :param metrics: Optional PipelineMetrics recording each write of each sink as stage sink_<name>
+        """
+        self.sinks = list(sinks)
+        self.metrics = metrics
+        self.logger = logging.getLogger(__name__)
+        self.executor = ThreadPoolExecutor(max_workers=len(self.sinks)) if len(self.sinks) > 1 else None
+
+    def _write_sink(self, sink, rows):
+        start = time.perf_counter()
+        try:
+            count = sink.write(rows)
+        except Exception as e:
+            self.logger.error(f"Failed to write {len(rows)} rows to {sink.name}: {str(e)}")
+            count = 0
+        if self.metrics is not None:
+            self.metrics.observe(f'sink_{sink.name}', time.perf_counter() - start, items=len(rows),
+                                 error=count < len(rows))
+        return count
+
+    def write(self, rows):
+        """
+        Write rows to every sink.
+
+        :param rows: List of dicts as built by build_daily_row
+        :return: Dict mapping each sink name to the number of rows it wrote
+        """
+        if self.executor is None:
+            return {sink.name: self._write_sink(sink, rows) for sink in self.sinks}
+
+        futures = {sink.name: self.executor.submit(self._write_sink, sink, rows) for sink in self.sinks}
+        return {name: future.result() for name, future in futures.items()}
+
+    def close(self):
+        """
+        Stop the threads running the sinks.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
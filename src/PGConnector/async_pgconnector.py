@@ -0,0 +1,308 @@
+import os
+import json
+import asyncio
+import logging
+from datetime import datetime
+from decimal import Decimal
+import asyncpg
+from dotenv import load_dotenv
+
+from .pgconnector import PGConnector
+from .monthly_aggregator import MonthlyAggregator
+from . import partitions
+from . import payload_archive
+
+
+class AsyncPGConnector:
+    def __init__(self, db_name, port=5432, pool_size=10):
+        """
+        Initialize the asyncio PostgreSQL connector. The connection pool is created by connect().
+
+        :param db_name: Name of the database to connect to
+        :param port: Port number (default 5432)
+        :param pool_size: Maximum number of pooled connections
+        """
+        load_dotenv()
+        self.host = os.getenv('PG_HOST', 'localhost')
+        self.port = os.getenv('PG_PORT', port)
+        self.user = os.getenv('PG_USER')
+        self.password = os.getenv('PG_PASSWORD')
+        self.db_name = db_name
+        self.pool_size = pool_size
+
+        self.logger = logging.getLogger(__name__)
+
+        self.pool = None
+        self.partitions = None  # Partitions of cryptocurrency_daily_prices, or an empty set if it is a plain table
+        self.partitioned = False
+        self.partition_lock = asyncio.Lock()
+        # Inserts feeding a MonthlyAggregator run concurrently but never alongside a flush, so a
+        # flush cannot recompute a month from a day the aggregator has not been given yet
+        self.aggregate_condition = asyncio.Condition()
+        self.pending_inserts = 0
+        self.flushing = False
+        self.split_payload = None  # True if the payloads are kept in cryptocurrency_raw_payloads
+
+    async def connect(self):
+        """
+        Create the connection pool.
+        """
+        self.pool = await asyncpg.create_pool(
+            host=self.host,
+            port=int(self.port),
+            database=self.db_name,
+            user=self.user,
+            password=self.password,
+            min_size=1,
+            max_size=self.pool_size
+        )
+        self.logger.info(f"Successfully connected to database {self.db_name}")
+
+    async def ensure_partitions(self, dates, months_ahead=1):
+        """
+        Create the monthly partitions of cryptocurrency_daily_prices the dates fall in, if missing.
+        See PGConnector.ensure_partitions.
+
+        :param dates: Dates about to be written (YYYY-MM-DD, date or datetime)
+        :param months_ahead: Number of future months created along
+        :return: Number of partitions created
+        """
+        async with self.partition_lock:
+            if self.partitions is None:
+                async with self.pool.acquire() as connection:
+                    row = await connection.fetchrow(partitions.PARTITIONS_QUERY)
+                self.partitioned = bool(row and row[0])
+                self.partitions = set(row[1]) if self.partitioned else set()
+            if not self.partitioned:
+                return 0
+
+            missing = [
+                (name, month_start, month_end)
+                for name, month_start, month_end in partitions.month_partitions(dates, months_ahead)
+                if name not in self.partitions
+            ]
+            if not missing:
+                return 0
+            async with self.pool.acquire() as connection:
+                async with connection.transaction():
+                    await connection.execute(partitions.PARTITION_LOCK_QUERY)
+                    # Another process may have created some of them meanwhile
+                    row = await connection.fetchrow(partitions.PARTITIONS_QUERY)
+                    self.partitions = set(row[1])
+                    missing = [partition for partition in missing if partition[0] not in self.partitions]
+                    for name, month_start, month_end in missing:
+                        await connection.execute(partitions.create_partition_query(name, month_start, month_end))
+            self.partitions.update(name for name, _, _ in missing)
+        if not missing:
+            return 0
+        self.logger.info(f"Created partitions {', '.join(name for name, _, _ in missing)}")
+        return len(missing)
+
+    async def _uses_split_payload(self):
+        """
+        Check once whether the payloads are kept in the archive table (split layout).
+
+        :return: True if cryptocurrency_raw_payloads exists
+        """
+        if self.split_payload is None:
+            async with self.pool.acquire() as connection:
+                self.split_payload = bool(await connection.fetchval(payload_archive.ARCHIVE_EXISTS_QUERY))
+        return self.split_payload
+
+    async def insert_daily_price(self, coin_id, price_usd, date, full_response, raw_response=None, aggregator=None):
+        """
+        Insert daily cryptocurrency price data and update its monthly aggregates in one transaction.
+        In the split layout the payload is written compressed to cryptocurrency_raw_payloads instead.
+
+        :param coin_id: Identifier for the cryptocurrency
+        :param price_usd: Price in USD
+        :param date: Date of the price (YYYY-MM-DD)
+        :param full_response: Full JSON response (dict or JSON-serializable object)
+        :param raw_response: Optional response body (bytes or str) stored instead of serializing full_response
+        :param aggregator: Optional MonthlyAggregator collecting the price instead, for
+                           flush_monthly_aggregates to update the month once per batch
+        """
+        if not self.pool:
+            raise Exception("Database connection not established. Call connect() first.")
+
+        date_obj = datetime.strptime(date, '%Y-%m-%d').date()
+        await self.ensure_partitions([date_obj])
+        price = Decimal(str(price_usd))
+        split_payload = await self._uses_split_payload()
+        if split_payload:
+            market_cap, volume = (None if value is None else Decimal(str(value))
+                                  for value in payload_archive.market_values(full_response))
+            values = (coin_id, price, date_obj, market_cap, volume)
+            stored_columns = "(coin_id, price_usd, date, market_cap_usd, volume_usd)"
+            stored_values = "($1, $2, $3, $4, $5)"
+            stored_updates = ("market_cap_usd = EXCLUDED.market_cap_usd, volume_usd = EXCLUDED.volume_usd, "
+                              "full_response = NULL")
+            payload = payload_archive.compress_payload(full_response, raw_response)
+        else:
+            if raw_response is not None:
+                json_response = raw_response.decode('utf-8') if isinstance(raw_response, bytes) else raw_response
+            else:
+                json_response = json.dumps(full_response)
+            values = (coin_id, price, date_obj, json_response)
+            stored_columns = "(coin_id, price_usd, date, full_response)"
+            stored_values = "($1, $2, $3, $4::jsonb)"
+            stored_updates = "full_response = EXCLUDED.full_response"
+
+        # The CTEs read the table as it was before the insert, which tells a new coin-day from an overwritten one
+        insert_query = f"""
+        WITH existing AS (
+            SELECT 1 FROM cryptocurrency_daily_prices WHERE coin_id = $1 AND date = $3
+        ),
+        merged AS (
+            INSERT INTO cryptocurrency_daily_prices
+            {stored_columns}
+            VALUES {stored_values}
+            ON CONFLICT (coin_id, date) DO UPDATE
+            SET price_usd = EXCLUDED.price_usd,
+                {stored_updates}
+            RETURNING 1
+        )
+        SELECT NOT EXISTS (SELECT 1 FROM existing) AS inserted FROM merged;
+        """
+        archive_query = """
+        INSERT INTO cryptocurrency_raw_payloads (coin_id, date, payload)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (coin_id, date) DO UPDATE
+        SET payload = EXCLUDED.payload;
+        """
+        if aggregator is not None:
+            async with self.aggregate_condition:
+                await self.aggregate_condition.wait_for(lambda: not self.flushing)
+                self.pending_inserts += 1
+        try:
+            async with self.pool.acquire() as connection:
+                async with connection.transaction():
+                    inserted = await connection.fetchval(insert_query, *values)
+                    if split_payload:
+                        await connection.execute(archive_query, coin_id, date_obj, payload)
+                    if aggregator is None:
+                        await self._recompute_months(connection, [(coin_id, date_obj.year, date_obj.month)])
+            if aggregator is not None:
+                aggregator.add(coin_id, date_obj, price, inserted)
+            self.logger.info(f"Inserted daily price for {coin_id} on {date}")
+        except (Exception, asyncpg.PostgresError) as error:
+            self.logger.error(f"Error inserting daily price: {error}")
+            raise
+        finally:
+            if aggregator is not None:
+                async with self.aggregate_condition:
+                    self.pending_inserts -= 1
+                    self.aggregate_condition.notify_all()
+
+    async def _recompute_months(self, connection, keys):
+        """
+        Recompute some months from the daily prices, in the caller's transaction.
+
+        :param connection: Acquired connection
+        :param keys: List of (coin_id, year, month)
+        """
+        if not keys:
+            return
+        recompute_query = f"""
+        INSERT INTO cryptocurrency_monthly_aggregates {PGConnector.MONTHLY_COLUMNS}
+        SELECT {PGConnector.MONTHLY_STATS}
+        FROM unnest($1::varchar[], $2::int[], $3::int[]) AS k(coin_id, year, month)
+        JOIN cryptocurrency_daily_prices d
+          ON d.coin_id = k.coin_id
+         AND d.date >= make_date(k.year, k.month, 1)
+         AND d.date < make_date(k.year, k.month, 1) + INTERVAL '1 month'
+        GROUP BY d.coin_id, EXTRACT(YEAR FROM d.date), EXTRACT(MONTH FROM d.date)
+        {PGConnector.MONTHLY_OVERWRITE};
+        """
+        coin_ids, years, months = (list(column) for column in zip(*keys))
+        await connection.execute(recompute_query, coin_ids, years, months)
+
+    async def flush_monthly_aggregates(self, aggregator):
+        """
+        Write the months collected by a MonthlyAggregator since its last flush, in one transaction.
+
+        New months are inserted and stored months merged in one statement; revised months, and
+        months stored without the avg/open/close/count statistics, are recomputed from the daily prices.
+        The flush waits for the inserts in flight, and inserts started meanwhile wait for the flush.
+
+        :param aggregator: MonthlyAggregator fed by insert_daily_price since the last flush
+        :return: Number of monthly rows written
+        """
+        if not self.pool:
+            raise Exception("Database connection not established. Call connect() first.")
+
+        # Hold back new inserts and wait for the ones in flight to reach the aggregator
+        async with self.aggregate_condition:
+            await self.aggregate_condition.wait_for(lambda: not self.flushing)
+            self.flushing = True
+            await self.aggregate_condition.wait_for(lambda: self.pending_inserts == 0)
+        try:
+            return await self._flush_monthly_aggregates(aggregator)
+        finally:
+            async with self.aggregate_condition:
+                self.flushing = False
+                self.aggregate_condition.notify_all()
+
+    async def _flush_monthly_aggregates(self, aggregator):
+        merged, recompute = MonthlyAggregator.split_stats(aggregator.flush())
+        count = 0
+        try:
+            async with self.pool.acquire() as connection:
+                async with connection.transaction():
+                    if merged:
+                        merge_query = PGConnector.monthly_merge_query(
+                            [f"${number}" for number in range(1, len(PGConnector.MONTHLY_MERGE_INPUT) + 1)])
+                        rows = await connection.fetch(merge_query, *PGConnector.monthly_merge_values(merged))
+                        written = {(row['coin_id'], row['year'], row['month']) for row in rows}
+                        count += len(written)
+                        recompute += MonthlyAggregator.unmerged_months(merged, written)
+                    await self._recompute_months(connection, recompute)
+            count += len(recompute)
+            self.logger.info(f"Flushed {count} monthly aggregates")
+            return count
+        except (Exception, asyncpg.PostgresError) as error:
+            self.logger.error(f"Error flushing monthly aggregates: {error}")
+            raise
+
+    async def find_missing_dates(self, coin_ids, start_date, end_date):
+        """
+        Find the coin-days of a date range that are not stored yet, with an index-backed anti-join.
+
+        :param coin_ids: List of coin identifiers
+        :param start_date: First date of the range (YYYY-MM-DD)
+        :param end_date: Last date of the range (YYYY-MM-DD)
+        :return: Dict mapping each coin to its missing dates (YYYY-MM-DD)
+        """
+        if not self.pool:
+            raise Exception("Database connection not established. Call connect() first.")
+
+        missing_query = """
+        SELECT c.coin_id, d.day::date AS day
+        FROM unnest($1::varchar[]) AS c(coin_id)
+        CROSS JOIN generate_series($2::date, $3::date, interval '1 day') AS d(day)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM cryptocurrency_daily_prices p
+            WHERE p.coin_id = c.coin_id AND p.date = d.day::date
+        )
+        ORDER BY c.coin_id, d.day;
+        """
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch(
+                missing_query,
+                list(coin_ids),
+                datetime.strptime(start_date, '%Y-%m-%d').date(),
+                datetime.strptime(end_date, '%Y-%m-%d').date()
+            )
+
+        missing = {coin_id: [] for coin_id in coin_ids}
+        for row in rows:
+            missing[row['coin_id']].append(row['day'].strftime('%Y-%m-%d'))
+        return missing
+
+    async def close_connection(self):
+        """
+        Close every pooled connection.
+        """
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
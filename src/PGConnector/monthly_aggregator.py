@@ -0,0 +1,102 @@
+import threading
+from datetime import datetime, date
+
+
+class MonthlyAggregator:
+    """
+    Collects daily prices in memory per (coin, month) between two flushes.
+
+    Each flush hands over the min, max, sum, count, open and close of every month touched since
+    the previous one, ready to be merged into cryptocurrency_monthly_aggregates with one
+    statement. Months where a day already stored was rewritten are flagged as revised: their
+    stored statistics cannot be merged with, so they are recomputed from the daily prices.
+    """
+
+    def __init__(self):
+        self.prices = {}  # (coin_id, year, month) -> {date: price}
+        self.revised = set()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(days) for days in self.prices.values())
+
+    @staticmethod
+    def _to_date(value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return datetime.strptime(value, '%Y-%m-%d').date()
+
+    def add(self, coin_id, day, price_usd, inserted=True):
+        """
+        Record the price of a coin-day.
+
+        :param coin_id: Identifier for the cryptocurrency
+        :param day: Date of the price (YYYY-MM-DD, date or datetime)
+        :param price_usd: Price in USD
+        :param inserted: False if the coin-day was already stored and has been overwritten
+        """
+        day = self._to_date(day)
+        key = (coin_id, day.year, day.month)
+        with self.lock:
+            self.prices.setdefault(key, {})[day] = price_usd
+            if not inserted:
+                self.revised.add(key)
+
+    def flush(self):
+        """
+        Hand over the statistics of every month touched since the last flush and start over.
+
+        :return: List of dicts with coin_id, year, month, min_price, max_price, sum_price,
+                 day_count, open_date, open_price, close_date, close_price and revised keys
+        """
+        with self.lock:
+            prices, revised = self.prices, self.revised
+            self.prices, self.revised = {}, set()
+
+        stats = []
+        for (coin_id, year, month), days in prices.items():
+            first_day, last_day = min(days), max(days)
+            values = list(days.values())
+            stats.append({
+                'coin_id': coin_id,
+                'year': year,
+                'month': month,
+                'min_price': min(values),
+                'max_price': max(values),
+                'sum_price': sum(values),
+                'day_count': len(values),
+                'open_date': first_day,
+                'open_price': days[first_day],
+                'close_date': last_day,
+                'close_price': days[last_day],
+                'revised': (coin_id, year, month) in revised
+            })
+        return stats
+
+    @staticmethod
+    def split_stats(stats):
+        """
+        Split the statistics of a flush into the months merged with the stored ones and the revised
+        months, whose stored statistics cannot be merged with and are recomputed from the daily prices.
+
+        :param stats: Statistics returned by flush
+        :return: Tuple (statistics to merge, list of (coin_id, year, month) to recompute)
+        """
+        merged = [stat for stat in stats if not stat['revised']]
+        recompute = [(stat['coin_id'], stat['year'], stat['month']) for stat in stats if stat['revised']]
+        return merged, recompute
+
+    @staticmethod
+    def unmerged_months(merged, written):
+        """
+        Find the months the merge left alone, because they were stored without the statistics it needs.
+
+        :param merged: Statistics passed to the merge
+        :param written: Set of (coin_id, year, month) the merge returned
+        :return: List of (coin_id, year, month) to recompute from the daily prices
+        """
+        return [(stat['coin_id'], stat['year'], stat['month']) for stat in merged
+                if (stat['coin_id'], stat['year'], stat['month']) not in written]
@@ -0,0 +1,102 @@
+from datetime import datetime, date
+
+PARENT_TABLE = 'cryptocurrency_daily_prices'
+
+# Partitioned or not, and the partitions the daily prices table already has
+PARTITIONS_QUERY = """
+SELECT parent.relkind = 'p',
+       ARRAY(
+           SELECT child.relname::text
+           FROM pg_inherits i
+           JOIN pg_class child ON child.oid = i.inhrelid
+           WHERE i.inhparent = parent.oid
+       )
+FROM pg_class parent
+WHERE parent.oid = to_regclass('cryptocurrency_daily_prices');
+"""
+# Writers creating partitions wait for each other, then check again which ones exist
+PARTITION_LOCK_QUERY = "SELECT pg_advisory_xact_lock(hashtext('cryptocurrency_daily_prices_partitions'));"
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _next_month(month_start):
+    return date(month_start.year + 1, 1, 1) if month_start.month == 12 else date(month_start.year, month_start.month + 1, 1)
+
+
+def partition_name(month_start):
+    """
+    Return the name of the partition holding a month.
+
+    :param month_start: Any date of the month
+    :return: Table name, e.g. cryptocurrency_daily_prices_2024_01
+    """
+    return f"{PARENT_TABLE}_{month_start.year:04d}_{month_start.month:02d}"
+
+
+def month_partitions(dates, months_ahead=1):
+    """
+    List the monthly partitions covering some dates, plus the months following the latest one.
+
+    :param dates: Dates (YYYY-MM-DD, date or datetime)
+    :param months_ahead: Future months created along, so the next days never wait on DDL
+    :return: List of (name, first day, first day of the next month), oldest first
+    """
+    months = {_to_date(day).replace(day=1) for day in dates}
+    if months:
+        month_start = max(months)
+        for _ in range(months_ahead):
+            month_start = _next_month(month_start)
+            months.add(month_start)
+    return [(partition_name(month_start), month_start, _next_month(month_start)) for month_start in sorted(months)]
+
+
+def create_partition_query(name, month_start, month_end):
+    """
+    Return the statement creating a partition. DDL takes no bind parameters, so the bounds,
+    which are dates built by month_partitions(), are inlined.
+
+    There is no IF NOT EXISTS: a table left with that name, e.g. a detached partition, must
+    make the write fail instead of sending its rows nowhere.
+
+    :param name: Partition name from partition_name()
+    :param month_start: First day of the month
+    :param month_end: First day of the next month
+    :return: SQL text
+    """
+    return (f'CREATE TABLE "{name}" PARTITION OF {PARENT_TABLE} '
+            f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{month_end.isoformat()}');")
+
+
+def partition_month(name):
+    """
+    Return the first day of the month held by a partition.
+
+    :param name: Partition name from partition_name()
+    :return: date, or None if the name does not follow partition_name()
+    """
+    try:
+        return datetime.strptime(name[len(PARENT_TABLE) + 1:], '%Y_%m').date()
+    except ValueError:
+        return None
+
+
+def partitions_before(names, before_date):
+    """
+    Select the partitions holding only dates before a date.
+
+    :param names: Partition names
+    :param before_date: First date to keep (YYYY-MM-DD, date or datetime)
+    :return: Sorted names of the partitions whose month ends on or before before_date
+    """
+    before_date = _to_date(before_date)
+    return sorted(
+        name for name in names
+        if partition_month(name) is not None and _next_month(partition_month(name)) <= before_date
+    )
@@ -0,0 +1,43 @@
+import json
+import zlib
+
+ARCHIVE_TABLE = 'cryptocurrency_raw_payloads'
+
+# The split layout is on when the archive table exists
+ARCHIVE_EXISTS_QUERY = "SELECT to_regclass('cryptocurrency_raw_payloads') IS NOT NULL;"
+
+
+def compress_payload(full_response, raw_response=None):
+    """
+    Compress an API payload for the archive table.
+
+    :param full_response: Parsed API response
+    :param raw_response: Response body as received (bytes or str), compressed as is instead of
+                         serializing full_response again
+    :return: zlib-compressed JSON bytes
+    """
+    payload = raw_response if raw_response is not None else json.dumps(full_response)
+    return zlib.compress(payload.encode('utf-8') if isinstance(payload, str) else payload)
+
+
+def decompress_payload(payload):
+    """
+    Parse a payload of the archive table.
+
+    :param payload: zlib-compressed JSON bytes (bytes or memoryview)
+    :return: Parsed API response
+    """
+    return json.loads(zlib.decompress(bytes(payload)))
+
+
+def market_values(full_response):
+    """
+    Extract the typed columns of the hot table from an API payload.
+
+    :param full_response: Parsed /history payload, or a range payload with the same market_data shape
+    :return: Tuple (market cap in USD, volume in USD), None where missing
+    """
+    market_data = (full_response or {}).get('market_data') or {}
+    market_cap = (market_data.get('market_cap') or {}).get('usd')
+    volume = (market_data.get('total_volume') or {}).get('usd')
+    return market_cap, volume
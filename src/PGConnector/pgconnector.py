@@ -1,18 +1,79 @@
 import os
+import time
+import uuid
+import threading
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 import logging
 import json
 from datetime import datetime
 import pandas as pd
+import pyarrow as pa
+
+from .monthly_aggregator import MonthlyAggregator
+from . import partitions
+from . import payload_archive
 
 class PGConnector:
-    def __init__(self, db_name, port=5432):
+    MONTHLY_COLUMNS = """
+    (coin_id, year, month, min_price, max_price, avg_price, open_price, close_price,
+     day_count, sum_price, open_date, close_date)
+    """
+    # Statistics of the daily prices d of a month, in the order of MONTHLY_COLUMNS
+    MONTHLY_STATS = """
+    d.coin_id, EXTRACT(YEAR FROM d.date)::INTEGER, EXTRACT(MONTH FROM d.date)::INTEGER,
+    MIN(d.price_usd), MAX(d.price_usd), AVG(d.price_usd),
+    (ARRAY_AGG(d.price_usd ORDER BY d.date))[1], (ARRAY_AGG(d.price_usd ORDER BY d.date DESC))[1],
+    COUNT(*), SUM(d.price_usd), MIN(d.date), MAX(d.date)
+    """
+    ANALYTICS_VIEWS = ('cryptocurrency_monthly_averages', 'cryptocurrency_drop_streaks')
+    MONTHLY_OVERWRITE = """
+    ON CONFLICT (coin_id, year, month) DO UPDATE
+    SET min_price = EXCLUDED.min_price,
+        max_price = EXCLUDED.max_price,
+        avg_price = EXCLUDED.avg_price,
+        open_price = EXCLUDED.open_price,
+        close_price = EXCLUDED.close_price,
+        day_count = EXCLUDED.day_count,
+        sum_price = EXCLUDED.sum_price,
+        open_date = EXCLUDED.open_date,
+        close_date = EXCLUDED.close_date
+    """
+    # Statistics of MonthlyAggregator.flush passed to monthly_merge_query, with their SQL types
+    MONTHLY_MERGE_INPUT = (
+        ('coin_id', 'varchar'), ('year', 'int'), ('month', 'int'), ('min_price', 'numeric'),
+        ('max_price', 'numeric'), ('sum_price', 'numeric'), ('day_count', 'int'), ('open_date', 'date'),
+        ('open_price', 'numeric'), ('close_date', 'date'), ('close_price', 'numeric')
+    )
+    # Merges the flushed statistics into the stored month a. Months stored without the
+    # avg/open/close/count statistics are left alone, and missing from the returned rows
+    MONTHLY_MERGE = """
+    ON CONFLICT (coin_id, year, month) DO UPDATE
+    SET min_price = LEAST(a.min_price, EXCLUDED.min_price),
+        max_price = GREATEST(a.max_price, EXCLUDED.max_price),
+        avg_price = (a.sum_price + EXCLUDED.sum_price) / (a.day_count + EXCLUDED.day_count),
+        open_price = CASE WHEN EXCLUDED.open_date < a.open_date THEN EXCLUDED.open_price ELSE a.open_price END,
+        close_price = CASE WHEN EXCLUDED.close_date > a.close_date THEN EXCLUDED.close_price ELSE a.close_price END,
+        day_count = a.day_count + EXCLUDED.day_count,
+        sum_price = a.sum_price + EXCLUDED.sum_price,
+        open_date = LEAST(a.open_date, EXCLUDED.open_date),
+        close_date = GREATEST(a.close_date, EXCLUDED.close_date)
+    WHERE a.day_count IS NOT NULL
+    RETURNING coin_id, year, month
+    """
+
+    def __init__(self, db_name, port=5432, health_check_interval=30, metrics=None):
         """
         Initialize the PostgreSQL connection.
 
         :param db_name: Name of the database to connect to
         :param port: Port number (default 5432)
+        :param health_check_interval: Seconds a pooled connection may stay idle before it is pinged on borrow
+        :param metrics: Optional PipelineMetrics recording the inserts and monthly aggregate updates
         """
         load_dotenv()
         self.host = os.getenv('PG_HOST', 'localhost')
@@ -27,6 +88,15 @@ class PGConnector:
         self.connection = None
         self.cursor = None
 
+        self.pool = None
+        self.health_check_interval = health_check_interval
+        self.last_used = {}
+        self.lock = threading.RLock()
+        self.partitions = None  # Partitions of cryptocurrency_daily_prices, or an empty set if it is a plain table
+        self.partitioned = False
+        self.split_payload = None  # True if the payloads are kept in cryptocurrency_raw_payloads
+        self.metrics = metrics
+
     def create_database(self):
         """
         Create the database if it doesn't exist.
@@ -58,11 +128,28 @@ class PGConnector:
             self.logger.error(f"Error creating database: {error}")
 
 
-    def connect(self):
+    def connect(self, pool_size=None):
         """
         Establish a connection to the PostgreSQL database.
+
+        :param pool_size: If set, open a thread-safe pool of up to pool_size connections instead of
+                          a single shared connection. Use it when several threads write at once.
         """
         try:
+            if pool_size:
+                self.pool = ThreadedConnectionPool(
+                    1,
+                    pool_size,
+                    host=self.host,
+                    port=self.port,
+                    database=self.db_name,
+                    user=self.user,
+                    password=self.password
+                )
+                self.logger.info(f"Successfully connected to database {self.db_name} "
+                                 f"with a pool of {pool_size} connections")
+                return
+
             self.connection = psycopg2.connect(
                 host=self.host,
                 port=self.port,
@@ -76,33 +163,325 @@ class PGConnector:
         except (Exception, psycopg2.Error) as error:
             self.logger.error(f"Error connecting to PostgreSQL: {error}")
 
+    def _get_healthy_connection(self):
+        """
+        Take a connection from the pool, replacing it if it was dropped.
+
+        Connections idle for longer than health_check_interval are pinged first.
+        """
+        for _ in range(2):
+            connection = self.pool.getconn()
+            idle = time.monotonic() - self.last_used.get(id(connection), 0)
+            try:
+                if connection.closed:
+                    raise psycopg2.InterfaceError("connection already closed")
+                if idle > self.health_check_interval:
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                    connection.rollback()
+                return connection
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as error:
+                self.logger.warning(f"Discarding dropped PostgreSQL connection: {error}")
+                self.last_used.pop(id(connection), None)
+                self.pool.putconn(connection, close=True)
+        return self.pool.getconn()
+
+    @staticmethod
+    def _rollback(connection):
+        """
+        Roll back a transaction, ignoring connections that are already gone.
+        """
+        try:
+            connection.rollback()
+        except psycopg2.Error:
+            pass
+
+    @contextmanager
+    def borrow_connection(self):
+        """
+        Borrow a connection and a cursor for the duration of a with block.
+
+        In pooled mode each caller gets its own connection, so threads never share a transaction;
+        without a pool the single connection is serialized with a lock. The transaction is rolled
+        back if the block raises, and a pooled connection that failed at the network level is
+        discarded so the next borrow reconnects.
+
+        :return: Context manager yielding (connection, cursor)
+        """
+        if self.pool is None:
+            if not self.connection:
+                raise Exception("Database connection not established. Call connect() first.")
+            with self.lock:
+                try:
+                    yield self.connection, self.cursor
+                except Exception:
+                    self._rollback(self.connection)
+                    raise
+            return
+
+        connection = self._get_healthy_connection()
+        broken = False
+        try:
+            with connection.cursor() as cursor:
+                yield connection, cursor
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        except Exception:
+            self._rollback(connection)
+            raise
+        finally:
+            broken = broken or bool(connection.closed)
+            if broken:
+                self.last_used.pop(id(connection), None)
+            else:
+                self.last_used[id(connection)] = time.monotonic()
+            self.pool.putconn(connection, close=broken)
+
 
-    def create_tables(self, schema_dir='./schemas'):
+    def create_tables(self, schema_dir='./schemas', partitioned=False, split_payload=False):
         """
         Create tables using SQL files in the specified directory.
 
         :param schema_dir: Directory containing SQL schema files
+        :param partitioned: Create cryptocurrency_daily_prices range-partitioned by month, from the
+                            schema files in <schema_dir>/partitioned. Only applies if the table does
+                            not exist yet; a plain table is not converted.
+        :param split_payload: Switch to the split layout, from the schema files in <schema_dir>/split_payload:
+                              daily prices keep typed market cap and volume columns and the payloads are
+                              written compressed to cryptocurrency_raw_payloads. Rows already stored keep
+                              their payload inline until they are written again.
         """
-        if not self.connection:
+        if not self.connection and not self.pool:
             raise Exception("Database connection not established. Call connect() first.")
 
         try:
-            schema_files = [f for f in os.listdir(schema_dir) if f.endswith('.sql')]
+            schema_files = {f: os.path.join(schema_dir, f) for f in os.listdir(schema_dir) if f.endswith('.sql')}
+            if partitioned:
+                partitioned_dir = os.path.join(schema_dir, 'partitioned')
+                schema_files.update(
+                    {f: os.path.join(partitioned_dir, f) for f in os.listdir(partitioned_dir) if f.endswith('.sql')}
+                )
 
-            for schema_file in schema_files:
-                file_path = os.path.join(schema_dir, schema_file)
-                with open(file_path, 'r') as f:
-                    sql_script = f.read()
-                    self.cursor.execute(sql_script)
+            schema_paths = [schema_files[f] for f in sorted(schema_files)]
+            if split_payload:
+                # Applied last, they alter the tables created above
+                split_dir = os.path.join(schema_dir, 'split_payload')
+                schema_paths += [os.path.join(split_dir, f) for f in sorted(os.listdir(split_dir)) if f.endswith('.sql')]
 
-            self.connection.commit()
+            with self.borrow_connection() as (connection, cursor):
+                for schema_path in schema_paths:
+                    with open(schema_path, 'r') as f:
+                        sql_script = f.read()
+                        cursor.execute(sql_script)
+
+                connection.commit()
+            self.partitions = None
+            self.split_payload = None
             self.logger.info("Tables created successfully")
+            if partitioned and not self._load_partitions():
+                self.logger.warning("cryptocurrency_daily_prices already exists as a plain table, "
+                                    "it was not partitioned")
         except (Exception, psycopg2.Error) as error:
-            self.connection.rollback()
             self.logger.error(f"Error creating tables: {error}")
 
+    def _load_partitions(self):
+        """
+        Load which partitions cryptocurrency_daily_prices has.
+
+        :return: True if the table is partitioned
+        """
+        with self.lock:
+            if self.partitions is None:
+                with self.borrow_connection() as (connection, cursor):
+                    cursor.execute(partitions.PARTITIONS_QUERY)
+                    row = cursor.fetchone()
+                    connection.commit()
+                self.partitioned = bool(row and row[0])
+                self.partitions = set(row[1]) if self.partitioned else set()
+            return self.partitioned
+
+    def _uses_split_payload(self):
+        """
+        Check once whether the payloads are kept in the archive table (split layout).
+
+        :return: True if cryptocurrency_raw_payloads exists
+        """
+        with self.lock:
+            if self.split_payload is None:
+                with self.borrow_connection() as (connection, cursor):
+                    cursor.execute(payload_archive.ARCHIVE_EXISTS_QUERY)
+                    row = cursor.fetchone()
+                    connection.commit()
+                self.split_payload = bool(row and row[0])
+            return self.split_payload
+
+    def ensure_partitions(self, dates, months_ahead=1):
+        """
+        Create the monthly partitions of cryptocurrency_daily_prices the dates fall in, if missing.
+
+        The month after the latest date is created along, so a daily ingestion rolling over to
+        a new month finds its partition ready. Known partitions are cached: only the first batch
+        of a new month runs DDL, in a short transaction of its own. Does nothing on a plain table.
 
-    def insert_daily_price(self, coin_id, price_usd, date, full_response):
+        :param dates: Dates about to be written (YYYY-MM-DD, date or datetime)
+        :param months_ahead: Number of future months created along
+        :return: Number of partitions created
+        """
+        if not self._load_partitions():
+            return 0
+
+        with self.lock:
+            missing = [
+                (name, month_start, month_end)
+                for name, month_start, month_end in partitions.month_partitions(dates, months_ahead)
+                if name not in self.partitions
+            ]
+            if not missing:
+                return 0
+            with self.borrow_connection() as (connection, cursor):
+                cursor.execute(partitions.PARTITION_LOCK_QUERY)
+                # Another process may have created some of them meanwhile
+                cursor.execute(partitions.PARTITIONS_QUERY)
+                self.partitions = set(cursor.fetchone()[1])
+                missing = [partition for partition in missing if partition[0] not in self.partitions]
+                for name, month_start, month_end in missing:
+                    cursor.execute(partitions.create_partition_query(name, month_start, month_end))
+                connection.commit()
+            self.partitions.update(name for name, _, _ in missing)
+        if not missing:
+            return 0
+        self.logger.info(f"Created partitions {', '.join(name for name, _, _ in missing)}")
+        return len(missing)
+
+    def archive_partitions(self, before_date, action='detach', compression='lz4'):
+        """
+        Detach or compress the monthly partitions holding only dates before before_date.
+
+        - detach: the partition becomes a standalone table, e.g. to be dumped and dropped, and
+          leaves every query, index and vacuum of cryptocurrency_daily_prices.
+        - compress: the payloads are rewritten with the given TOAST compression method and the
+          partition is vacuumed with FREEZE, so later vacuums skip it.
+
+        :param before_date: First date to keep as is (YYYY-MM-DD)
+        :param action: 'detach' or 'compress'
+        :param compression: TOAST compression method used by compress, 'pglz' or 'lz4' (which needs a
+                            server built with it)
+        :return: Names of the partitions archived, or None if it failed
+        """
+        if action not in ('detach', 'compress'):
+            raise ValueError(f"Unknown archive action: {action}")
+        # Pasted into ALTER TABLE, which takes no parameters
+        if compression not in ('pglz', 'lz4'):
+            raise ValueError(f"Unknown compression method: {compression}")
+
+        try:
+            if not self._load_partitions():
+                self.logger.error("cryptocurrency_daily_prices is not partitioned")
+                return None
+            with self.lock:
+                old = partitions.partitions_before(self.partitions, before_date)
+
+            for name in old:
+                if action == 'detach':
+                    with self.borrow_connection() as (connection, cursor):
+                        cursor.execute(f'ALTER TABLE {partitions.PARENT_TABLE} DETACH PARTITION "{name}";')
+                        connection.commit()
+                    with self.lock:
+                        self.partitions.discard(name)
+                else:
+                    with self.borrow_connection() as (connection, cursor):
+                        cursor.execute(f'ALTER TABLE "{name}" ALTER COLUMN full_response SET COMPRESSION {compression};')
+                        # Values are only compressed again when they are rebuilt
+                        cursor.execute(f'UPDATE "{name}" SET full_response = full_response::text::jsonb;')
+                        connection.commit()
+                        # VACUUM cannot run inside a transaction
+                        connection.autocommit = True
+                        try:
+                            cursor.execute(f'VACUUM (FULL, FREEZE, ANALYZE) "{name}";')
+                        finally:
+                            connection.autocommit = False
+                self.logger.info(f"Archived partition {name} ({action})")
+            return old
+        except (Exception, psycopg2.Error) as error:
+            self.logger.error(f"Error archiving partitions: {error}")
+            return None
+
+
+    def create_analytics(self, schema_dir='./schemas'):
+        """
+        Create the analytics extension of the schema: market_cap_usd and volume_usd columns
+        generated from full_response, a covering (coin_id, date) index and the materialized
+        views read by the dashboards. Run it after create_tables().
+
+        The first run adds the generated columns, which rewrites cryptocurrency_daily_prices once.
+
+        :param schema_dir: Directory containing SQL schema files
+        """
+        if not self.connection and not self.pool:
+            raise Exception("Database connection not established. Call connect() first.")
+
+        try:
+            with open(os.path.join(schema_dir, 'analytics', 'cryptocurrency_analytics.sql'), 'r') as f:
+                sql_script = f.read()
+            with self.borrow_connection() as (connection, cursor):
+                cursor.execute(sql_script)
+                connection.commit()
+            self.logger.info("Analytics views created successfully")
+        except (Exception, psycopg2.Error) as error:
+            self.logger.error(f"Error creating analytics views: {error}")
+
+    def refresh_analytics(self, wait=True):
+        """
+        Refresh the analytics materialized views.
+
+        Views are refreshed CONCURRENTLY: readers keep seeing the previous contents meanwhile and
+        only the rows that changed are written. Refreshes from several threads or processes are
+        serialized with an advisory lock.
+
+        :param wait: Wait for a refresh running elsewhere to finish, instead of skipping this one.
+                     Writers skip after each batch and wait once at the end of the run.
+        :return: True if the views were refreshed, False if skipped, None if the refresh failed
+        """
+        lock_query = "SELECT pg_advisory_xact_lock(hashtext('cryptocurrency_analytics')), TRUE;"
+        if not wait:
+            lock_query = "SELECT pg_try_advisory_xact_lock(hashtext('cryptocurrency_analytics'));"
+        try:
+            with self.borrow_connection() as (connection, cursor):
+                cursor.execute(lock_query)
+                if not cursor.fetchone()[-1]:
+                    connection.rollback()
+                    return False
+                for view in self.ANALYTICS_VIEWS:
+                    cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view};")
+                connection.commit()
+            self.logger.info("Refreshed analytics views")
+            return True
+        except (Exception, psycopg2.Error) as error:
+            self.logger.error(f"Error refreshing analytics views: {error}")
+            return None
+
+    def _observe(self, stage, start, **kwargs):
+        """
+        Record a stage that started at start (time.perf_counter()) in the metrics, if any.
+        """
+        if self.metrics is not None:
+            self.metrics.observe(stage, time.perf_counter() - start, **kwargs)
+
+    @staticmethod
+    def _json_payload(full_response, raw_response=None):
+        """
+        Return the JSON text stored in full_response.
+
+        :param full_response: Parsed API response
+        :param raw_response: Response body as received, stored as is to avoid serializing it again
+        :return: JSON text
+        """
+        if raw_response is not None:
+            return raw_response.decode('utf-8') if isinstance(raw_response, bytes) else raw_response
+        return json.dumps(full_response)
+
+    def insert_daily_price(self, coin_id, price_usd, date, full_response, raw_response=None, prices_only=False):
         """
         Insert daily cryptocurrency price data.
 
@@ -110,9 +489,21 @@ class PGConnector:
         :param price_usd: Price in USD
         :param date: Date of the price
         :param full_response: Full JSON response (dict or JSON-serializable object)
+        :param raw_response: Optional response body (bytes or str) stored instead of serializing full_response
+        :param prices_only: full_response only holds the price, market cap and volume of a range
+                            request: a coin-day already stored keeps its payload
+        :return: True if the price was stored, False if the insert failed
         """
+        start = time.perf_counter()
         try:
-            json_response = json.dumps(full_response)
+            self.ensure_partitions([date])
+            if self._uses_split_payload():
+                size = self._insert_split_daily_price(coin_id, price_usd, date, full_response, raw_response,
+                                                      prices_only)
+                self._observe('pg_insert', start, size=size)
+                return True
+
+            json_response = self._json_payload(full_response, raw_response)
 
             insert_query = """
             INSERT INTO cryptocurrency_daily_prices 
@@ -122,43 +513,542 @@ class PGConnector:
             SET price_usd = EXCLUDED.price_usd, 
                 full_response = EXCLUDED.full_response;
             """
-            self.cursor.execute(insert_query, (coin_id, price_usd, date, json_response))
-            self.connection.commit()
+            if prices_only:
+                # A range payload keeps the full payload of a coin-day already stored
+                insert_query = """
+                INSERT INTO cryptocurrency_daily_prices
+                (coin_id, price_usd, date, full_response)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (coin_id, date) DO UPDATE
+                SET price_usd = EXCLUDED.price_usd;
+                """
+            with self.borrow_connection() as (connection, cursor):
+                cursor.execute(insert_query, (coin_id, price_usd, date, json_response))
+                connection.commit()
+            self._observe('pg_insert', start, size=len(json_response))
             self.logger.info(f"Inserted daily price for {coin_id} on {date}")
+            return True
         except (Exception, psycopg2.Error) as error:
-            self.connection.rollback()
+            self._observe('pg_insert', start, error=True)
             self.logger.error(f"Error inserting daily price: {error}")
+            return False
+
+
+    @staticmethod
+    def _daily_price_updates(split_payload, prices_only):
+        """
+        Return the SET clause applied to a coin-day already in cryptocurrency_daily_prices.
+
+        Range payloads only hold the price, market cap and volume: they update those and keep the
+        full payload of the coin-day.
+
+        :param split_payload: The table is in the split layout
+        :param prices_only: The rows come from range requests
+        :return: SQL assignments referencing EXCLUDED
+        """
+        if not split_payload:
+            if prices_only:
+                return "price_usd = EXCLUDED.price_usd"
+            return "price_usd = EXCLUDED.price_usd, full_response = EXCLUDED.full_response"
+        updates = ("price_usd = EXCLUDED.price_usd, market_cap_usd = EXCLUDED.market_cap_usd, "
+                   "volume_usd = EXCLUDED.volume_usd")
+        # A full payload moves to the archive; a range payload leaves an inline one where it is
+        return updates if prices_only else updates + ", full_response = NULL"
+
+    @staticmethod
+    def _payload_conflict_action(prices_only):
+        """Return the ON CONFLICT action of cryptocurrency_raw_payloads: range payloads never replace one"""
+        return "DO NOTHING" if prices_only else "DO UPDATE SET payload = EXCLUDED.payload"
+
+    def _insert_split_daily_price(self, coin_id, price_usd, date, full_response, raw_response=None,
+                                  prices_only=False):
+        """
+        Insert a daily price in the split layout: typed columns in cryptocurrency_daily_prices and
+        the compressed payload in cryptocurrency_raw_payloads, in one transaction.
+
+        :return: Size of the compressed payload in bytes
+        """
+        market_cap, volume = payload_archive.market_values(full_response)
+        payload = payload_archive.compress_payload(full_response, raw_response)
+
+        insert_query = f"""
+        INSERT INTO cryptocurrency_daily_prices
+        (coin_id, price_usd, date, market_cap_usd, volume_usd)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (coin_id, date) DO UPDATE
+        SET {self._daily_price_updates(True, prices_only)};
+        """
+        archive_query = f"""
+        INSERT INTO cryptocurrency_raw_payloads (coin_id, date, payload)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (coin_id, date) {self._payload_conflict_action(prices_only)};
+        """
+        with self.borrow_connection() as (connection, cursor):
+            cursor.execute(insert_query, (coin_id, price_usd, date, market_cap, volume))
+            cursor.execute(archive_query, (coin_id, date, psycopg2.Binary(payload)))
+            connection.commit()
+        self.logger.info(f"Inserted daily price for {coin_id} on {date}")
+        return len(payload)
+
+    def load_raw_payload(self, coin_id, date):
+        """
+        Load the API payload stored with a daily price.
+
+        In the split layout the payload is read from cryptocurrency_raw_payloads and decompressed;
+        rows stored before the switch are read from full_response.
 
+        :param coin_id: Identifier for the cryptocurrency
+        :param date: Date of the price (YYYY-MM-DD)
+        :return: Parsed API response, or None if the coin-day is not stored or the query failed
+        """
+        try:
+            split_payload = self._uses_split_payload()
+            with self.borrow_connection() as (connection, cursor):
+                payload = None
+                if split_payload:
+                    cursor.execute(
+                        "SELECT payload FROM cryptocurrency_raw_payloads WHERE coin_id = %s AND date = %s;",
+                        (coin_id, date)
+                    )
+                    row = cursor.fetchone()
+                    payload = payload_archive.decompress_payload(row[0]) if row else None
+                if payload is None:
+                    cursor.execute(
+                        "SELECT full_response FROM cryptocurrency_daily_prices WHERE coin_id = %s AND date = %s;",
+                        (coin_id, date)
+                    )
+                    row = cursor.fetchone()
+                    payload = row[0] if row else None
+                connection.commit()
+            return payload
+        except (Exception, psycopg2.Error) as error:
+            self.logger.error(f"Error loading raw payload: {error}")
+            return None
 
     def update_monthly_aggregates(self, coin_id, date, price_usd):
         """
         Update monthly aggregates for a given coin and date.
 
+        The month is recomputed from the stored daily prices, so the price must be stored first.
+        Bulk writers should use insert_daily_prices_bulk or flush_monthly_aggregates instead,
+        which update each month once per batch.
+
         :param coin_id: Identifier for the cryptocurrency
         :param date: Date of the price
         :param price_usd: Price in USD
         """
+        start = time.perf_counter()
         try:
             date_obj = datetime.strptime(date, '%Y-%m-%d')
             year = date_obj.year
             month = date_obj.month
 
-            upsert_query = """
-            INSERT INTO cryptocurrency_monthly_aggregates 
-            (coin_id, year, month, min_price, max_price) 
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (coin_id, year, month) DO UPDATE 
-            SET min_price = LEAST(cryptocurrency_monthly_aggregates.min_price, EXCLUDED.min_price),
-                max_price = GREATEST(cryptocurrency_monthly_aggregates.max_price, EXCLUDED.max_price);
-            """
-
-            self.cursor.execute(upsert_query, (coin_id, year, month, price_usd, price_usd))
-            self.connection.commit()
+            with self.borrow_connection() as (connection, cursor):
+                self._recompute_months(cursor, [(coin_id, year, month)])
+                connection.commit()
+            self._observe('pg_monthly_aggregates', start)
             self.logger.info(f"Updated monthly aggregates for {coin_id} in {year}-{month}")
         except (Exception, psycopg2.Error) as error:
-            self.connection.rollback()
+            self._observe('pg_monthly_aggregates', start, error=True)
             self.logger.error(f"Error updating monthly aggregates: {error}")
 
+    def _recompute_months(self, cursor, keys):
+        """
+        Recompute some months from the daily prices. The caller commits.
+
+        :param cursor: Cursor of the caller's transaction
+        :param keys: List of (coin_id, year, month)
+        :return: Number of monthly rows written
+        """
+        if not keys:
+            return 0
+        recompute_query = f"""
+        INSERT INTO cryptocurrency_monthly_aggregates {self.MONTHLY_COLUMNS}
+        SELECT {self.MONTHLY_STATS}
+        FROM unnest(%s::varchar[], %s::int[], %s::int[]) AS k(coin_id, year, month)
+        JOIN cryptocurrency_daily_prices d
+          ON d.coin_id = k.coin_id
+         AND d.date >= make_date(k.year, k.month, 1)
+         AND d.date < make_date(k.year, k.month, 1) + INTERVAL '1 month'
+        GROUP BY d.coin_id, EXTRACT(YEAR FROM d.date), EXTRACT(MONTH FROM d.date)
+        {self.MONTHLY_OVERWRITE};
+        """
+        coin_ids, years, months = (list(column) for column in zip(*keys))
+        cursor.execute(recompute_query, (coin_ids, years, months))
+        return cursor.rowcount
+
+    def _merge_monthly_stats(self, cursor, stats):
+        """
+        Merge the statistics flushed by a MonthlyAggregator into the monthly aggregates. The caller commits.
+
+        New months are inserted and stored months are merged with LEAST/GREATEST, summed counts
+        and the earliest open and latest close, in one statement. Revised months, and months
+        stored without the avg/open/close/count statistics, are recomputed from the daily prices.
+
+        :param cursor: Cursor of the caller's transaction
+        :param stats: Statistics returned by MonthlyAggregator.flush
+        :return: Number of monthly rows written
+        """
+        merged, recompute = MonthlyAggregator.split_stats(stats)
+
+        count = 0
+        if merged:
+            merge_query = self.monthly_merge_query(['%s'] * len(self.MONTHLY_MERGE_INPUT))
+            cursor.execute(merge_query, tuple(self.monthly_merge_values(merged)))
+            written = set(cursor.fetchall())
+            count += len(written)
+            recompute += MonthlyAggregator.unmerged_months(merged, written)
+        return count + self._recompute_months(cursor, recompute)
+
+    @classmethod
+    def monthly_merge_query(cls, placeholders):
+        """
+        Build the statement merging the statistics of a MonthlyAggregator flush into the monthly
+        aggregates, for the parameter placeholders of a driver.
+
+        :param placeholders: One placeholder per MONTHLY_MERGE_INPUT column, e.g. '%s' or '$1'
+        :return: SQL statement returning the (coin_id, year, month) it wrote
+        """
+        arrays = ", ".join(f"{placeholder}::{sql_type}[]"
+                           for placeholder, (_, sql_type) in zip(placeholders, cls.MONTHLY_MERGE_INPUT))
+        names = ", ".join(column for column, _ in cls.MONTHLY_MERGE_INPUT)
+        return f"""
+        INSERT INTO cryptocurrency_monthly_aggregates AS a {cls.MONTHLY_COLUMNS}
+        SELECT coin_id, year, month, min_price, max_price, sum_price / day_count, open_price, close_price,
+               day_count, sum_price, open_date, close_date
+        FROM unnest({arrays}) AS s({names})
+        {cls.MONTHLY_MERGE};
+        """
+
+    @classmethod
+    def monthly_merge_values(cls, stats):
+        """
+        Arrange statistics as the arrays of parameters of monthly_merge_query.
+
+        :param stats: Statistics returned by MonthlyAggregator.flush
+        :return: List of one list per MONTHLY_MERGE_INPUT column
+        """
+        return [[stat[column] for stat in stats] for column, _ in cls.MONTHLY_MERGE_INPUT]
+
+    def flush_monthly_aggregates(self, aggregator):
+        """
+        Write the months collected by a MonthlyAggregator since its last flush, in one transaction.
+
+        :param aggregator: MonthlyAggregator fed with the daily prices stored since the last flush
+        :return: Number of monthly rows written, or None if the flush failed
+        """
+        stats = aggregator.flush()
+        if not stats:
+            return 0
+        try:
+            with self.borrow_connection() as (connection, cursor):
+                count = self._merge_monthly_stats(cursor, stats)
+                connection.commit()
+            self.logger.info(f"Flushed {count} monthly aggregates")
+            return count
+        except (Exception, psycopg2.Error) as error:
+            self.logger.error(f"Error flushing monthly aggregates: {error}")
+            return None
+
+    def insert_daily_prices_bulk(self, rows, page_size=1000):
+        """
+        Insert many daily prices and update their monthly aggregates in a single transaction.
+
+        Rows are loaded into a temporary table with execute_values and merged into
+        cryptocurrency_daily_prices with one INSERT ... ON CONFLICT. The merged prices are
+        collected per (coin, month) by a MonthlyAggregator and written to the monthly aggregates
+        once for the whole batch. In the split layout the payloads are compressed and merged into
+        cryptocurrency_raw_payloads in the same transaction.
+
+        :param rows: List of dicts with coin_id, price_usd, date (YYYY-MM-DD) and full_response keys,
+                     and optionally the response body under raw_response and prices_only (range
+                     payloads, which keep the payload of coin-days already stored)
+        :param page_size: Number of rows sent per statement by execute_values
+        :return: Number of rows written (0 if the batch was rolled back)
+        """
+        if not rows:
+            return 0
+
+        start = time.perf_counter()
+        try:
+            self.ensure_partitions([row['date'] for row in rows])
+            split_payload = self._uses_split_payload()
+            if split_payload:
+                payloads = [payload_archive.compress_payload(row['full_response'], row.get('raw_response'))
+                            for row in rows]
+                values = [
+                    (row['coin_id'], row['price_usd'], row['date'],
+                     *payload_archive.market_values(row['full_response']), psycopg2.Binary(payload),
+                     bool(row.get('prices_only')))
+                    for row, payload in zip(rows, payloads)
+                ]
+                staged_columns = "coin_id, price_usd, date, market_cap_usd, volume_usd, payload, prices_only"
+                stored_columns = "coin_id, price_usd, date, market_cap_usd, volume_usd"
+            else:
+                payloads = [self._json_payload(row['full_response'], row.get('raw_response')) for row in rows]
+                values = [
+                    (row['coin_id'], row['price_usd'], row['date'], payload, bool(row.get('prices_only')))
+                    for row, payload in zip(rows, payloads)
+                ]
+                staged_columns = "coin_id, price_usd, date, full_response, prices_only"
+                stored_columns = "coin_id, price_usd, date, full_response"
+            # Full and range payloads are merged apart: range payloads keep the stored ones
+            row_kinds = sorted({bool(row.get('prices_only')) for row in rows})
+
+            staging_query = """
+            CREATE TEMP TABLE staging_daily_prices (
+                row_order SERIAL,
+                coin_id VARCHAR(50) NOT NULL,
+                price_usd NUMERIC(20, 8) NOT NULL,
+                date DATE NOT NULL,
+                full_response JSONB,
+                market_cap_usd NUMERIC,
+                volume_usd NUMERIC,
+                payload BYTEA,
+                prices_only BOOLEAN NOT NULL
+            ) ON COMMIT DROP;
+            """
+            # Batches written concurrently update the same months one after the other, so a month
+            # recomputed by the second one always sees the rows committed by the first
+            lock_query = """
+            SELECT pg_advisory_xact_lock(hashtext(coin_id || ':' || month_start))
+            FROM (
+                SELECT DISTINCT coin_id, TO_CHAR(date, 'YYYY-MM') AS month_start
+                FROM staging_daily_prices
+                ORDER BY 1, 2
+            ) touched;
+            """
+            # Every CTE reads the table as it was before the merge, which tells inserted coin-days
+            # from overwritten ones (xmax cannot be read back from a partitioned table)
+            merge_query = """
+            WITH batch AS (
+                SELECT DISTINCT ON (coin_id, date) {stored_columns}
+                FROM staging_daily_prices
+                WHERE prices_only = %s
+                ORDER BY coin_id, date, row_order DESC
+            ),
+            existing AS (
+                SELECT b.coin_id, b.date
+                FROM batch b
+                JOIN cryptocurrency_daily_prices d ON d.coin_id = b.coin_id AND d.date = b.date
+            ),
+            merged AS (
+                INSERT INTO cryptocurrency_daily_prices 
+                ({stored_columns}) 
+                SELECT {stored_columns}
+                FROM batch
+                ON CONFLICT (coin_id, date) DO UPDATE 
+                SET {stored_updates}
+                RETURNING coin_id, date, price_usd
+            )
+            SELECT m.coin_id, m.date, m.price_usd, e.coin_id IS NULL AS inserted
+            FROM merged m
+            LEFT JOIN existing e ON e.coin_id = m.coin_id AND e.date = m.date;
+            """
+            archive_query = """
+            INSERT INTO cryptocurrency_raw_payloads (coin_id, date, payload)
+            SELECT DISTINCT ON (coin_id, date) coin_id, date, payload
+            FROM staging_daily_prices
+            WHERE prices_only = %s
+            ORDER BY coin_id, date, row_order DESC
+            ON CONFLICT (coin_id, date) {conflict_action};
+            """
+            with self.borrow_connection() as (connection, cursor):
+                cursor.execute(staging_query)
+                execute_values(
+                    cursor,
+                    f"INSERT INTO staging_daily_prices ({staged_columns}) VALUES %s",
+                    values,
+                    page_size=page_size
+                )
+                cursor.execute(lock_query)
+                aggregator = MonthlyAggregator()
+                for prices_only in row_kinds:
+                    cursor.execute(merge_query.format(
+                        stored_columns=stored_columns,
+                        stored_updates=self._daily_price_updates(split_payload, prices_only)
+                    ), (prices_only,))
+                    for coin_id, day, price_usd, inserted in cursor.fetchall():
+                        aggregator.add(coin_id, day, price_usd, inserted)
+                    if split_payload:
+                        cursor.execute(archive_query.format(
+                            conflict_action=self._payload_conflict_action(prices_only)
+                        ), (prices_only,))
+                self._merge_monthly_stats(cursor, aggregator.flush())
+                connection.commit()
+            self._observe('pg_bulk_insert', start, size=sum(len(payload) for payload in payloads), items=len(rows))
+            self.logger.info(f"Inserted {len(rows)} daily prices in one batch")
+            return len(rows)
+        except (Exception, psycopg2.Error) as error:
+            self._observe('pg_bulk_insert', start, items=len(rows), error=True)
+            self.logger.error(f"Error inserting daily prices batch: {error}")
+            return 0
+
+
+    def recompute_monthly_aggregates(self, coin_ids=None, start_date=None, end_date=None):
+        """
+        Recompute the monthly aggregates from the daily prices in one set-based statement.
+
+        Used as the final merge step of a sharded backfill and by the rebuild-aggregates command.
+        Every month overlapping the range is recomputed in full, min and max as well as the
+        avg/open/close/count statistics.
+
+        :param coin_ids: Coins to recompute (default: every coin)
+        :param start_date: First date of the range (YYYY-MM-DD, default: no lower bound)
+        :param end_date: Last date of the range (YYYY-MM-DD, default: no upper bound)
+        :return: Number of monthly rows written, or None if the statement failed
+        """
+        recompute_query = f"""
+        INSERT INTO cryptocurrency_monthly_aggregates {self.MONTHLY_COLUMNS}
+        SELECT {self.MONTHLY_STATS}
+        FROM cryptocurrency_daily_prices d
+        WHERE (%(coin_ids)s::varchar[] IS NULL OR d.coin_id = ANY(%(coin_ids)s::varchar[]))
+          AND (%(start_date)s::date IS NULL OR d.date >= DATE_TRUNC('month', %(start_date)s::date))
+          AND (%(end_date)s::date IS NULL
+               OR d.date < DATE_TRUNC('month', %(end_date)s::date) + INTERVAL '1 month')
+        GROUP BY d.coin_id, EXTRACT(YEAR FROM d.date), EXTRACT(MONTH FROM d.date)
+        {self.MONTHLY_OVERWRITE};
+        """
+        params = {
+            'coin_ids': list(coin_ids) if coin_ids else None,
+            'start_date': start_date,
+            'end_date': end_date
+        }
+        try:
+            with self.borrow_connection() as (connection, cursor):
+                cursor.execute(recompute_query, params)
+                count = cursor.rowcount
+                connection.commit()
+            self.logger.info(f"Recomputed {count} monthly aggregates")
+            return count
+        except (Exception, psycopg2.Error) as error:
+            self.logger.error(f"Error recomputing monthly aggregates: {error}")
+            return None
+
+    def find_missing_dates(self, coin_ids, start_date, end_date):
+        """
+        Find the coin-days of a date range that are not stored yet.
+
+        The calendar of every coin is anti-joined with cryptocurrency_daily_prices, which is
+        answered from its (coin_id, date) unique index without reading any stored row.
+
+        :param coin_ids: List of coin identifiers
+        :param start_date: First date of the range (YYYY-MM-DD)
+        :param end_date: Last date of the range (YYYY-MM-DD)
+        :return: Dict mapping each coin to its missing dates (YYYY-MM-DD), or None if the query failed
+        """
+        missing_query = """
+        SELECT c.coin_id, d.day::date
+        FROM unnest(%s::varchar[]) AS c(coin_id)
+        CROSS JOIN generate_series(%s::date, %s::date, interval '1 day') AS d(day)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM cryptocurrency_daily_prices p
+            WHERE p.coin_id = c.coin_id AND p.date = d.day::date
+        )
+        ORDER BY c.coin_id, d.day;
+        """
+        try:
+            with self.borrow_connection() as (connection, cursor):
+                cursor.execute(missing_query, (list(coin_ids), start_date, end_date))
+                rows = cursor.fetchall()
+                connection.commit()
+
+            missing = {coin_id: [] for coin_id in coin_ids}
+            for coin_id, day in rows:
+                missing[coin_id].append(day.strftime('%Y-%m-%d'))
+            self.logger.info(f"Found {len(rows)} missing coin-days between {start_date} and {end_date}")
+            return missing
+        except (Exception, psycopg2.Error) as error:
+            self.logger.error(f"Error finding missing dates: {error}")
+            return None
+
+    @staticmethod
+    def _select_columns(query, columns=None):
+        """
+        Wrap a query so that the server only sends some of its columns.
+
+        :param query: SQL query string
+        :param columns: Column names to keep, in order (default: every column)
+        :return: SQL composable
+        """
+        if not columns:
+            return sql.SQL(query)
+        return sql.SQL("SELECT {} FROM ({}) AS q").format(
+            sql.SQL(', ').join(sql.Identifier(column) for column in columns),
+            sql.SQL(query.strip().rstrip(';'))
+        )
+
+    def iter_query(self, query, chunk_size=10000, params=None, columns=None, dtypes=None, arrow=False):
+        """
+        Stream the results of a query in chunks, read from a server-side (named) cursor.
+
+        Only chunk_size rows are held in memory at a time, whatever the size of the result. The
+        borrowed connection stays in use until the generator is exhausted or closed; without a
+        pool the other threads wait for it meanwhile.
+
+        :param query: SQL query string, with %s or %(name)s placeholders for params
+        :param chunk_size: Number of rows fetched from the server and yielded at once
+        :param params: Optional query parameters
+        :param columns: Column names to keep, selected on the server so the others are never sent
+        :param dtypes: Optional dict mapping columns to the dtypes they are converted to, e.g.
+                       {'price_usd': 'float64'} instead of Decimal objects
+        :param arrow: Yield pyarrow RecordBatches instead of DataFrames
+        :return: Generator of DataFrames (or RecordBatches); nothing is yielded for an empty result
+        """
+        try:
+            with self.borrow_connection() as (connection, _):
+                cursor = connection.cursor(name=f"iter_query_{uuid.uuid4().hex}")
+                try:
+                    cursor.itersize = chunk_size
+                    cursor.execute(self._select_columns(query, columns), params)
+                    while True:
+                        records = cursor.fetchmany(chunk_size)
+                        if not records:
+                            break
+                        frame = pd.DataFrame.from_records(records, columns=[column.name for column in cursor.description])
+                        if dtypes:
+                            frame = frame.astype(dtypes)
+                        yield pa.RecordBatch.from_pandas(frame, preserve_index=False) if arrow else frame
+                    cursor.close()
+                    connection.commit()
+                finally:
+                    # Also reached when the caller stops iterating early
+                    if not cursor.closed:
+                        self._rollback(connection)
+        except (Exception, psycopg2.Error) as error:
+            self.logger.error(f"Error streaming query: {error}")
+            raise
+
+    def export_query(self, query, destination, params=None, columns=None, header=True):
+        """
+        Export the results of a query as CSV with COPY ... TO STDOUT.
+
+        Rows are formatted by the server and written to the destination as they arrive, without
+        building any Python object per row: the fast path for bulk exports.
+
+        :param query: SQL query string, with %s or %(name)s placeholders for params
+        :param destination: Path of the CSV file, or a writable file object
+        :param params: Optional query parameters
+        :param columns: Column names to export, selected on the server (default: every column)
+        :param header: Write the column names as the first line
+        :return: Number of rows exported, or None if the export failed
+        """
+        try:
+            with self.borrow_connection() as (connection, cursor):
+                select_query = cursor.mogrify(self._select_columns(query, columns), params).decode('utf-8')
+                copy_query = f"COPY ({select_query.strip().rstrip(';')}) TO STDOUT WITH (FORMAT csv{', HEADER' if header else ''})"
+                if isinstance(destination, (str, os.PathLike)):
+                    with open(destination, 'w', newline='') as f:
+                        cursor.copy_expert(copy_query, f)
+                else:
+                    cursor.copy_expert(copy_query, destination)
+                count = cursor.rowcount
+                connection.commit()
+            self.logger.info(f"Exported {count} rows")
+            return count
+        except (Exception, psycopg2.Error) as error:
+            self.logger.error(f"Error exporting query: {error}")
+            return None
 
     def close_connection(self):
         """
@@ -169,9 +1059,14 @@ class PGConnector:
                 self.cursor.close()
             if self.connection:
                 self.connection.close()
+            if self.pool:
+                self.pool.closeall()
+                self.pool = None
         except (Exception, psycopg2.Error) as error:
-            self.connection.rollback()
-            self.logger.error(f"Error updating monthly aggregates: {error}")
+            # Pooled connectors have no connection of their own
+            if self.connection:
+                self._rollback(self.connection)
+            self.logger.error(f"Error closing connection: {error}")
 
 
     ################# For Task 3 only  #################
@@ -181,17 +1076,17 @@ class PGConnector:
 
         :param sql_file_path: Path to the SQL file to execute
         """
-        if not self.connection:
+        if not self.connection and not self.pool:
             raise Exception("Database connection not established. Call connect() first.")
 
         try:
             with open(sql_file_path, 'r') as file:
                 sql_script = file.read()
-                self.cursor.execute(sql_script)
-            self.connection.commit()
+            with self.borrow_connection() as (connection, cursor):
+                cursor.execute(sql_script)
+                connection.commit()
             self.logger.info(f"Executed SQL file: {sql_file_path}")
         except (Exception, psycopg2.Error) as error:
-            self.connection.rollback()
             self.logger.error(f"Error executing SQL file: {error}")
 
     def query_coin_data(self, query):
@@ -202,10 +1097,8 @@ class PGConnector:
         :return: DataFrame with query results
         """
         try:
-            if not self.connection:
-                raise Exception("Database connection not established. Call connect() first.")
-
-            df = pd.read_sql(query, self.connection)
+            with self.borrow_connection() as (connection, cursor):
+                df = pd.read_sql(query, connection)
             return df
 
         except (Exception, psycopg2.Error) as error:
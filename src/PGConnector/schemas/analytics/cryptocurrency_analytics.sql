@@ -0,0 +1,58 @@
+-- Market cap and volume extracted once, when a row is written, instead of on every query
+ALTER TABLE cryptocurrency_daily_prices
+    ADD COLUMN IF NOT EXISTS market_cap_usd NUMERIC
+        GENERATED ALWAYS AS ((full_response->'market_data'->'market_cap'->>'usd')::NUMERIC) STORED,
+    ADD COLUMN IF NOT EXISTS volume_usd NUMERIC
+        GENERATED ALWAYS AS ((full_response->'market_data'->'total_volume'->>'usd')::NUMERIC) STORED;
+
+-- Window functions over (coin_id, date) and latest-value lookups are answered by index-only scans
+CREATE INDEX IF NOT EXISTS cryptocurrency_daily_prices_coin_date_covering
+    ON cryptocurrency_daily_prices (coin_id, date) INCLUDE (price_usd, market_cap_usd, volume_usd);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS cryptocurrency_monthly_averages AS
+SELECT coin_id,
+       DATE_TRUNC('month', date)::DATE AS month,
+       AVG(price_usd) AS average_price,
+       AVG(market_cap_usd) AS average_market_cap_usd,
+       AVG(volume_usd) AS average_volume_usd,
+       COUNT(*) AS day_count
+FROM cryptocurrency_daily_prices
+GROUP BY coin_id, DATE_TRUNC('month', date);
+
+-- One row per run of consecutive price drops, with the price of the day after it ended
+CREATE MATERIALIZED VIEW IF NOT EXISTS cryptocurrency_drop_streaks AS
+WITH price_changes AS (
+    SELECT coin_id, date, price_usd,
+           LAG(price_usd) OVER w AS prev_price,
+           LEAD(date) OVER w AS next_date,
+           LEAD(price_usd) OVER w AS next_price
+    FROM cryptocurrency_daily_prices
+    WINDOW w AS (PARTITION BY coin_id ORDER BY date)
+),
+drops AS (
+    SELECT coin_id, date, price_usd, next_date, next_price, price_usd < prev_price AS is_drop,
+           SUM(CASE WHEN price_usd < prev_price THEN 0 ELSE 1 END)
+               OVER (PARTITION BY coin_id ORDER BY date) AS streak_id
+    FROM price_changes
+),
+streaks AS (
+    SELECT coin_id,
+           MIN(date) AS start_date,
+           MAX(date) AS end_date,
+           COUNT(*) AS streak_days,
+           (ARRAY_AGG(price_usd ORDER BY date DESC))[1] AS end_price,
+           (ARRAY_AGG(next_date ORDER BY date DESC))[1] AS next_date,
+           (ARRAY_AGG(next_price ORDER BY date DESC))[1] AS next_price
+    FROM drops
+    WHERE is_drop
+    GROUP BY coin_id, streak_id
+)
+SELECT coin_id, start_date, end_date, streak_days, end_price, next_date, next_price,
+       (next_price - end_price) / NULLIF(end_price, 0) * 100 AS rebound_pct
+FROM streaks;
+
+-- REFRESH ... CONCURRENTLY needs a unique index on each view
+CREATE UNIQUE INDEX IF NOT EXISTS cryptocurrency_monthly_averages_key
+    ON cryptocurrency_monthly_averages (coin_id, month);
+CREATE UNIQUE INDEX IF NOT EXISTS cryptocurrency_drop_streaks_key
+    ON cryptocurrency_drop_streaks (coin_id, start_date);
@@ -0,0 +1,18 @@
+CREATE TABLE IF NOT EXISTS cryptocurrency_daily_features (
+    coin_id VARCHAR(50) NOT NULL,
+    date DATE NOT NULL,
+    price_usd DOUBLE PRECISION NOT NULL,
+    price_lag_1 DOUBLE PRECISION,
+    price_lag_2 DOUBLE PRECISION,
+    price_lag_3 DOUBLE PRECISION,
+    price_lag_4 DOUBLE PRECISION,
+    price_lag_5 DOUBLE PRECISION,
+    price_lag_6 DOUBLE PRECISION,
+    price_lag_7 DOUBLE PRECISION,
+    price_7d_mean DOUBLE PRECISION,
+    price_7d_std DOUBLE PRECISION,
+    price_7d_skew DOUBLE PRECISION,
+    price_7d_variance DOUBLE PRECISION,
+    computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (coin_id, date)
+);
@@ -1,4 +1,3 @@
-
 CREATE TABLE IF NOT EXISTS cryptocurrency_monthly_aggregates (
     id SERIAL PRIMARY KEY,
     coin_id VARCHAR(50) NOT NULL,
@@ -6,6 +5,22 @@ CREATE TABLE IF NOT EXISTS cryptocurrency_monthly_aggregates (
     month INTEGER NOT NULL,
     min_price NUMERIC(20, 8) NOT NULL,
     max_price NUMERIC(20, 8) NOT NULL,
+    avg_price NUMERIC(20, 8),
+    open_price NUMERIC(20, 8),
+    close_price NUMERIC(20, 8),
+    day_count INTEGER,
+    sum_price NUMERIC(30, 8),
+    open_date DATE,
+    close_date DATE,
     UNIQUE(coin_id, year, month)
 );
-        
\ No newline at end of file
+
+-- Tables created before the avg/open/close/count statistics; rebuild-aggregates fills them in
+ALTER TABLE cryptocurrency_monthly_aggregates
+    ADD COLUMN IF NOT EXISTS avg_price NUMERIC(20, 8),
+    ADD COLUMN IF NOT EXISTS open_price NUMERIC(20, 8),
+    ADD COLUMN IF NOT EXISTS close_price NUMERIC(20, 8),
+    ADD COLUMN IF NOT EXISTS day_count INTEGER,
+    ADD COLUMN IF NOT EXISTS sum_price NUMERIC(30, 8),
+    ADD COLUMN IF NOT EXISTS open_date DATE,
+    ADD COLUMN IF NOT EXISTS close_date DATE;
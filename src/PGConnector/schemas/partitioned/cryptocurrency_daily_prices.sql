@@ -0,0 +1,10 @@
+-- Range-partitioned by month; the partitions are created at ingest time by PGConnector.ensure_partitions
+CREATE TABLE IF NOT EXISTS cryptocurrency_daily_prices (
+    id SERIAL,
+    coin_id VARCHAR(50) NOT NULL,
+    price_usd NUMERIC(20, 8) NOT NULL,
+    date DATE NOT NULL,
+    full_response JSONB NOT NULL,
+    PRIMARY KEY (id, date),
+    UNIQUE(coin_id, date)
+) PARTITION BY RANGE (date);
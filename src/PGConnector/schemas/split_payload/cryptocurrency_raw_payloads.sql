@@ -0,0 +1,21 @@
+-- Split layout: the daily prices table keeps typed columns only and the payloads are archived
+-- zlib-compressed in cryptocurrency_raw_payloads, read on demand
+ALTER TABLE cryptocurrency_daily_prices
+    ALTER COLUMN full_response DROP NOT NULL,
+    ADD COLUMN IF NOT EXISTS market_cap_usd NUMERIC,
+    ADD COLUMN IF NOT EXISTS volume_usd NUMERIC;
+
+-- Written by the connectors from now on, instead of generated from full_response by create_analytics()
+ALTER TABLE cryptocurrency_daily_prices
+    ALTER COLUMN market_cap_usd DROP EXPRESSION IF EXISTS,
+    ALTER COLUMN volume_usd DROP EXPRESSION IF EXISTS;
+
+CREATE TABLE IF NOT EXISTS cryptocurrency_raw_payloads (
+    coin_id VARCHAR(50) NOT NULL,
+    date DATE NOT NULL,
+    payload BYTEA NOT NULL,
+    PRIMARY KEY (coin_id, date)
+);
+
+-- The writers already compress the payloads: keep them out of line without compressing them again
+ALTER TABLE cryptocurrency_raw_payloads ALTER COLUMN payload SET STORAGE EXTERNAL;
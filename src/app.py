@@ -1,18 +1,38 @@
 # External imports
 import argparse
+import asyncio
 import logging
+import os
 import sys
+import threading
+import time
+import uuid
 from datetime import datetime, timedelta
 import json
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
 import json
 import tqdm
 
 # Internal imports
 from CoinGekoRetriever.coin_geko_retriever import CoinGekoRetriever
+from CoinGekoRetriever.async_coin_geko_retriever import AsyncCoinGekoRetriever
+from CoinGekoRetriever.response_cache import ResponseCache
+from CoinGekoRetriever.response_recorder import ResponseRecorder, ResponseReplayer
+from CoinGekoRetriever.shared_rate_limiter import SharedRateLimiter
+from ColumnarStore.columnar_store import ColumnarStore
+from FeatureEngineering.feature_store import FeatureStore
+from IngestionPipeline.sinks import FileSink, PostgresSink, ColumnarSink, SinkPipeline
+from IngestionPipeline.ledger import TaskLedger
+from IngestionPipeline.metrics import PipelineMetrics
+from IngestionPipeline.sharding import shard_coin_dates
 from PGConnector.pgconnector import PGConnector
+from PGConnector.async_pgconnector import AsyncPGConnector
+from PGConnector.monthly_aggregator import MonthlyAggregator
+
+
+DEFAULT_RATE_LIMIT_FILE = ".coin_geko_rate_limit.json"
 
 
 def setup_logging(log_file: str = "coin_geko_retriever.log"):
@@ -49,44 +69,251 @@ def get_date_range(start_date: datetime, end_date: datetime) -> List[datetime]:
 def process_single_day(client: CoinGekoRetriever,
                        coin_id: str,
                        date: datetime,
-                       pg_connector: Optional[PGConnector] = None) -> Optional[str]:
+                       pg_connector: Optional[PGConnector] = None,
+                       file_dir: Optional[str] = 'coin_data',
+                       feature_store: Optional[FeatureStore] = None,
+                       metrics: Optional[PipelineMetrics] = None) -> Optional[dict]:
     """
     Process data for a single coin and date
 
+    The parsed response goes straight from the client to the sinks, without a round trip through
+    its file.
+
     :param client: CoinGecko retriever client
     :param coin_id: Cryptocurrency identifier
     :param date: Date to retrieve data for
     :param pg_connector: Optional PostgreSQL connector for storing data
-    :return: Filename of downloaded data or None
+    :param file_dir: Directory of the JSON file kept per coin-day (None to skip it)
+    :param feature_store: Optional feature store updated once the price is stored in PostgreSQL
+    :param metrics: Optional metrics registry recording the building of the row and the sink writes
+    :return: Stored row, or None if it could not be fetched or a sink did not store it
     """
     logger = logging.getLogger(__name__)
+    sinks = build_sinks(pg_connector, file_dir=file_dir, batched=False, feature_store=feature_store, metrics=metrics)
     try:
-        filename = client.download_coin_data_from(coin_id, date.strftime('%Y-%m-%d'))
-
-        if pg_connector:
-            with open(filename, 'r') as f:
-                coin_data = json.load(f)
-
-            price_usd = coin_data.get('market_data', {}).get('current_price', {}).get('usd', 0)
-
-            pg_connector.insert_daily_price(
-                coin_id=coin_id,
-                price_usd=price_usd,
-                date=date.strftime('%Y-%m-%d'),
-                full_response=coin_data
-            )
-
-            pg_connector.update_monthly_aggregates(
-                coin_id=coin_id,
-                date=date.strftime('%Y-%m-%d'),
-                price_usd=price_usd
-            )
+        coin_data, raw_response = client.fetch_coin_data(coin_id, date.strftime('%Y-%m-%d'))
+        start = time.perf_counter()
+        row = build_daily_row(coin_id, date.strftime('%Y-%m-%d'), coin_data, raw_response)
+        if metrics is not None:
+            metrics.observe('build_rows', time.perf_counter() - start)
+        counts = sinks.write([row])
+        failed_sinks = [name for name, count in counts.items() if count < 1]
+        if failed_sinks:
+            logger.error(f"Failed to store {coin_id} for {date.date()} in {', '.join(failed_sinks)}")
+            return None
 
         logger.info(f"Successfully processed {coin_id} for {date.date()}")
-        return filename
+        return row
     except Exception as e:
         logger.error(f"Failed to process {coin_id} for {date.date()}: {str(e)}")
         return None
+    finally:
+        sinks.close()
+
+
+def build_sinks(pg_connector: Optional[PGConnector] = None,
+                columnar_store: Optional[ColumnarStore] = None,
+                file_dir: Optional[str] = None,
+                batched: bool = True,
+                feature_store: Optional[FeatureStore] = None,
+                metrics: Optional[PipelineMetrics] = None) -> SinkPipeline:
+    """
+    Build the pipeline of storage sinks requested
+
+    :param pg_connector: Optional PostgreSQL connector
+    :param columnar_store: Optional Parquet store
+    :param file_dir: Optional directory of the JSON file kept per coin-day
+    :param batched: Write to PostgreSQL in one transaction per batch instead of row by row
+    :param feature_store: Optional feature store updated after each PostgreSQL write
+    :param metrics: Optional metrics registry recording the sink and file writes
+    :return: SinkPipeline, possibly without sinks
+    """
+    sinks = []
+    if pg_connector:
+        sinks.append(PostgresSink(pg_connector, batched=batched, feature_store=feature_store))
+    if columnar_store:
+        sinks.append(ColumnarSink(columnar_store))
+    if file_dir:
+        sinks.append(FileSink(file_dir, metrics))
+    return SinkPipeline(sinks, metrics)
+
+
+def plan_range_tasks(coin_ids: List[str],
+                     start_date: datetime,
+                     end_date: datetime,
+                     chunk_days: int = CoinGekoRetriever.MAX_RANGE_DAYS) -> List[Tuple[str, datetime, datetime]]:
+    """
+    Split a date range into per-coin chunks for the market_chart/range endpoint
+
+    :param coin_ids: List of cryptocurrency identifiers
+    :param start_date: Start date for data retrieval
+    :param end_date: End date for data retrieval
+    :param chunk_days: Maximum number of days per request
+    :return: List of (coin_id, chunk_start, chunk_end) tasks
+    """
+    chunk_days = min(chunk_days, CoinGekoRetriever.MAX_RANGE_DAYS)
+    tasks = []
+    for coin_id in coin_ids:
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+            tasks.append((coin_id, chunk_start, chunk_end))
+            chunk_start = chunk_end + timedelta(days=1)
+    return tasks
+
+
+def plan_gap_range_tasks(coin_dates: Dict[str, List[datetime]],
+                         chunk_days: int = CoinGekoRetriever.MAX_RANGE_DAYS) -> List[Tuple[str, datetime, datetime]]:
+    """
+    Split the runs of consecutive dates of each coin into chunks for the market_chart/range endpoint
+
+    :param coin_dates: Dates to fetch per cryptocurrency identifier
+    :param chunk_days: Maximum number of days per request
+    :return: List of (coin_id, chunk_start, chunk_end) tasks
+    """
+    tasks = []
+    for coin_id, dates in coin_dates.items():
+        dates = sorted(dates)
+        run_start = None
+        for i, date in enumerate(dates):
+            if run_start is None:
+                run_start = date
+            if i + 1 == len(dates) or dates[i + 1] - date != timedelta(days=1):
+                tasks.extend(plan_range_tasks([coin_id], run_start, date, chunk_days))
+                run_start = None
+    return tasks
+
+
+def parse_coin_dates(missing: Dict[str, List[str]]) -> Dict[str, List[datetime]]:
+    """Convert YYYY-MM-DD dates per coin to datetimes"""
+    return {coin_id: [datetime.fromisoformat(day) for day in days] for coin_id, days in missing.items()}
+
+
+def plan_missing_dates(coin_ids: List[str],
+                       start_date: datetime,
+                       end_date: datetime,
+                       pg_connector: Optional[PGConnector] = None,
+                       columnar_store: Optional[ColumnarStore] = None,
+                       file_dir: Optional[str] = None) -> Optional[Dict[str, List[datetime]]]:
+    """
+    Find the coin-days of a date range that are not stored yet
+
+    PostgreSQL is asked when a connector is given, else the Parquet store is scanned, else the
+    JSON files under file_dir.
+
+    :param coin_ids: List of cryptocurrency identifiers
+    :param start_date: Start date of the range
+    :param end_date: End date of the range
+    :param pg_connector: Optional PostgreSQL connector
+    :param columnar_store: Optional Parquet store
+    :param file_dir: Optional directory of the JSON file kept per coin-day
+    :return: Missing dates per coin, or None if they could not be determined
+    """
+    logger = logging.getLogger(__name__)
+    dates = get_date_range(start_date, end_date)
+
+    if pg_connector:
+        missing = pg_connector.find_missing_dates(
+            coin_ids, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+        )
+        if missing is None:
+            logger.warning("Could not find the missing coin-days, every coin-day will be fetched")
+            return None
+        coin_dates = parse_coin_dates(missing)
+    else:
+        if columnar_store:
+            stored = columnar_store.read(coin_ids, start_date, end_date, columns=['coin_id', 'date'])
+            existing = {
+                f"{coin_id}_{day.strftime('%Y-%m-%d')}" for coin_id, day in zip(stored['coin_id'], stored['date'])
+            }
+        elif file_dir and os.path.isdir(file_dir):
+            existing = {name[:-len('.json')] for name in os.listdir(file_dir) if name.endswith('.json')}
+        else:
+            existing = set()
+        coin_dates = {
+            coin_id: [date for date in dates if f"{coin_id}_{date.strftime('%Y-%m-%d')}" not in existing]
+            for coin_id in coin_ids
+        }
+
+    missing_count = sum(len(days) for days in coin_dates.values())
+    logger.info(f"{missing_count} of {len(dates) * len(coin_ids)} coin-days are missing")
+    return coin_dates
+
+
+def build_daily_row(coin_id: str,
+                    date: str,
+                    coin_data: dict,
+                    raw_response: Optional[bytes] = None,
+                    prices_only: bool = False) -> dict:
+    """
+    Build the row handed to the storage sinks for a coin-day
+
+    :param coin_id: Cryptocurrency identifier
+    :param date: Date in YYYY-MM-DD format
+    :param coin_data: Parsed /history payload
+    :param raw_response: Response body as received, stored instead of serializing coin_data again
+    :param prices_only: coin_data only holds the price, market cap and volume of a range request;
+                        the sinks then keep any full payload already stored for the coin-day
+    :return: Dict with coin_id, price_usd, market_cap_usd, volume_usd, date, full_response,
+             raw_response and prices_only keys
+    """
+    market_data = coin_data.get('market_data', {})
+    return {
+        'coin_id': coin_id,
+        'price_usd': market_data.get('current_price', {}).get('usd', 0),
+        'market_cap_usd': market_data.get('market_cap', {}).get('usd'),
+        'volume_usd': market_data.get('total_volume', {}).get('usd'),
+        'date': date,
+        'full_response': coin_data,
+        'raw_response': raw_response,
+        'prices_only': prices_only
+    }
+
+
+def download_daily_rows(client: CoinGekoRetriever,
+                        coin_id: str,
+                        date: datetime,
+                        metrics: Optional[PipelineMetrics] = None) -> List[dict]:
+    """
+    Download the /history payload of a coin-day
+
+    :param client: CoinGecko retriever client
+    :param coin_id: Cryptocurrency identifier
+    :param date: Date to retrieve data for
+    :param metrics: Optional metrics registry recording the building of the row
+    :return: List with the row of the coin-day
+    """
+    coin_data, raw_response = client.fetch_coin_data(coin_id, date.strftime('%Y-%m-%d'))
+    start = time.perf_counter()
+    rows = [build_daily_row(coin_id, date.strftime('%Y-%m-%d'), coin_data, raw_response)]
+    if metrics is not None:
+        metrics.observe('build_rows', time.perf_counter() - start)
+    return rows
+
+
+def download_range_rows(client: CoinGekoRetriever,
+                        coin_id: str,
+                        start_date: datetime,
+                        end_date: datetime,
+                        metrics: Optional[PipelineMetrics] = None) -> List[dict]:
+    """
+    Download prices, market caps and volumes of a coin over a date range with a single request
+
+    :param client: CoinGecko retriever client
+    :param coin_id: Cryptocurrency identifier
+    :param start_date: First date of the range
+    :param end_date: Last date of the range
+    :param metrics: Optional metrics registry recording the building of the rows
+    :return: List with one row per day with data
+    """
+    payloads = client.fetch_coin_range(
+        coin_id, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+    )
+    start = time.perf_counter()
+    rows = [build_daily_row(coin_id, date, coin_data, prices_only=True) for date, coin_data in payloads.items()]
+    if metrics is not None:
+        metrics.observe('build_rows', time.perf_counter() - start, items=len(rows))
+    return rows
 
 
 def bulk_process(client: CoinGekoRetriever,
@@ -94,47 +321,533 @@ def bulk_process(client: CoinGekoRetriever,
                  start_date: datetime,
                  end_date: datetime,
                  max_workers: int = 5,
-                 pg_connector: Optional[PGConnector] = None) -> None:
+                 pg_connector: Optional[PGConnector] = None,
+                 prices_only: bool = False,
+                 range_chunk_days: int = CoinGekoRetriever.MAX_RANGE_DAYS,
+                 batch_size: int = 500,
+                 pg_writers: int = 1,
+                 columnar_store: Optional[ColumnarStore] = None,
+                 file_dir: Optional[str] = 'coin_data',
+                 coin_dates: Optional[Dict[str, List[datetime]]] = None,
+                 ledger: Optional[TaskLedger] = None,
+                 job_id: Optional[int] = None,
+                 refresh_analytics: bool = False,
+                 feature_store: Optional[FeatureStore] = None,
+                 metrics: Optional[PipelineMetrics] = None,
+                 analytics_interval: float = 300.0) -> None:
     """
     Process multiple dates and coins in parallel
 
+    Workers only download; rows are handed in memory, in batches of batch_size, to the storage
+    sinks by pg_writers writer threads. PostgreSQL writes each batch in a single transaction.
+    With a ledger, each coin-day is marked done once every sink stored it, or failed with its error.
+
     :param client: CoinGecko retriever client
     :param coin_ids: List of cryptocurrency identifiers
     :param start_date: Start date for data retrieval
     :param end_date: End date for data retrieval
     :param max_workers: Number of parallel workers
     :param pg_connector: Optional PostgreSQL connector for storing data
+    :param prices_only: Fetch prices, market caps and volumes per coin and range instead of
+                        the full /history payload per coin-day
+    :param range_chunk_days: Maximum number of days per range request when prices_only is set
+    :param batch_size: Number of rows written to PostgreSQL per transaction
+    :param pg_writers: Number of batches written concurrently (the connector must be pooled if above 1)
+    :param columnar_store: Optional Parquet store the rows are appended to
+    :param file_dir: Directory of the JSON file kept per coin-day (None to skip it)
+    :param coin_dates: Dates to fetch per coin, e.g. from plan_missing_dates (default: the whole range for every coin)
+    :param ledger: Optional task ledger recording the state of every coin-day
+    :param job_id: Job of the ledger the coin-days belong to
+    :param refresh_analytics: Refresh the PostgreSQL analytics views during the run and at the end
+    :param feature_store: Optional feature store updated after each batch stored in PostgreSQL
+    :param metrics: Optional metrics registry recording the building of the rows, the sink writes
+                    and the depth of the download, batch and write queues
+    :param analytics_interval: Minimum number of seconds between two refreshes of the analytics views
+                               during the run, each of which recomputes the views over the whole history
     """
     logger = logging.getLogger(__name__)
     dates = get_date_range(start_date, end_date)
-    total_tasks = len(dates) * len(coin_ids)
+    if coin_dates is None:
+        coin_dates = {coin_id: dates for coin_id in coin_ids}
+    refresh_analytics = refresh_analytics and pg_connector is not None
+    total_tasks = sum(len(coin_dates.get(coin_id, [])) for coin_id in coin_ids)
+    sinks = build_sinks(pg_connector, columnar_store, file_dir, feature_store=feature_store if pg_connector else None,
+                        metrics=metrics)
 
     logger.info(f"Starting bulk processing for {len(coin_ids)} coins over {len(dates)} days")
 
-    tasks = [
-        (coin_id, date)
-        for date in dates
-        for coin_id in coin_ids
-    ]
+    # Each task is (download function, its arguments, (coin_id, date) pairs covered, label)
+    if prices_only:
+        range_tasks = plan_gap_range_tasks(
+            {coin_id: coin_dates.get(coin_id, []) for coin_id in coin_ids}, range_chunk_days
+        )
+        logger.info(f"Fetching {total_tasks} coin-days with {len(range_tasks)} range requests")
+        tasks = [
+            (download_range_rows, (client, coin_id, chunk_start, chunk_end, metrics),
+             [(coin_id, date.strftime('%Y-%m-%d')) for date in get_date_range(chunk_start, chunk_end)],
+             f"{coin_id} from {chunk_start.date()} to {chunk_end.date()}")
+            for coin_id, chunk_start, chunk_end in range_tasks
+        ]
+    else:
+        wanted = {coin_id: set(coin_dates.get(coin_id, [])) for coin_id in coin_ids}
+        tasks = [
+            (download_daily_rows, (client, coin_id, date, metrics), [(coin_id, date.strftime('%Y-%m-%d'))],
+             f"{coin_id} for {date.date()}")
+            for date in dates
+            for coin_id in coin_ids
+            if date in wanted[coin_id]
+        ]
+
+    batch = []
+    stored_rows = {sink.name: 0 for sink in sinks.sinks}
+    pending_writes = []
+    refresh_lock = threading.Lock()
+    last_refresh = time.monotonic()
+
+    def refresh_due() -> bool:
+        nonlocal last_refresh
+        with refresh_lock:
+            if time.monotonic() - last_refresh < analytics_interval:
+                return False
+            last_refresh = time.monotonic()
+            return True
+
+    def write_batch(rows: List[dict]) -> Dict[str, int]:
+        counts = sinks.write(rows)
+        if ledger:
+            stored = [(row['coin_id'], row['date']) for row in rows]
+            failed_sinks = [name for name, count in counts.items() if count < len(rows)]
+            if failed_sinks:
+                ledger.mark_failed(job_id, stored, f"Not stored in {', '.join(failed_sinks)}")
+            else:
+                ledger.mark_done(job_id, stored)
+        if refresh_analytics and counts.get(PostgresSink.name) and refresh_due():
+            # Skipped while another writer refreshes; the final refresh catches up
+            pg_connector.refresh_analytics(wait=False)
+        return counts
+
+    def collect(write):
+        for name, count in write.result().items():
+            stored_rows[name] += count
 
     # Process tasks with progress bar
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            ThreadPoolExecutor(max_workers=pg_writers) as writer:
         futures = {
-            executor.submit(process_single_day, client, coin_id, date, pg_connector): (coin_id, date)
-            for coin_id, date in tasks
+            executor.submit(download, *download_args): (covered, label)
+            for download, download_args, covered, label in tasks
         }
 
         with tqdm.tqdm(total=total_tasks, desc="Processing data") as pbar:
-            for future in as_completed(futures):
-                coin_id, date = futures[future]
+            for completed, future in enumerate(as_completed(futures), 1):
+                covered, label = futures[future]
                 try:
-                    result = future.result()
-                    if result:
-                        logger.debug(f"Processed {coin_id} for {date.date()}")
+                    rows = future.result()
+                    if sinks.sinks:
+                        batch.extend(rows)
+                    if ledger:
+                        # Coin-days with rows are marked done once stored, the others now
+                        with_rows = {(row['coin_id'], row['date']) for row in rows} if sinks.sinks else set()
+                        ledger.mark_done(job_id, [task for task in covered if task not in with_rows])
+                    logger.info(f"Successfully processed {label}")
                 except Exception as e:
-                    logger.error(f"Error processing {coin_id} for {date.date()}: {str(e)}")
+                    logger.error(f"Failed to process {label}: {str(e)}")
+                    if ledger:
+                        ledger.mark_failed(job_id, covered, e)
                 finally:
-                    pbar.update(1)
+                    pbar.update(len(covered))
+
+                if len(batch) >= batch_size:
+                    pending_writes.append(writer.submit(write_batch, batch))
+                    batch = []
+                    # Keep at most two batches per writer in memory
+                    while len(pending_writes) > 2 * pg_writers:
+                        collect(pending_writes.pop(0))
+
+                if metrics is not None:
+                    metrics.set_queue_depth('downloads', len(tasks) - completed)
+                    metrics.set_queue_depth('batch_rows', len(batch))
+                    metrics.set_queue_depth('write_batches', sum(not write.done() for write in pending_writes))
+
+        if batch:
+            pending_writes.append(writer.submit(write_batch, batch))
+        for write in pending_writes:
+            collect(write)
+    sinks.close()
+    if refresh_analytics:
+        pg_connector.refresh_analytics()
+
+    for name, count in stored_rows.items():
+        logger.info(f"Stored {count} rows in {name}")
+    if ledger:
+        job_stats = ledger.get_stats(job_id)
+        logger.info(f"Job {job_id}: {job_stats['done']} coin-days done, {job_stats['failed']} failed, "
+                    f"{job_stats['pending']} pending")
+
+    pool_stats = client.get_pool_stats()
+    logger.info(f"HTTP pool: {pool_stats['requests']} requests, "
+                f"{pool_stats['connections_opened']} connections opened, "
+                f"{pool_stats['connections_reused']} reused")
+    limiter_stats = client.rate_limiter.get_stats()
+    logger.info(f"Rate limiter: {limiter_stats['throttled']} throttled responses, "
+                f"final budget {limiter_stats['requests_per_minute']} requests/minute")
+    log_cache_stats(client)
+
+
+def log_cache_stats(client) -> None:
+    """
+    Log the response cache statistics of a client, if it uses a cache
+
+    :param client: Sync or async CoinGecko retriever client
+    """
+    if client.cache is None:
+        return
+    cache_stats = client.cache.get_stats()
+    logger = logging.getLogger(__name__)
+    logger.info(f"Response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                f"{cache_stats['evictions']} evictions, {cache_stats['entries']} entries")
+
+
+async def async_bulk_process(client: AsyncCoinGekoRetriever,
+                             coin_ids: List[str],
+                             start_date: datetime,
+                             end_date: datetime,
+                             max_in_flight: int = 100,
+                             pg_connector: Optional[AsyncPGConnector] = None,
+                             store_workers: int = 4,
+                             file_dir: Optional[str] = 'coin_data',
+                             coin_dates: Optional[Dict[str, List[datetime]]] = None,
+                             ledger: Optional[TaskLedger] = None,
+                             job_id: Optional[int] = None,
+                             batch_size: int = 500) -> None:
+    """
+    Process multiple dates and coins with asyncio instead of threads
+
+    Fetch tasks are created lazily and bounded by a semaphore, and downloaded payloads go through
+    a bounded queue to the storage consumers, so memory stays flat whatever the number of tasks.
+
+    :param client: Async CoinGecko retriever client (already opened)
+    :param coin_ids: List of cryptocurrency identifiers
+    :param start_date: Start date for data retrieval
+    :param end_date: End date for data retrieval
+    :param max_in_flight: Maximum number of requests in flight
+    :param pg_connector: Optional async PostgreSQL connector for storing data (already connected)
+    :param store_workers: Number of consumers writing to PostgreSQL
+    :param file_dir: Directory of the JSON file kept per coin-day (None to skip it)
+    :param coin_dates: Dates to fetch per coin (default: the whole range for every coin)
+    :param ledger: Optional task ledger recording the state of every coin-day
+    :param job_id: Job of the ledger the coin-days belong to
+    :param batch_size: Coin-days stored in PostgreSQL between two updates of the monthly aggregates
+    """
+    logger = logging.getLogger(__name__)
+    dates = get_date_range(start_date, end_date)
+    if coin_dates is None:
+        coin_dates = {coin_id: dates for coin_id in coin_ids}
+    wanted = {coin_id: set(coin_dates.get(coin_id, [])) for coin_id in coin_ids}
+    total_tasks = sum(len(days) for days in wanted.values())
+
+    logger.info(f"Starting async bulk processing for {len(coin_ids)} coins over {len(dates)} days")
+
+    semaphore = asyncio.BoundedSemaphore(max_in_flight)
+    results = asyncio.Queue(maxsize=max_in_flight)
+    in_flight = set()
+    file_sink = FileSink(file_dir) if file_dir else None
+    aggregator = MonthlyAggregator() if pg_connector else None
+
+    async def fetch(coin_id: str, date: datetime):
+        try:
+            coin_data, raw_response = await client.fetch_coin_data(coin_id, date.strftime('%Y-%m-%d'))
+            await results.put(build_daily_row(coin_id, date.strftime('%Y-%m-%d'), coin_data, raw_response))
+        except Exception as e:
+            logger.error(f"Failed to process {coin_id} for {date.date()}: {str(e)}")
+            if ledger:
+                await asyncio.to_thread(ledger.mark_failed, job_id, [(coin_id, date.strftime('%Y-%m-%d'))], e)
+            pbar.update(1)
+        finally:
+            semaphore.release()
+
+    async def store():
+        while True:
+            item = await results.get()
+            if item is None:
+                break
+            try:
+                writes = []
+                if pg_connector:
+                    writes.append(pg_connector.insert_daily_price(
+                        coin_id=item['coin_id'],
+                        price_usd=item['price_usd'],
+                        date=item['date'],
+                        full_response=item['full_response'],
+                        raw_response=item['raw_response'],
+                        aggregator=aggregator
+                    ))
+                if file_sink:
+                    writes.append(asyncio.to_thread(file_sink.write, [item]))
+                await asyncio.gather(*writes)
+                if ledger:
+                    await asyncio.to_thread(ledger.mark_done, job_id, [(item['coin_id'], item['date'])])
+                logger.info(f"Successfully processed {item['coin_id']} for {item['date']}")
+            except Exception as e:
+                logger.error(f"Failed to process {item['coin_id']} for {item['date']}: {str(e)}")
+                if ledger:
+                    await asyncio.to_thread(ledger.mark_failed, job_id, [(item['coin_id'], item['date'])], e)
+            finally:
+                pbar.update(1)
+            if aggregator is not None and len(aggregator) >= batch_size:
+                await flush_aggregates()
+
+    async def flush_aggregates():
+        try:
+            await pg_connector.flush_monthly_aggregates(aggregator)
+        except Exception as e:
+            logger.error(f"Failed to update monthly aggregates, run rebuild-aggregates to repair them: {str(e)}")
+
+    with tqdm.tqdm(total=total_tasks, desc="Processing data") as pbar:
+        consumers = [asyncio.create_task(store()) for _ in range(store_workers)]
+
+        for date in dates:
+            for coin_id in coin_ids:
+                if date not in wanted[coin_id]:
+                    continue
+                await semaphore.acquire()
+                task = asyncio.create_task(fetch(coin_id, date))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        for _ in consumers:
+            await results.put(None)
+        await asyncio.gather(*consumers)
+        if aggregator is not None:
+            await flush_aggregates()
+
+    if ledger:
+        job_stats = await asyncio.to_thread(ledger.get_stats, job_id)
+        logger.info(f"Job {job_id}: {job_stats['done']} coin-days done, {job_stats['failed']} failed, "
+                    f"{job_stats['pending']} pending")
+    limiter_stats = client.rate_limiter.get_stats()
+    logger.info(f"Rate limiter: {limiter_stats['throttled']} throttled responses, "
+                f"final budget {limiter_stats['requests_per_minute']} requests/minute")
+    log_cache_stats(client)
+
+
+def create_response_cache(args) -> Optional[ResponseCache]:
+    """
+    Create the response cache requested on the command line
+
+    :param args: Parsed command line arguments
+    :return: ResponseCache, or None if --cache-dir was not given
+    """
+    if not getattr(args, 'cache_dir', None):
+        return None
+    return ResponseCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024, recent_ttl=args.cache_ttl)
+
+
+def create_recorder(args) -> Optional[ResponseRecorder]:
+    """
+    Create the recorder of the API responses requested on the command line
+
+    :param args: Parsed command line arguments
+    :return: ResponseRecorder, or None if --record was not given
+    """
+    if not getattr(args, 'record', None):
+        return None
+    return ResponseRecorder(args.record)
+
+
+def create_replayer(args) -> Optional[ResponseReplayer]:
+    """
+    Load the recorded API responses to replay requested on the command line
+
+    :param args: Parsed command line arguments
+    :return: ResponseReplayer, or None if --replay was not given
+    """
+    if not getattr(args, 'replay', None):
+        return None
+    return ResponseReplayer(args.replay, speed=args.replay_speed)
+
+
+def bulk_job_params(args) -> dict:
+    """
+    Return the bulk command line arguments recorded with a ledger job
+
+    :param args: Parsed command line arguments of the bulk command
+    :return: JSON-serializable dict
+    """
+    params = {key: value for key, value in vars(args).items() if key not in ('start_date', 'end_date')}
+    params['start_date'] = args.start_date.strftime('%Y-%m-%d')
+    params['end_date'] = args.end_date.strftime('%Y-%m-%d')
+    return params
+
+
+def restore_bulk_args(params: dict) -> argparse.Namespace:
+    """
+    Rebuild the bulk command line arguments of a ledger job
+
+    :param params: Parameters recorded by bulk_job_params
+    :return: Arguments of the bulk command
+    """
+    args = argparse.Namespace(**params)
+    args.start_date = datetime.fromisoformat(params['start_date'])
+    args.end_date = datetime.fromisoformat(params['end_date'])
+    return args
+
+
+def start_job(ledger: TaskLedger, args, coin_dates: Optional[Dict[str, List[datetime]]]) -> int:
+    """
+    Record a bulk run in the ledger
+
+    :param ledger: Task ledger
+    :param args: Parsed command line arguments of the bulk command
+    :param coin_dates: Dates to fetch per coin (default: the whole range for every coin)
+    :return: Job identifier
+    """
+    if coin_dates is None:
+        dates = get_date_range(args.start_date, args.end_date)
+        coin_dates = {coin_id: dates for coin_id in args.coin_ids}
+    return ledger.create_job(bulk_job_params(args), {
+        coin_id: [date.strftime('%Y-%m-%d') for date in dates] for coin_id, dates in coin_dates.items()
+    }, run_id=getattr(args, 'run_id', None))
+
+
+def shard_bulk_dates(args, coin_dates: Optional[Dict[str, List[datetime]]]) -> Optional[Dict[str, List[datetime]]]:
+    """
+    Keep the coin-days of the shard of this process when the bulk command is sharded
+
+    :param args: Parsed command line arguments of the bulk command
+    :param coin_dates: Dates to fetch per coin (default: the whole range for every coin)
+    :return: Dates to fetch per coin by this shard
+    """
+    if getattr(args, 'shards', 1) <= 1:
+        return coin_dates
+    if coin_dates is None:
+        dates = get_date_range(args.start_date, args.end_date)
+        coin_dates = {coin_id: dates for coin_id in args.coin_ids}
+    coin_dates = shard_coin_dates(coin_dates, args.shards, args.shard_index)
+    logger = logging.getLogger(__name__)
+    logger.info(f"Shard {args.shard_index + 1}/{args.shards}: "
+                f"{sum(len(dates) for dates in coin_dates.values())} coin-days")
+    return coin_dates
+
+
+def create_rate_limiter(args) -> Optional[SharedRateLimiter]:
+    """
+    Create the rate limiter shared with the other processes, if the command line asks for one
+
+    :param args: Parsed command line arguments
+    :return: SharedRateLimiter, or None to let the client use a private limiter
+    """
+    # A replay never reaches the API, there is no budget to share
+    if not getattr(args, 'rate_limit_file', None) or getattr(args, 'replay', None):
+        return None
+    return SharedRateLimiter(args.rate_limit_file, requests_per_minute=args.rpm)
+
+
+def create_metrics(args) -> Optional[PipelineMetrics]:
+    """
+    Create the metrics registry requested on the command line
+
+    :param args: Parsed command line arguments
+    :return: PipelineMetrics, or None if neither --metrics, --metrics-file nor --metrics-port was given
+    """
+    if not (getattr(args, 'metrics', False) or getattr(args, 'metrics_file', None)
+            or getattr(args, 'metrics_port', None)):
+        return None
+    return PipelineMetrics()
+
+
+def metrics_file_path(args) -> Optional[str]:
+    """
+    Return the file the metrics of this process are written to
+
+    Each shard of a sharded bulk command gets its own file, e.g. ingestion.shard0.prom.
+
+    :param args: Parsed command line arguments
+    :return: Path, or None if --metrics-file was not given
+    """
+    path = getattr(args, 'metrics_file', None)
+    if path and getattr(args, 'shards', 1) > 1:
+        root, extension = os.path.splitext(path)
+        path = f"{root}.shard{args.shard_index}{extension}"
+    return path
+
+
+def report_metrics(args, metrics: PipelineMetrics) -> None:
+    """
+    Log the summary table of the pipeline stages and write the metrics file, if requested
+
+    :param args: Parsed command line arguments
+    :param metrics: Metrics registry of the run
+    """
+    logger = logging.getLogger(__name__)
+    logger.info(f"Pipeline stages:\n{metrics.summary_table()}")
+    path = metrics_file_path(args)
+    if path:
+        try:
+            metrics.write_prometheus(path)
+            logger.info(f"Metrics written to {path}")
+        except OSError as e:
+            logger.error(f"Failed to write metrics to {path}: {str(e)}")
+
+
+async def run_async_bulk(args,
+                         ledger: Optional[TaskLedger] = None,
+                         job_id: Optional[int] = None,
+                         coin_dates: Optional[Dict[str, List[datetime]]] = None) -> None:
+    """
+    Open the async clients from the command line arguments and run the async bulk engine
+
+    :param args: Parsed command line arguments of the bulk command
+    :param ledger: Optional task ledger; a new job is recorded unless job_id is given
+    :param job_id: Job being resumed
+    :param coin_dates: Dates to fetch per coin when resuming a job
+    """
+    pg_connector = None
+    file_dir = None if args.no_files else 'coin_data'
+    async with AsyncCoinGekoRetriever(
+        max_connections=args.workers,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        requests_per_minute=args.rpm,
+        max_retries=args.max_retries,
+        cache=create_response_cache(args),
+        rate_limiter=create_rate_limiter(args)
+    ) as client:
+        try:
+            if args.pg:
+                pg_connector = AsyncPGConnector('crypto_database', pool_size=args.store_workers)
+                await pg_connector.connect()
+
+            if job_id is None:
+                if args.only_missing and pg_connector:
+                    coin_dates = parse_coin_dates(await pg_connector.find_missing_dates(
+                        args.coin_ids, args.start_date.strftime('%Y-%m-%d'), args.end_date.strftime('%Y-%m-%d')
+                    ))
+                elif args.only_missing:
+                    coin_dates = plan_missing_dates(args.coin_ids, args.start_date, args.end_date, file_dir=file_dir)
+                coin_dates = shard_bulk_dates(args, coin_dates)
+                if ledger:
+                    job_id = start_job(ledger, args, coin_dates)
+
+            await async_bulk_process(
+                client,
+                args.coin_ids,
+                args.start_date,
+                args.end_date,
+                args.workers,
+                pg_connector,
+                args.store_workers,
+                file_dir,
+                coin_dates,
+                ledger,
+                job_id,
+                args.batch_size
+            )
+        finally:
+            if pg_connector:
+                await pg_connector.close_connection()
 
 
 def main():
@@ -146,64 +859,597 @@ def main():
     single_parser.add_argument("coin_id", help="Coin identifier (e.g., bitcoin)")
     single_parser.add_argument("date", type=validate_date, help="Date in ISO8601 format (YYYY-MM-DD)")
     single_parser.add_argument("--pg", action="store_true", help="Store data in PostgreSQL")
+    single_parser.add_argument("--pg-partitioned", action="store_true",
+                               help="Create the daily prices table partitioned by month if it does not exist yet")
+    single_parser.add_argument("--pg-split-payload", action="store_true",
+                               help="Keep typed columns in the daily prices table and the compressed "
+                                    "payloads in an archive table")
+    single_parser.add_argument("--features", action="store_true",
+                               help="Update the PostgreSQL feature store (lags and 7-day windows) of the stored day")
+    single_parser.add_argument("--no-files", action="store_true",
+                               help="Do not keep a JSON file per coin-day under coin_data/")
+    single_parser.add_argument("--connect-timeout", type=float, default=5.0, help="HTTP connect timeout in seconds")
+    single_parser.add_argument("--read-timeout", type=float, default=30.0, help="HTTP read timeout in seconds")
+    single_parser.add_argument("--rpm", type=int, default=30, help="API request budget per minute")
+    single_parser.add_argument("--max-retries", type=int, default=5, help="Retries for rate-limited requests")
+    single_parser.add_argument("--cache-dir", help="Directory of the on-disk response cache (disabled if not set)")
+    single_parser.add_argument("--cache-max-mb", type=int, default=1024, help="Maximum size of the response cache in MB")
+    single_parser.add_argument("--cache-ttl", type=int, default=3600,
+                             help="Seconds before cached responses about today expire")
+    single_parser.add_argument("--metrics", action="store_true",
+                               help="Time every pipeline stage and log a summary table at the end")
+    single_parser.add_argument("--metrics-file",
+                               help="Write the stage metrics in Prometheus text format to this file at the end "
+                                    "(implies --metrics)")
+    single_parser.add_argument("--metrics-port", type=int,
+                               help="Serve the stage metrics in Prometheus text format on this port while running "
+                                    "(implies --metrics)")
+    single_parser.add_argument("--record",
+                               help="Record every API response, with its timing, to this archive (.jsonl.gz)")
+    single_parser.add_argument("--replay",
+                               help="Serve the API responses from an archive written by --record, without the network")
+    single_parser.add_argument("--replay-speed", type=float, default=0.0,
+                               help="1 to replay at the recorded latencies, 10 ten times faster, 0 (default) "
+                                    "without any delay")
 
     # Bulk processing
     bulk_parser = subparsers.add_parser("bulk", help="Process date range")
     bulk_parser.add_argument("coin_ids", nargs="+", help="Coin identifiers (e.g., bitcoin ethereum)")
     bulk_parser.add_argument("start_date", type=validate_date, help="Start date (YYYY-MM-DD)")
     bulk_parser.add_argument("end_date", type=validate_date, help="End date (YYYY-MM-DD)")
-    bulk_parser.add_argument("--workers", type=int, default=5, help="Number of parallel workers")
+    bulk_parser.add_argument("--workers", type=int, default=5,
+                             help="Number of parallel workers (requests in flight with --engine async)")
+    bulk_parser.add_argument("--engine", choices=["thread", "async"], default="thread",
+                             help="Ingestion engine: thread pool or asyncio")
+    bulk_parser.add_argument("--store-workers", type=int, default=4,
+                             help="PostgreSQL writers used by the async engine")
+    bulk_parser.add_argument("--prices-only", action="store_true",
+                             help="Fetch prices, market caps and volumes per date range instead of "
+                                  "the full payload per coin-day (thread engine only)")
+    bulk_parser.add_argument("--batch-size", type=int, default=500,
+                             help="Rows written to PostgreSQL per transaction (per monthly aggregates "
+                                  "update with --engine async)")
+    bulk_parser.add_argument("--pg-writers", type=int, default=1,
+                             help="Batches written to PostgreSQL concurrently, each on its own pooled connection")
+    bulk_parser.add_argument("--range-chunk-days", type=int, default=CoinGekoRetriever.MAX_RANGE_DAYS,
+                             help="Maximum number of days per range request with --prices-only")
     bulk_parser.add_argument("--pg", action="store_true", help="Store data in PostgreSQL")
+    bulk_parser.add_argument("--pg-partitioned", action="store_true",
+                             help="Create the daily prices table partitioned by month if it does not exist yet")
+    bulk_parser.add_argument("--pg-split-payload", action="store_true",
+                             help="Keep typed columns in the daily prices table and the compressed "
+                                  "payloads in an archive table")
+    bulk_parser.add_argument("--only-missing", action="store_true",
+                             help="Only fetch the coin-days not stored yet (in PostgreSQL with --pg, "
+                                  "else in the Parquet store or the JSON files)")
+    bulk_parser.add_argument("--no-files", action="store_true",
+                             help="Do not keep a JSON file per coin-day under coin_data/")
+    bulk_parser.add_argument("--parquet-dir",
+                             help="Also append rows to Parquet files partitioned by coin and month "
+                                  "in this directory (thread engine only)")
+    bulk_parser.add_argument("--connect-timeout", type=float, default=5.0, help="HTTP connect timeout in seconds")
+    bulk_parser.add_argument("--read-timeout", type=float, default=30.0, help="HTTP read timeout in seconds")
+    bulk_parser.add_argument("--rpm", type=int, default=30, help="API request budget per minute")
+    bulk_parser.add_argument("--max-retries", type=int, default=5, help="Retries for rate-limited requests")
+    bulk_parser.add_argument("--cache-dir", help="Directory of the on-disk response cache (disabled if not set)")
+    bulk_parser.add_argument("--cache-max-mb", type=int, default=1024, help="Maximum size of the response cache in MB")
+    bulk_parser.add_argument("--cache-ttl", type=int, default=3600,
+                             help="Seconds before cached responses about today expire")
+    bulk_parser.add_argument("--ledger", default="coin_geko_tasks.sqlite",
+                             help="SQLite file recording the state of every coin-day of the run")
+    bulk_parser.add_argument("--analytics", action="store_true",
+                             help="Keep the PostgreSQL analytics views (monthly averages, drop streaks) refreshed "
+                                  "during the run and at the end (thread engine only)")
+    bulk_parser.add_argument("--analytics-interval", type=float, default=300.0,
+                             help="Minimum seconds between two refreshes of the analytics views during the run")
+    bulk_parser.add_argument("--features", action="store_true",
+                             help="Update the PostgreSQL feature store (lags and 7-day windows) after each batch "
+                                  "(thread engine only)")
+    bulk_parser.add_argument("--metrics", action="store_true",
+                             help="Time every pipeline stage and log a summary table at the end (thread engine only)")
+    bulk_parser.add_argument("--metrics-file",
+                             help="Write the stage metrics in Prometheus text format to this file at the end, one "
+                                  "file per shard when sharded (implies --metrics)")
+    bulk_parser.add_argument("--metrics-port", type=int,
+                             help="Serve the stage metrics in Prometheus text format on this port while running "
+                                  "(implies --metrics)")
+    bulk_parser.add_argument("--record",
+                             help="Record every API response, with its timing, to this archive (.jsonl.gz, thread "
+                                  "engine only)")
+    bulk_parser.add_argument("--replay",
+                             help="Serve the API responses from an archive written by --record, without the network "
+                                  "(thread engine only)")
+    bulk_parser.add_argument("--replay-speed", type=float, default=0.0,
+                             help="1 to replay at the recorded latencies, 10 ten times faster, 0 (default) "
+                                  "without any delay")
+    bulk_parser.add_argument("--shards", type=int, default=1,
+                             help="Split the coin-days into this many shards, run by separate processes or hosts")
+    bulk_parser.add_argument("--shard-index", type=int, default=0, help="Shard run by this process (0-based)")
+    bulk_parser.add_argument("--processes", type=int, default=1,
+                             help="Run the command as this many local shard processes, then merge the "
+                                  "monthly aggregates")
+    bulk_parser.add_argument("--rate-limit-file",
+                             help="State file sharing the --rpm budget with every process using the same file "
+                                  f"(default with --processes: {DEFAULT_RATE_LIMIT_FILE})")
+
+    # Crash recovery
+    resume_parser = subparsers.add_parser("resume", help="Finish the pending coin-days of a bulk run")
+    resume_parser.add_argument("--ledger", default="coin_geko_tasks.sqlite", help="SQLite task ledger")
+    resume_parser.add_argument("--job-id", type=int,
+                               help="Job to resume (default: the latest one, with every shard of its run)")
+
+    retry_parser = subparsers.add_parser("retry-failed", help="Retry the failed coin-days of a bulk run")
+    retry_parser.add_argument("--ledger", default="coin_geko_tasks.sqlite", help="SQLite task ledger")
+    retry_parser.add_argument("--job-id", type=int,
+                              help="Job to retry (default: the latest one, with every shard of its run)")
+    retry_parser.add_argument("--max-attempts", type=int,
+                              help="Skip coin-days already attempted this many times")
+
+    # Aggregates
+    rebuild_parser = subparsers.add_parser("rebuild-aggregates",
+                                           help="Recompute the monthly aggregates from the daily prices")
+    rebuild_parser.add_argument("--coin-ids", nargs="+", help="Coins to recompute (default: every coin)")
+    rebuild_parser.add_argument("--start-date", type=validate_date, help="First date (default: no lower bound)")
+    rebuild_parser.add_argument("--end-date", type=validate_date, help="Last date (default: no upper bound)")
+
+    # Features
+    features_parser = subparsers.add_parser("rebuild-features",
+                                            help="Compute the feature store from the whole stored history")
+    features_parser.add_argument("--coin-ids", nargs="+", help="Coins to rebuild (default: every coin)")
+
+    # Partitions
+    archive_parser = subparsers.add_parser("archive-partitions",
+                                           help="Detach or compress the monthly partitions of old daily prices")
+    archive_parser.add_argument("before_date", type=validate_date,
+                                help="Archive the months ending on or before this date (YYYY-MM-DD)")
+    archive_parser.add_argument("--action", choices=["detach", "compress"], default="detach",
+                                help="Detach the partitions from the table, or rewrite them compressed")
+    archive_parser.add_argument("--compression", choices=["pglz", "lz4"], default="lz4",
+                                help="TOAST compression method used by --action compress")
 
     args = parser.parse_args()
+    if args.command == "bulk" and args.engine == "async" and args.prices_only:
+        parser.error("--prices-only is only supported by the thread engine")
+    if args.command == "bulk" and args.engine == "async" and args.parquet_dir:
+        parser.error("--parquet-dir is only supported by the thread engine")
+    if args.command == "bulk" and args.engine == "async" and args.analytics:
+        parser.error("--analytics is only supported by the thread engine")
+    if args.command == "bulk" and args.engine == "async" and args.pg_split_payload:
+        parser.error("--pg-split-payload is only supported by the thread engine")
+    if args.command == "bulk" and args.engine == "async" and args.features:
+        parser.error("--features is only supported by the thread engine")
+    if args.command == "bulk" and args.engine == "async" and (args.metrics or args.metrics_file or args.metrics_port):
+        parser.error("--metrics, --metrics-file and --metrics-port are only supported by the thread engine")
+    if args.command == "bulk" and args.processes > 1 and args.metrics_port:
+        parser.error("--metrics-port cannot be combined with --processes")
+    if args.command == "bulk" and args.engine == "async" and (args.record or args.replay):
+        parser.error("--record and --replay are only supported by the thread engine")
+    if args.command in ("single", "bulk") and args.record and args.replay:
+        parser.error("--record cannot be combined with --replay")
+    if args.command == "bulk" and args.processes > 1 and args.record:
+        parser.error("--record cannot be combined with --processes")
+    if args.command in ("single", "bulk") and args.record and args.cache_dir:
+        # Cached responses never reach the recorder, they would be missing from the replay
+        parser.error("--record cannot be combined with --cache-dir")
+    if args.command == "bulk" and args.analytics and not args.pg:
+        parser.error("--analytics requires --pg")
+    if args.command in ("single", "bulk") and args.features and not args.pg:
+        parser.error("--features requires --pg")
+    if args.command == "bulk" and args.processes > 1 and args.shards > 1:
+        parser.error("--processes cannot be combined with --shards")
+    if args.command == "bulk" and not 0 <= args.shard_index < args.shards:
+        parser.error("--shard-index must be between 0 and --shards - 1")
+    if args.command is None:
+        parser.print_help()
+        sys.exit(1)
 
     logger = setup_logging()
 
+    if args.command == "rebuild-aggregates":
+        rebuild_aggregates(args)
+        return
+    if args.command == "rebuild-features":
+        rebuild_features(args)
+        return
+    if args.command == "archive-partitions":
+        archive_partitions(args)
+        return
+
+    # resume and retry-failed run the bulk command of a ledger job on its unfinished coin-days
+    ledger = None
+    job_id = None
+    coin_dates = None
+    if args.command in ("resume", "retry-failed"):
+        ledger = TaskLedger(args.ledger)
+        # Without --job-id, every shard job of the latest run
+        job_ids = [args.job_id] if args.job_id else ledger.run_job_ids(ledger.latest_job_id())
+        if not job_ids or ledger.get_job_params(job_ids[0]) is None:
+            parser.error(f"No job found in {args.ledger}")
+        if args.command == "retry-failed":
+            for run_job_id in job_ids:
+                ledger.reset_failed(run_job_id, args.max_attempts)
+        if len(job_ids) > 1:
+            ledger.close()
+            resume_processes(args.ledger, job_ids)
+            return
+        job_id = job_ids[0]
+        args, coin_dates = load_job(ledger, job_id)
+    elif args.command == "bulk" and args.processes > 1:
+        run_processes(args)
+        return
+    elif args.command == "bulk":
+        ledger = TaskLedger(args.ledger)
+
+    run_command(args, ledger, job_id, coin_dates)
+
+
+def create_client(args, metrics: Optional[PipelineMetrics] = None) -> CoinGekoRetriever:
+    """
+    Create the CoinGecko client configured on the command line
+
+    :param args: Parsed command line arguments of the single or bulk command
+    :param metrics: Optional metrics registry the client reports to
+    :return: CoinGekoRetriever
+    """
+    return CoinGekoRetriever(
+        pool_size=getattr(args, 'workers', 1),
+        connect_timeout=getattr(args, 'connect_timeout', 5.0),
+        read_timeout=getattr(args, 'read_timeout', 30.0),
+        requests_per_minute=getattr(args, 'rpm', 30),
+        max_retries=getattr(args, 'max_retries', 5),
+        cache=create_response_cache(args),
+        rate_limiter=create_rate_limiter(args),
+        metrics=metrics,
+        recorder=create_recorder(args),
+        replayer=create_replayer(args)
+    )
+
+
+def create_pg_schema(pg_connector: PGConnector, args) -> None:
+    """
+    Create the PostgreSQL tables, and views, requested on the command line
+
+    :param pg_connector: Connected PostgreSQL connector
+    :param args: Parsed command line arguments of the single or bulk command
+    """
+    pg_connector.create_tables(partitioned=getattr(args, 'pg_partitioned', False),
+                               split_payload=getattr(args, 'pg_split_payload', False))
+    if getattr(args, 'analytics', False):
+        pg_connector.create_analytics()
+
+
+def run_command(args,
+                ledger: Optional[TaskLedger] = None,
+                job_id: Optional[int] = None,
+                coin_dates: Optional[Dict[str, List[datetime]]] = None) -> None:
+    """
+    Run the single or bulk command
+
+    :param args: Parsed command line arguments
+    :param ledger: Task ledger of a bulk command, closed when the command ends
+    :param job_id: Job being resumed
+    :param coin_dates: Dates to fetch per coin when resuming a job
+    """
+    logger = logging.getLogger(__name__)
+    metrics = create_metrics(args)
+    metrics_server = None
     try:
-        client = CoinGekoRetriever()
+        if metrics and getattr(args, 'metrics_port', None):
+            metrics_server = metrics.serve(args.metrics_port)
+            logger.info(f"Serving metrics on port {args.metrics_port}")
+        client = create_client(args, metrics)
         pg_connector = None
+        feature_store = None
+        # The shards of a multi-process run were prepared once by their parent process
+        prepared = getattr(args, 'prepared', False)
 
-        if not client.check_geko_api_status():
+        if not prepared and not client.check_geko_api_status():
             logger.error("CoinGecko API is not available")
             sys.exit(1)
 
         # Initialize PostgreSQL connection if requested
         if getattr(args, 'pg', False):
             try:
-                pg_connector = PGConnector('crypto_database')
-                pg_connector.create_database()
-                pg_connector.connect()
-                pg_connector.create_tables()
+                pg_connector = PGConnector('crypto_database', metrics=metrics)
+                if not prepared:
+                    pg_connector.create_database()
+                async_engine = args.command == "bulk" and args.engine == "async"
+                # Bulk runs write from several threads, each one needs its own connection
+                pool_size = args.pg_writers if args.command == "bulk" and not async_engine else None
+                pg_connector.connect(pool_size=pool_size)
+                if not prepared:
+                    create_pg_schema(pg_connector, args)
+                if async_engine:
+                    # The async engine writes through its own asyncpg pool
+                    pg_connector.close_connection()
+                    pg_connector = None
+                if getattr(args, 'features', False):
+                    feature_store = FeatureStore(pg_connector)
             except Exception as e:
                 logger.error(f"Failed to set up PostgreSQL connection: {e}")
                 sys.exit(1)
 
         try:
             if args.command == "single":
-                process_single_day(client, args.coin_id, args.date, pg_connector)
+                process_single_day(client, args.coin_id, args.date, pg_connector,
+                                   None if args.no_files else 'coin_data', feature_store, metrics)
             elif args.command == "bulk":
                 if args.start_date > args.end_date:
                     logger.error("Start date must be before or equal to end date")
                     sys.exit(1)
-                bulk_process(
-                    client,
-                    args.coin_ids,
-                    args.start_date,
-                    args.end_date,
-                    getattr(args, 'workers', 5),
-                    pg_connector
-                )
-            else:
-                parser.print_help()
-                sys.exit(1)
+                if args.engine == "async":
+                    asyncio.run(run_async_bulk(args, ledger, job_id, coin_dates))
+                else:
+                    columnar_store = ColumnarStore(args.parquet_dir) if args.parquet_dir else None
+                    file_dir = None if args.no_files else 'coin_data'
+                    if job_id is None:
+                        if args.only_missing:
+                            coin_dates = plan_missing_dates(
+                                args.coin_ids, args.start_date, args.end_date, pg_connector, columnar_store, file_dir
+                            )
+                        coin_dates = shard_bulk_dates(args, coin_dates)
+                        job_id = start_job(ledger, args, coin_dates)
+                    bulk_process(
+                        client,
+                        args.coin_ids,
+                        args.start_date,
+                        args.end_date,
+                        getattr(args, 'workers', 5),
+                        pg_connector,
+                        args.prices_only,
+                        args.range_chunk_days,
+                        args.batch_size,
+                        args.pg_writers,
+                        columnar_store,
+                        file_dir,
+                        coin_dates,
+                        ledger,
+                        job_id,
+                        getattr(args, 'analytics', False),
+                        feature_store,
+                        metrics,
+                        getattr(args, 'analytics_interval', 300.0)
+                    )
         finally:
+            client.close()
             if pg_connector:
                 pg_connector.close_connection()
+            if ledger:
+                ledger.close()
+            if metrics_server:
+                metrics_server.shutdown()
+            if metrics:
+                report_metrics(args, metrics)
+
+    except Exception as e:
+        logger.error(f"Application error: {str(e)}")
+        sys.exit(1)
+
+
+def run_shard(params: dict, shard_index: int) -> None:
+    """
+    Run one shard of a bulk command in a worker process
+
+    :param params: Bulk command line arguments, as recorded by bulk_job_params
+    :param shard_index: Shard run by this process
+    """
+    setup_logging()
+    args = restore_bulk_args(params)
+    args.shard_index = shard_index
+    run_command(args, TaskLedger(args.ledger))
+
+
+def load_job(ledger: TaskLedger, job_id: int):
+    """
+    Rebuild the bulk command of a ledger job and find its unfinished coin-days
+
+    :param ledger: Task ledger
+    :param job_id: Job identifier
+    :return: Tuple (bulk command line arguments, dates left per coin)
+    """
+    args = restore_bulk_args(ledger.get_job_params(job_id))
+    # A shard resumed on its own checks the API and the tables itself
+    args.prepared = False
+    coin_dates = parse_coin_dates(ledger.pending_tasks(job_id))
+    logger = logging.getLogger(__name__)
+    logger.info(f"Resuming job {job_id}: {sum(len(dates) for dates in coin_dates.values())} coin-days left")
+    return args, coin_dates
+
 
+def resume_shard(ledger_path: str, job_id: int) -> None:
+    """
+    Resume the job of one shard of a multi-process run in a worker process
+
+    :param ledger_path: SQLite task ledger
+    :param job_id: Job of the shard
+    """
+    setup_logging()
+    ledger = TaskLedger(ledger_path)
+    args, coin_dates = load_job(ledger, job_id)
+    args.prepared = True
+    run_command(args, ledger, job_id, coin_dates)
+
+
+def prepare_processes(args) -> None:
+    """
+    Check the API and create the PostgreSQL database and tables once, before the processes of a
+    multi-process run start, instead of every process racing to create them
+
+    :param args: Bulk command line arguments
+    """
+    logger = logging.getLogger(__name__)
+    client = create_client(args)
+    try:
+        if not client.check_geko_api_status():
+            logger.error("CoinGecko API is not available")
+            sys.exit(1)
+    finally:
+        client.close()
+
+    if args.pg:
+        pg_connector = PGConnector('crypto_database')
+        try:
+            pg_connector.create_database()
+            pg_connector.connect()
+            create_pg_schema(pg_connector, args)
+        except Exception as e:
+            logger.error(f"Failed to set up PostgreSQL: {e}")
+            sys.exit(1)
+        finally:
+            pg_connector.close_connection()
+
+
+def run_pool(args, submit_shards) -> None:
+    """
+    Run the shards of a multi-process run, then merge the monthly aggregates
+
+    :param args: Bulk command line arguments of the run
+    :param submit_shards: Function submitting the shards to a process pool, returning a dict
+                          mapping each future to its label
+    """
+    logger = logging.getLogger(__name__)
+    # Start from a full budget rather than what a previous run left in the file
+    if args.rate_limit_file and os.path.exists(args.rate_limit_file):
+        os.remove(args.rate_limit_file)
+
+    failed_shards = []
+    with ProcessPoolExecutor(max_workers=args.shards) as pool:
+        futures = submit_shards(pool)
+        for future in as_completed(futures):
+            label = futures[future]
+            try:
+                future.result()
+                logger.info(f"{label} finished")
+            except (Exception, SystemExit) as e:
+                failed_shards.append(label)
+                logger.error(f"{label} failed: {e!r}")
+
+    if args.pg:
+        merge_monthly_aggregates(args.coin_ids, args.start_date, args.end_date)
+    if failed_shards:
+        sys.exit(1)
+
+
+def run_processes(args) -> None:
+    """
+    Split a bulk command into one shard per local process, then merge the monthly aggregates
+
+    The processes share one request budget through a SharedRateLimiter state file, and the ledger
+    jobs of their shards one run identifier.
+
+    :param args: Parsed command line arguments of the bulk command
+    """
+    params = bulk_job_params(args)
+    params.update(processes=1, shards=args.processes, prepared=True, run_id=uuid.uuid4().hex,
+                  rate_limit_file=args.rate_limit_file or DEFAULT_RATE_LIMIT_FILE)
+    prepare_processes(args)
+    run_pool(restore_bulk_args(params), lambda pool: {
+        pool.submit(run_shard, params, shard_index): f"Shard {shard_index + 1}/{args.processes}"
+        for shard_index in range(args.processes)
+    })
+
+
+def resume_processes(ledger_path: str, job_ids: List[int]) -> None:
+    """
+    Resume the shard jobs of a multi-process run, one process each, then merge the monthly aggregates
+
+    :param ledger_path: SQLite task ledger
+    :param job_ids: Jobs of the shards of the run
+    """
+    logger = logging.getLogger(__name__)
+    ledger = TaskLedger(ledger_path)
+    args = restore_bulk_args(ledger.get_job_params(job_ids[0]))
+    ledger.close()
+    args.shards = len(job_ids)
+    logger.info(f"Resuming jobs {', '.join(map(str, job_ids))} of a {len(job_ids)}-process run")
+    prepare_processes(args)
+    run_pool(args, lambda pool: {
+        pool.submit(resume_shard, ledger_path, job_id): f"Job {job_id}" for job_id in job_ids
+    })
+
+
+def merge_monthly_aggregates(coin_ids: Optional[List[str]] = None,
+                             start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None) -> Optional[int]:
+    """
+    Recompute the monthly aggregates from the daily prices, the final step of a sharded run
+
+    :param coin_ids: Coins to recompute (default: every coin)
+    :param start_date: First date of the range (default: no lower bound)
+    :param end_date: Last date of the range (default: no upper bound)
+    :return: Number of monthly rows written, or None if the recompute failed
+    """
+    pg_connector = PGConnector('crypto_database')
+    try:
+        pg_connector.connect()
+        return pg_connector.recompute_monthly_aggregates(
+            coin_ids,
+            start_date.strftime('%Y-%m-%d') if start_date else None,
+            end_date.strftime('%Y-%m-%d') if end_date else None
+        )
+    finally:
+        pg_connector.close_connection()
+
+
+def rebuild_aggregates(args) -> None:
+    """
+    Run the rebuild-aggregates command
+
+    :param args: Parsed command line arguments of the rebuild-aggregates command
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        count = merge_monthly_aggregates(args.coin_ids, args.start_date, args.end_date)
     except Exception as e:
         logger.error(f"Application error: {str(e)}")
         sys.exit(1)
+    if count is None:
+        sys.exit(1)
+
+
+def rebuild_features(args) -> None:
+    """
+    Run the rebuild-features command
+
+    :param args: Parsed command line arguments of the rebuild-features command
+    """
+    logger = logging.getLogger(__name__)
+    pg_connector = PGConnector('crypto_database')
+    try:
+        pg_connector.connect()
+        pg_connector.create_tables()
+        count = FeatureStore(pg_connector).rebuild(args.coin_ids)
+    except Exception as e:
+        logger.error(f"Application error: {str(e)}")
+        sys.exit(1)
+    finally:
+        pg_connector.close_connection()
+    if count is None:
+        sys.exit(1)
+
+
+def archive_partitions(args) -> None:
+    """
+    Run the archive-partitions command
+
+    :param args: Parsed command line arguments of the archive-partitions command
+    """
+    logger = logging.getLogger(__name__)
+    pg_connector = PGConnector('crypto_database')
+    try:
+        pg_connector.connect()
+        archived = pg_connector.archive_partitions(
+            args.before_date.strftime('%Y-%m-%d'), args.action, args.compression
+        )
+    except Exception as e:
+        logger.error(f"Application error: {str(e)}")
+        sys.exit(1)
+    finally:
+        pg_connector.close_connection()
+    if archived is None:
+        sys.exit(1)
+    logger.info(f"Archived {len(archived)} partitions ({args.action})")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
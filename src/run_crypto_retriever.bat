@@ -13,8 +13,10 @@ set MM=%datetime:~4,2%
 set DD=%datetime:~6,2%
 set TODAY=%YYYY%-%MM%-%DD%
 
-:: Run the script for today's date
-python app.py bulk bitcoin ethereum cardano %TODAY% %TODAY% --pg
+:: Gap-fill the last week: only the coin-days missing from the database are requested,
+:: so a daily run costs one request per coin unless a previous run failed
+for /f %%I in ('powershell -NoProfile -Command "(Get-Date).AddDays(-7).ToString('yyyy-MM-dd')"') do set START=%%I
+python app.py bulk bitcoin ethereum cardano %START% %TODAY% --pg --only-missing
 
 :: Optional: Add pause to see any error messages
 pause
\ No newline at end of file
@@ -0,0 +1,98 @@
+#External imports:
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch
+from aiohttp import web
+
+#Internal imports:
+from src.CoinGekoRetriever.async_coin_geko_retriever import AsyncCoinGekoRetriever
+from src.CoinGekoRetriever.shared_rate_limiter import SharedRateLimiter
+
+
+@pytest.fixture
+def mock_env_vars(monkeypatch):
+    """Fixture to set up environment variables"""
+    monkeypatch.setenv('GEKO_API_KEY', 'test_api_key_123')
+
+
+async def run_against_server(handler, coroutine, rate_limiter=None):
+    """Start a local API stand-in, point a client to it and run the coroutine with the client"""
+    app = web.Application()
+    app.router.add_get('/api/v3/{tail:.*}', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    try:
+        with patch.object(AsyncCoinGekoRetriever, 'BASE_URL', f"http://127.0.0.1:{port}/api/v3"):
+            async with AsyncCoinGekoRetriever(requests_per_minute=6000, rate_limiter=rate_limiter) as client:
+                return await coroutine(client)
+    finally:
+        await runner.cleanup()
+
+
+class TestAsyncCoinGekoRetriever:
+    """Test suite for AsyncCoinGekoRetriever"""
+
+    def test_make_request_adds_api_key(self, mock_env_vars):
+        """Test that requests carry the API key and return the parsed body"""
+        seen = []
+
+        async def handler(request):
+            seen.append(dict(request.query))
+            return web.json_response({"data": "test"})
+
+        result = asyncio.run(run_against_server(
+            handler, lambda client: client._make_request('test-endpoint', {'param1': 'value1'})
+        ))
+
+        assert result == {"data": "test"}
+        assert seen == [{'param1': 'value1', 'x_cg_demo_api_key': 'test_api_key_123'}]
+
+    def test_make_request_retries_rate_limited(self, mock_env_vars):
+        """Test that a 429 is retried instead of failing the task"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request.path)
+            if len(calls) == 1:
+                return web.json_response({}, status=429, headers={'Retry-After': '0'})
+            return web.json_response({"geko_says": "(V3) To the Moon!"})
+
+        with patch('src.CoinGekoRetriever.rate_limiter.RateLimiter.backoff', return_value=0):
+            assert asyncio.run(run_against_server(handler, lambda client: client.check_geko_api_status())) is True
+        assert calls == ['/api/v3/ping', '/api/v3/ping']
+
+    def test_shared_rate_limiter_runs_off_the_event_loop(self, mock_env_vars, tmp_path):
+        """Test that a limiter shared through a file is locked and updated outside the event loop"""
+        limiter = SharedRateLimiter(str(tmp_path / "rate_limit.json"), requests_per_minute=6000)
+        reserve, on_success = limiter.reserve, limiter.on_success
+        threads = []
+
+        def reserve_in_thread():
+            threads.append(threading.get_ident())
+            return reserve()
+
+        def on_success_in_thread():
+            threads.append(threading.get_ident())
+            return on_success()
+
+        limiter.reserve, limiter.on_success = reserve_in_thread, on_success_in_thread
+
+        async def handler(request):
+            return web.json_response({"geko_says": "(V3) To the Moon!"})
+
+        assert asyncio.run(run_against_server(handler, lambda client: client.check_geko_api_status(),
+                                              rate_limiter=limiter)) is True
+        assert len(threads) == 2 and threading.get_ident() not in threads
+        assert (tmp_path / "rate_limit.json").exists()
+
+    def test_check_geko_api_status_failure(self, mock_env_vars):
+        """Test failed API status check"""
+        async def handler(request):
+            return web.json_response({}, status=404)
+
+        assert asyncio.run(run_against_server(handler, lambda client: client.check_geko_api_status())) is False
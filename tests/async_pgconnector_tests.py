@@ -0,0 +1,105 @@
+#External imports:
+import asyncio
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+#Internal imports:
+from src.PGConnector.async_pgconnector import AsyncPGConnector
+from src.PGConnector.pgconnector import PGConnector
+from src.PGConnector.monthly_aggregator import MonthlyAggregator
+
+
+def mock_pool(connection):
+    """Pool handing out the connection, with transactions that do nothing"""
+    @asynccontextmanager
+    async def acquire():
+        yield connection
+
+    @asynccontextmanager
+    async def transaction():
+        yield
+
+    connection.transaction = transaction
+    pool = MagicMock()
+    pool.acquire = acquire
+    return pool
+
+
+class TestAsyncPGConnector:
+    """Test suite for AsyncPGConnector"""
+
+    def setup_method(self):
+        self.connector = AsyncPGConnector("test_database")
+        # A plain daily prices table with the payloads stored inline
+        self.connector.partitions = set()
+        self.connector.split_payload = False
+
+    def test_flush_waits_for_inserts_in_flight(self):
+        """Test that a flush started during an insert runs once the day has reached the aggregator"""
+        committing = asyncio.Event()
+        commit = asyncio.Event()
+        flushed = []
+
+        async def fetchval(query, *values):
+            committing.set()
+            await commit.wait()
+            return True
+
+        async def fetch(query, *columns):
+            assert PGConnector.MONTHLY_MERGE in query and "unnest($1::varchar[], $2::int[]" in query
+            flushed.append(columns[0])
+            return [{'coin_id': coin_id, 'year': 2024, 'month': 1} for coin_id in columns[0]]
+
+        connection = MagicMock()
+        connection.fetchval = fetchval
+        connection.fetch = fetch
+        connection.execute = AsyncMock()
+        self.connector.pool = mock_pool(connection)
+        aggregator = MonthlyAggregator()
+
+        async def run():
+            insert = asyncio.create_task(self.connector.insert_daily_price(
+                'bitcoin', 42000.5, '2024-01-15', {}, aggregator=aggregator))
+            await committing.wait()
+            flush = asyncio.create_task(self.connector.flush_monthly_aggregates(aggregator))
+            await asyncio.sleep(0.05)
+            assert not flush.done() and flushed == []
+
+            # Inserts arriving during the flush wait for it
+            later = asyncio.create_task(self.connector.insert_daily_price(
+                'ethereum', 2500, '2024-01-15', {}, aggregator=aggregator))
+            commit.set()
+            await insert
+            count = await flush
+            await later
+            return count
+
+        count = asyncio.run(run())
+
+        assert count == 1
+        assert flushed == [['bitcoin']]
+        assert aggregator.flush()[0]['coin_id'] == 'ethereum'
+        assert self.connector.pending_inserts == 0 and not self.connector.flushing
+
+    def test_failed_insert_does_not_block_flush(self):
+        """Test that an insert raising still lets the next flush run"""
+        connection = MagicMock()
+        connection.fetchval = AsyncMock(side_effect=Exception("connection lost"))
+        connection.fetch = AsyncMock(return_value=[])
+        connection.execute = AsyncMock()
+        self.connector.pool = mock_pool(connection)
+        aggregator = MonthlyAggregator()
+
+        async def run():
+            try:
+                await self.connector.insert_daily_price('bitcoin', 42000.5, '2024-01-15', {}, aggregator=aggregator)
+            except Exception:
+                pass
+            aggregator.add('bitcoin', '2024-01-16', Decimal('42100'))
+            return await asyncio.wait_for(self.connector.flush_monthly_aggregates(aggregator), timeout=1)
+
+        asyncio.run(run())
+
+        assert len(aggregator) == 0
+        assert self.connector.pending_inserts == 0
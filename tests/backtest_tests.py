@@ -0,0 +1,99 @@
+#External imports:
+import numpy as np
+import pandas as pd
+import pytest
+
+#Internal imports:
+from src.FeatureEngineering.time_series_features import create_time_series_features
+from src.Forecasting.backtest import RecursiveLeastSquares, walk_forward_backtest
+from src.Forecasting.regression import FEATURE_COLUMNS
+from benchmarks.task4_reference import synthetic_coin_data
+
+
+def refit(X, y):
+    """Ordinary least squares with intercept, fitted from scratch"""
+    weights = np.linalg.lstsq(np.c_[X, np.ones(len(X))], y, rcond=None)[0]
+    return weights[:-1], weights[-1]
+
+
+def synthetic_features(coins, days, seed=0):
+    """Frame with the regression's feature columns filled with well-conditioned random values"""
+    rng = np.random.default_rng(seed)
+    rows = coins * days
+    frame = pd.DataFrame(rng.normal(size=(rows, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    frame['target_price'] = frame.to_numpy() @ rng.normal(size=len(FEATURE_COLUMNS)) + rng.normal(size=rows)
+    frame['coin'] = np.repeat([f'coin-{index}' for index in range(coins)], days)
+    frame['date'] = np.tile(pd.date_range('2023-01-01', periods=days), coins)
+    return frame
+
+
+class TestBacktest:
+    """Test suite for the walk-forward backtest"""
+
+    def test_recursive_least_squares_matches_refit(self):
+        """Test that rank-one additions and removals give the coefficients of a refit"""
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(2, 50, 3)) * [1.0, 100.0, 0.01]
+        y = rng.normal(size=(2, 50))
+        models = RecursiveLeastSquares(2, 3, ridge=1e-12)
+        for row in range(50):
+            models.add(X[:, row], y[:, row])
+        models.refresh()
+        for row in range(20):
+            models.remove(X[:, row], y[:, row])
+
+        for model in range(2):
+            coef, intercept = refit(X[model, 20:], y[model, 20:])
+            np.testing.assert_allclose(models.coefficients[model], coef, rtol=1e-8)
+            assert models.intercepts[model] == pytest.approx(intercept, rel=1e-8)
+
+    def test_constant_feature_gets_no_weight(self):
+        """Test that a feature that has not varied does not move the predictions, as in LinearRegression"""
+        rng = np.random.default_rng(1)
+        X = np.c_[rng.normal(size=30), np.zeros(30)]
+        y = 2 * X[:, 0] + 1
+        models = RecursiveLeastSquares(1, 2)
+        for row in range(30):
+            models.add(X[None, row], y[None, row])
+        models.refresh()
+
+        assert models.predict(np.array([[0.5, 10.0]]))[0] == pytest.approx(2.0, rel=1e-6)
+
+    @pytest.mark.parametrize('window', [None, 40])
+    def test_walk_forward_matches_daily_refit(self, window):
+        """Test that every prediction is the one of a model refitted on the rows before it"""
+        features = synthetic_features(coins=3, days=120).iloc[::-1]
+        # Coins with histories of different lengths
+        features = features[(features['coin'] != 'coin-1') | (features['date'] < '2023-03-15')]
+
+        result, metrics = walk_forward_backtest(features, window=window, min_train=30, ridge=1e-12)
+
+        for coin, rows in result.groupby('coin', sort=False):
+            assert rows['date'].is_monotonic_increasing
+            assert rows['predicted_price'].iloc[:30].isna().all()
+            X, y = rows[FEATURE_COLUMNS].to_numpy(), rows['target_price'].to_numpy()
+            for day in range(30, len(rows)):
+                first = 0 if window is None else max(0, day - window)
+                coef, intercept = refit(X[first:day], y[first:day])
+                assert rows['predicted_price'].iloc[day] == pytest.approx(X[day] @ coef + intercept, rel=1e-7)
+            assert metrics[coin]['n_predictions'] == len(rows) - 30
+        assert list(metrics) == ['coin-2', 'coin-1', 'coin-0']
+
+    def test_no_look_ahead(self):
+        """Test that later prices do not change earlier predictions"""
+        features = create_time_series_features(synthetic_coin_data(coins=2, days=150, seed=1), scale=False)
+        later = features['date'] >= '2023-04-01'
+        changed = features.copy()
+        changed.loc[later, 'target_price'] *= 3
+
+        result, _ = walk_forward_backtest(features)
+        changed_result, _ = walk_forward_backtest(changed)
+
+        before = result['date'] < '2023-04-01'
+        pd.testing.assert_series_equal(result.loc[before, 'predicted_price'], changed_result.loc[before, 'predicted_price'])
+        assert not np.allclose(result.loc[~before, 'predicted_price'], changed_result.loc[~before, 'predicted_price'])
+
+    def test_window_shorter_than_training(self):
+        """Test that a sliding window must hold the rows of the first model"""
+        with pytest.raises(ValueError):
+            walk_forward_backtest(synthetic_features(coins=1, days=50), window=20, min_train=30)
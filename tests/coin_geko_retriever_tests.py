@@ -2,7 +2,7 @@
 import pytest
 import os
 import json
-from unittest.mock import patch, mock_open
+from unittest.mock import Mock, patch, mock_open
 from datetime import datetime
 import requests
 from requests.exceptions import RequestException
@@ -10,6 +10,8 @@ from freezegun import freeze_time
 
 #Internal imports:
 from src.CoinGekoRetriever.coin_geko_retriever import CoinGekoRetriever
+from src.CoinGekoRetriever.response_cache import ResponseCache
+from src.IngestionPipeline.metrics import PipelineMetrics
 
 
 @pytest.fixture
@@ -59,7 +61,29 @@ class TestCoinGekoClient:
         """Test successful initialization"""
         assert client.api_key == 'test_api_key_123'
 
-    @patch('requests.get')
+    def test_session_is_pooled(self, mock_env_vars):
+        """Test that the session keeps a connection pool sized to the workers"""
+        client = CoinGekoRetriever(pool_size=8, connect_timeout=2.0, read_timeout=10.0)
+
+        adapter = client.session.get_adapter(client.BASE_URL)
+        assert adapter._pool_maxsize == 8
+        assert adapter._pool_block is True
+        assert 'gzip' in client.session.headers['Accept-Encoding']
+        assert client.timeout == (2.0, 10.0)
+
+    def test_get_pool_stats(self, client):
+        """Test that pool stats report connections opened vs reused"""
+        pool = client.session.get_adapter(client.BASE_URL).poolmanager.connection_from_url(client.BASE_URL)
+        pool.num_requests = 5
+        pool.num_connections = 2
+
+        assert client.get_pool_stats() == {
+            'requests': 5,
+            'connections_opened': 2,
+            'connections_reused': 3
+        }
+
+    @patch('requests.Session.get')
     def test_check_geko_api_status_success(self, mock_get, client):
         """Test successful API status check"""
         mock_get.return_value.status_code = 200
@@ -68,17 +92,18 @@ class TestCoinGekoClient:
         assert client.check_geko_api_status() is True
         mock_get.assert_called_once_with(
             f"{client.BASE_URL}/ping",
-            params={'x_cg_demo_api_key': 'test_api_key_123'}
+            params={'x_cg_demo_api_key': 'test_api_key_123'},
+            timeout=client.timeout
         )
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_check_geko_api_status_failure(self, mock_get, client):
         """Test failed API status check"""
         mock_get.side_effect = requests.exceptions.RequestException("API Error")
 
         assert client.check_geko_api_status() is False
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @freeze_time("2024-01-15")
     def test_download_coin_data_success(self, mock_get, client, sample_coin_data, tmp_path):
         """Test successful coin data download"""
@@ -100,14 +125,31 @@ class TestCoinGekoClient:
                 params={
                     'date': '15-01-2024',
                     'x_cg_demo_api_key': client.api_key
-                }
+                },
+                timeout=client.timeout
             )
 
             mock_makedirs.assert_called_once_with('coin_data', exist_ok=True)
             assert filename == 'coin_data/bitcoin_2024-01-15.json'
             mock_file_open.assert_called_once_with('coin_data/bitcoin_2024-01-15.json', 'w')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
+    @freeze_time("2024-01-15")
+    def test_download_coin_data_uses_cache(self, mock_get, mock_env_vars, sample_coin_data, tmp_path):
+        """Test that a cached coin-day is served without spending an API request"""
+        cache = ResponseCache(str(tmp_path / "cache"))
+        client = CoinGekoRetriever(cache=cache)
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = sample_coin_data
+
+        with patch.object(CoinGekoRetriever, 'save_coin_data'):
+            client.download_coin_data_from('bitcoin', '2024-01-10')
+            client.download_coin_data_from('bitcoin', '2024-01-10')
+
+        mock_get.assert_called_once()
+        assert cache.get_stats()['hits'] == 1
+
+    @patch('requests.Session.get')
     def test_download_coin_data_invalid_date(self, mock_get, client):
         """Test download with invalid date format"""
         with pytest.raises(ValueError):
@@ -115,7 +157,7 @@ class TestCoinGekoClient:
 
         mock_get.assert_not_called()
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_download_coin_data_api_error(self, mock_get, client):
         """Test download with API error"""
         mock_get.side_effect = requests.exceptions.RequestException("API Error")
@@ -123,7 +165,43 @@ class TestCoinGekoClient:
         with pytest.raises(requests.exceptions.RequestException):
             client.download_coin_data_from('bitcoin', '2024-01-15')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
+    def test_download_coin_range_success(self, mock_get, client):
+        """Test that a range response is reduced to one payload per day"""
+        day = 86400 * 1000
+        jan_1 = 1704067200 * 1000
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {
+            'prices': [[jan_1 - 3600 * 1000, 99.0], [jan_1, 100.0], [jan_1 + day, 101.0], [jan_1 + 2 * day, 102.0]],
+            'market_caps': [[jan_1 - 3600 * 1000, 9.0], [jan_1, 10.0], [jan_1 + day, 11.0], [jan_1 + 2 * day, 12.0]],
+            'total_volumes': [[jan_1 - 3600 * 1000, 0.9], [jan_1, 1.0], [jan_1 + day, 1.1], [jan_1 + 2 * day, 1.2]]
+        }
+
+        with patch.object(CoinGekoRetriever, 'save_coin_data') as mock_save:
+            payloads = client.download_coin_range('bitcoin', '2024-01-01', '2024-01-02')
+
+        params = mock_get.call_args[1]['params']
+        assert mock_get.call_args[0][0] == f"{client.BASE_URL}/coins/bitcoin/market_chart/range"
+        assert params['to'] == 1704067200 + 2 * 86400
+        assert params['from'] == 1704067200 + 86400 - 91 * 86400
+
+        assert list(payloads) == ['2024-01-01', '2024-01-02']
+        assert payloads['2024-01-01']['market_data'] == {
+            'current_price': {'usd': 100.0},
+            'market_cap': {'usd': 10.0},
+            'total_volume': {'usd': 1.0}
+        }
+        assert mock_save.call_count == 2
+
+    @patch('requests.Session.get')
+    def test_download_coin_range_too_long(self, mock_get, client):
+        """Test that ranges over the API limit are rejected before any request"""
+        with pytest.raises(ValueError):
+            client.download_coin_range('bitcoin', '2022-01-01', '2024-01-01')
+
+        mock_get.assert_not_called()
+
+    @patch('requests.Session.get')
     def test_make_request_adds_api_key(self, mock_get, client):
         """Test that _make_request adds API key to parameters"""
         mock_get.return_value.status_code = 200
@@ -136,10 +214,59 @@ class TestCoinGekoClient:
             params={
                 'param1': 'value1',
                 'x_cg_demo_api_key': 'test_api_key_123'
-            }
+            },
+            timeout=client.timeout
         )
 
-    @patch('requests.get')
+    @patch('time.sleep')
+    @patch('requests.Session.get')
+    def test_make_request_retries_rate_limited(self, mock_get, mock_sleep, client):
+        """Test that a 429 is retried after Retry-After instead of failing the task"""
+        rate_limited = Mock(status_code=429, headers={'Retry-After': '7'})
+        success = Mock(status_code=200)
+        success.json.return_value = {"data": "test"}
+        mock_get.side_effect = [rate_limited, success]
+
+        assert client._make_request('test-endpoint') == {"data": "test"}
+        assert mock_get.call_count == 2
+        assert max(call[0][0] for call in mock_sleep.call_args_list) >= 7
+        assert client.rate_limiter.get_stats()['throttled'] == 1
+
+    @patch('time.sleep')
+    @patch('requests.Session.get')
+    def test_make_request_records_metrics(self, mock_get, mock_sleep, mock_env_vars):
+        """Test that every attempt, the retry and the JSON decoding are recorded"""
+        metrics = PipelineMetrics()
+        client = CoinGekoRetriever(metrics=metrics)
+        rate_limited = Mock(status_code=429, headers={'Retry-After': '1'}, content=b'{}', ok=False)
+        success = Mock(status_code=200, content=b'{"data": "test"}', ok=True)
+        success.json.return_value = {"data": "test"}
+        mock_get.side_effect = [rate_limited, success]
+
+        client._make_request('test-endpoint')
+
+        stats = metrics.get_stats()
+        assert (stats['http_request']['count'], stats['http_request']['errors']) == (2, 1)
+        assert stats['http_request']['retries'] == 1
+        assert stats['http_request']['bytes'] == 2 + len(b'{"data": "test"}')
+        assert stats['json_decode']['count'] == 1
+        assert stats['rate_limit_wait']['count'] == 2
+        assert stats['retry_backoff']['seconds'] >= 1
+
+    @patch('time.sleep')
+    @patch('requests.Session.get')
+    def test_make_request_gives_up_after_max_retries(self, mock_get, mock_sleep, mock_env_vars):
+        """Test that persistent 429s raise once the retries are exhausted"""
+        client = CoinGekoRetriever(requests_per_minute=6000, max_retries=2)
+        rate_limited = Mock(status_code=429, headers={})
+        rate_limited.raise_for_status.side_effect = requests.exceptions.HTTPError("429 Too Many Requests")
+        mock_get.return_value = rate_limited
+
+        with pytest.raises(requests.exceptions.HTTPError):
+            client._make_request('test-endpoint')
+        assert mock_get.call_count == 3
+
+    @patch('requests.Session.get')
     def test_make_request_handles_error(self, mock_get, client):
         """Test that _make_request handles API errors properly"""
         mock_get.side_effect = requests.exceptions.RequestException("API Error")
@@ -0,0 +1,122 @@
+#External imports:
+import os
+import pytest
+import pyarrow.parquet as pq
+from datetime import date
+from unittest.mock import patch
+
+#Internal imports:
+from src.ColumnarStore.columnar_store import ColumnarStore
+
+
+def make_row(coin_id, day, price, payload=None):
+    return {
+        'coin_id': coin_id,
+        'date': day,
+        'price_usd': price,
+        'market_cap_usd': price * 1000,
+        'volume_usd': price * 10,
+        'full_response': payload if payload is not None else {'id': coin_id, 'price': price}
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Fixture to create a store in a temporary directory"""
+    return ColumnarStore(str(tmp_path / "parquet"))
+
+
+class TestColumnarStore:
+    """Test suite for ColumnarStore"""
+
+    def test_append_partitions_by_coin_and_month(self, store):
+        """Test that rows land in one partition per coin and month"""
+        written = store.append([
+            make_row('bitcoin', '2024-01-31', 1.0),
+            make_row('bitcoin', '2024-02-01', 2.0),
+            make_row('ethereum', '2024-01-31', 3.0)
+        ])
+
+        assert written == 3
+        for coin_id, month in [('bitcoin', '2024-01'), ('bitcoin', '2024-02'), ('ethereum', '2024-01')]:
+            assert len(store._partition_files(coin_id, month)) == 1
+
+    def test_read_returns_requested_range(self, store):
+        """Test that read filters coins and dates and keeps the extracted columns"""
+        store.append([make_row('bitcoin', f'2024-01-{day:02d}', float(day)) for day in range(1, 11)])
+        store.append([make_row('ethereum', '2024-01-05', 50.0)])
+
+        df = store.read(['bitcoin'], '2024-01-03', '2024-01-05')
+
+        assert list(df['date']) == [date(2024, 1, 3), date(2024, 1, 4), date(2024, 1, 5)]
+        assert list(df['price_usd']) == [3.0, 4.0, 5.0]
+        assert list(df['market_cap_usd']) == [3000.0, 4000.0, 5000.0]
+        assert 'raw_payload' not in df.columns
+
+    def test_read_only_opens_overlapping_partitions(self, store):
+        """Test that partitions of other coins and months are not touched"""
+        store.append([
+            make_row('bitcoin', '2024-01-15', 1.0),
+            make_row('bitcoin', '2024-03-15', 2.0),
+            make_row('ethereum', '2024-01-15', 3.0)
+        ])
+
+        with patch('src.ColumnarStore.columnar_store.pq.read_table', wraps=pq.read_table) as mock_read:
+            df = store.read(['bitcoin'], '2024-01-01', '2024-01-31')
+
+        assert len(df) == 1
+        assert mock_read.call_count == 1
+        assert os.path.join('coin=bitcoin', 'month=2024-01') in mock_read.call_args[0][0]
+
+    def test_latest_append_wins(self, store):
+        """Test that a coin-day appended twice is read back at its latest version"""
+        store.append([make_row('bitcoin', '2024-01-15', 1.0)])
+        store.append([make_row('bitcoin', '2024-01-15', 2.0, {'version': 2})])
+
+        df = store.read(['bitcoin'], '2024-01-15', '2024-01-15')
+
+        assert list(df['price_usd']) == [2.0]
+        assert store.load_raw_payload('bitcoin', '2024-01-15') == {'version': 2}
+
+    def test_prices_only_append_keeps_stored_payload(self, store):
+        """Test that a range row updates the prices of a coin-day but keeps its full payload"""
+        store.append([make_row('bitcoin', '2024-01-15', 1.0, {'version': 'full'})])
+        range_row = dict(make_row('bitcoin', '2024-01-15', 2.0, {'version': 'range'}), prices_only=True)
+        new_day = dict(make_row('bitcoin', '2024-01-16', 3.0, {'version': 'range'}), prices_only=True)
+        store.append([range_row, new_day])
+
+        df = store.read(['bitcoin'], '2024-01-15', '2024-01-16')
+
+        assert list(df['price_usd']) == [2.0, 3.0]
+        assert store.load_raw_payload('bitcoin', '2024-01-15') == {'version': 'full'}
+        assert store.load_raw_payload('bitcoin', '2024-01-16') == {'version': 'range'}
+
+    def test_raw_payload_round_trip(self, store):
+        """Test that raw payloads are stored compressed and decoded on request"""
+        payload = {'id': 'bitcoin', 'market_data': {'current_price': {'usd': 42800.23}}}
+        store.append([make_row('bitcoin', '2024-01-15', 42800.23, payload)])
+
+        assert store.load_raw_payload('bitcoin', '2024-01-15') == payload
+        assert store.load_raw_payload('bitcoin', '2024-01-16') is None
+        df = store.read(['bitcoin'], '2024-01-15', '2024-01-15', include_raw=True)
+        assert df['full_response'].iloc[0] == payload
+
+    def test_read_missing_partitions_returns_empty_frame(self, store):
+        """Test that reading coins never stored yields an empty DataFrame"""
+        df = store.read(['dogecoin'], '2024-01-01', '2024-12-31')
+
+        assert df.empty
+        assert 'price_usd' in df.columns
+
+    def test_compact_merges_part_files(self, store):
+        """Test that compaction leaves a single file with the latest versions"""
+        store.append([make_row('bitcoin', '2024-01-01', 1.0), make_row('bitcoin', '2024-01-02', 2.0)])
+        store.append([make_row('bitcoin', '2024-01-02', 20.0)])
+        store.append([make_row('bitcoin', '2024-01-03', 3.0)])
+
+        rows = store.compact('bitcoin', '2024-01')
+
+        assert rows == 3
+        assert len(store._partition_files('bitcoin', '2024-01')) == 1
+        df = store.read(['bitcoin'], '2024-01-01', '2024-01-31')
+        assert list(df['price_usd']) == [1.0, 20.0, 3.0]
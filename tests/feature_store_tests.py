@@ -0,0 +1,98 @@
+#External imports:
+from contextlib import contextmanager
+from datetime import date
+import numpy as np
+import pandas as pd
+from unittest.mock import MagicMock, patch
+
+#Internal imports:
+from src.FeatureEngineering.feature_store import FeatureStore, FEATURE_COLUMNS, CONTEXT_DAYS, compute_features
+from src.FeatureEngineering.time_series_features import create_time_series_features, add_features
+from benchmarks.task4_reference import synthetic_coin_data
+
+
+def make_connector(records=()):
+    """Mock PGConnector whose queries return the given price records"""
+    connection, cursor = MagicMock(), MagicMock()
+    cursor.fetchall.return_value = list(records)
+    pg_connector = MagicMock()
+
+    @contextmanager
+    def borrow_connection():
+        yield connection, cursor
+
+    pg_connector.borrow_connection = borrow_connection
+    return pg_connector, connection, cursor
+
+
+class TestFeatureStore:
+    """Test suite for the incremental feature store"""
+
+    def test_compute_features_matches_full_history(self):
+        """Test that the stored features are those of the library over the whole history"""
+        coin_data = synthetic_coin_data(coins=3, days=60, volume=False, crash_rate=0.0, seed=1)
+        expected = create_time_series_features(coin_data, scale=False).reset_index(drop=True)
+        variance = add_features(coin_data)['price_7d_variance']
+
+        features = compute_features(expected['coin'].to_numpy(), expected['price'].to_numpy())
+
+        result = pd.DataFrame(features, columns=FEATURE_COLUMNS)
+        for column in FEATURE_COLUMNS[1:-1]:
+            np.testing.assert_allclose(result[column], expected[column], rtol=1e-12)
+        np.testing.assert_allclose(result['price_7d_variance'], variance, rtol=1e-12)
+
+    def test_update_writes_only_new_days(self):
+        """Test that a new day is computed from the stored days before it, which are not written again"""
+        prices = [100.0 + day for day in range(CONTEXT_DAYS + 1)]
+        records = [('bitcoin', date(2024, 1, day + 1), price, day == CONTEXT_DAYS) for day, price in enumerate(prices)]
+        pg_connector, connection, cursor = make_connector(records)
+
+        with patch('src.FeatureEngineering.feature_store.execute_values', return_value=[(1,)]) as mock_values:
+            count = FeatureStore(pg_connector).update([('bitcoin', '2024-01-08')])
+
+        assert count == 1
+        coin_ids, first_dates, last_dates = cursor.execute.call_args_list[1][0][1]
+        assert (coin_ids, first_dates, last_dates) == (['bitcoin'], [date(2024, 1, 8)], [date(2024, 1, 8)])
+        values = mock_values.call_args[0][2]
+        assert len(values) == 1
+        coin_id, day, price, *lags = values[0][:CONTEXT_DAYS + 3]
+        assert (coin_id, day, price) == ('bitcoin', date(2024, 1, 8), 107.0)
+        assert lags == [106.0, 105.0, 104.0, 103.0, 102.0, 101.0, 100.0]
+        connection.commit.assert_called_once()
+
+    def test_update_groups_dates_per_coin(self):
+        """Test that each coin is read from its first to its last date, locked in a fixed order"""
+        pg_connector, _, cursor = make_connector()
+
+        FeatureStore(pg_connector).update([('ethereum', '2024-01-03'), ('bitcoin', '2024-01-05'),
+                                          ('ethereum', '2024-01-01'), ('bitcoin', date(2024, 1, 2))])
+
+        assert cursor.execute.call_args_list[0][0][1] == (['bitcoin', 'ethereum'],)
+        assert cursor.execute.call_args_list[1][0][1] == (
+            ['bitcoin', 'ethereum'], [date(2024, 1, 2), date(2024, 1, 1)], [date(2024, 1, 5), date(2024, 1, 3)]
+        )
+
+    def test_update_stores_missing_features_as_null(self):
+        """Test that the lags and windows before the first day of a coin are NULL"""
+        pg_connector, _, _ = make_connector([('bitcoin', date(2024, 1, 1), 100.0, True)])
+
+        with patch('src.FeatureEngineering.feature_store.execute_values', return_value=[(1,)]) as mock_values:
+            FeatureStore(pg_connector).update([('bitcoin', '2024-01-01')])
+
+        row = mock_values.call_args[0][2][0]
+        assert row[2] == 100.0
+        assert all(value is None for value in row[3:3 + CONTEXT_DAYS])
+
+    def test_update_failure(self):
+        """Test that a failed update is logged and reported as None"""
+        pg_connector, _, cursor = make_connector()
+        cursor.execute.side_effect = Exception("connection lost")
+
+        assert FeatureStore(pg_connector).update([('bitcoin', '2024-01-01')]) is None
+
+    def test_update_without_dates(self):
+        """Test that nothing is read when no price was stored"""
+        pg_connector = MagicMock()
+
+        assert FeatureStore(pg_connector).update([]) == 0
+        pg_connector.borrow_connection.assert_not_called()
@@ -0,0 +1,81 @@
+#External imports:
+from datetime import datetime
+import pytest
+import requests
+
+#Internal imports:
+from benchmarks.fake_coingecko import FakeCoinGecko, coin_price
+from benchmarks.ingestion_benchmark import compare_results, run_configuration
+
+
+@pytest.fixture
+def server():
+    with FakeCoinGecko(payload_bytes=5000) as fake:
+        yield fake
+
+
+class TestFakeCoinGecko:
+    """Test suite for the local CoinGecko stand-in"""
+
+    def test_history_payload(self, server):
+        """Test that /history answers a padded, gzipped payload with a deterministic price"""
+        response = requests.get(f"{server.url}/coins/bitcoin/history",
+                                params={'date': '15-01-2024', 'x_cg_demo_api_key': 'key'})
+
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        data = response.json()
+        assert data['market_data']['current_price']['usd'] == coin_price('bitcoin', '15-01-2024')
+        assert 4500 < len(response.content) < 5500
+        assert server.get_stats()['requests'] == 1
+
+    def test_ping_and_errors(self, server):
+        """Test /ping, and that requests without API key or to unknown endpoints fail"""
+        assert requests.get(f"{server.url}/ping", params={'x_cg_demo_api_key': 'key'}).status_code == 200
+        assert requests.get(f"{server.url}/ping").status_code == 401
+        assert requests.get(f"{server.url}/coins/list", params={'x_cg_demo_api_key': 'key'}).status_code == 404
+
+    def test_rate_limit_injection(self):
+        """Test that the share of 429 responses carries a Retry-After header"""
+        with FakeCoinGecko(rate_limit_fraction=1.0, retry_after=2, compress=False) as fake:
+            response = requests.get(f"{fake.url}/ping", params={'x_cg_demo_api_key': 'key'})
+
+            assert response.status_code == 429
+            assert response.headers['Retry-After'] == '2'
+            assert fake.get_stats()['rate_limited'] == 1
+
+
+class TestIngestionBenchmark:
+    """Test suite for the end-to-end ingestion benchmark"""
+
+    @pytest.mark.parametrize("storage, stored", [('none', None), ('files', 6)])
+    def test_run_configuration(self, server, monkeypatch, storage, stored):
+        """Test that a run downloads every coin-day from the stand-in and measures it"""
+        monkeypatch.setenv('GEKO_API_KEY', 'key')
+
+        result = run_configuration(server.url, ['bitcoin', 'ethereum'], datetime(2024, 1, 1), datetime(2024, 1, 3),
+                                   workers=2, storage=storage)
+
+        assert result['coin_days'] == 6
+        assert result['stored_rows'] == stored
+        assert result['coin_days_per_second'] > 0
+        assert result['latency_p50_ms'] <= result['latency_p99_ms']
+        assert result['peak_rss_mb'] > 0
+        assert server.get_stats()['requests'] == 6
+
+    def test_compare_results_flags_regressions(self):
+        """Test that only throughput drops beyond the tolerance are regressions"""
+        baseline = {'results': [
+            {'storage': 'none', 'workers': 1, 'coin_days_per_second': 100.0},
+            {'storage': 'none', 'workers': 8, 'coin_days_per_second': 500.0}
+        ]}
+        results = [
+            {'storage': 'none', 'workers': 1, 'coin_days_per_second': 95.0},
+            {'storage': 'none', 'workers': 8, 'coin_days_per_second': 400.0},
+            {'storage': 'pg', 'workers': 8, 'coin_days_per_second': 300.0}
+        ]
+
+        rows, regressions = compare_results(baseline, results, tolerance=0.1)
+
+        assert regressions == 1
+        assert [row[-1] for row in rows] == ['', 'REGRESSION']
@@ -0,0 +1,101 @@
+#External imports:
+import sqlite3
+import pytest
+
+#Internal imports:
+from src.IngestionPipeline.ledger import TaskLedger
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    """Fixture to create a ledger in a temporary directory"""
+    ledger = TaskLedger(str(tmp_path / "tasks.sqlite"))
+    yield ledger
+    ledger.close()
+
+
+class TestTaskLedger:
+    """Test suite for TaskLedger"""
+
+    def test_create_job_records_pending_tasks(self, ledger):
+        """Test that every task of a new job is pending"""
+        job_id = ledger.create_job({'coin_ids': ['bitcoin']}, {'bitcoin': ['2024-01-01', '2024-01-02']})
+
+        assert ledger.latest_job_id() == job_id
+        assert ledger.get_job_params(job_id) == {'coin_ids': ['bitcoin']}
+        assert ledger.pending_tasks(job_id) == {'bitcoin': ['2024-01-01', '2024-01-02']}
+        assert ledger.get_stats(job_id) == {'pending': 2, 'done': 0, 'failed': 0}
+
+    def test_finished_tasks_are_not_pending(self, ledger):
+        """Test that done and failed tasks leave the pending list"""
+        job_id = ledger.create_job({}, {'bitcoin': ['2024-01-01', '2024-01-02', '2024-01-03']})
+
+        ledger.mark_done(job_id, [('bitcoin', '2024-01-01')])
+        ledger.mark_failed(job_id, [('bitcoin', '2024-01-02')], "API Error")
+
+        assert ledger.pending_tasks(job_id) == {'bitcoin': ['2024-01-03']}
+        assert ledger.get_stats(job_id) == {'pending': 1, 'done': 1, 'failed': 1}
+
+    def test_reset_failed_keeps_attempts_and_error(self, ledger):
+        """Test that failed tasks can be retried and remember their attempts"""
+        job_id = ledger.create_job({}, {'bitcoin': ['2024-01-01']})
+        ledger.mark_failed(job_id, [('bitcoin', '2024-01-01')], "API Error")
+
+        assert ledger.reset_failed(job_id) == 1
+        assert ledger.pending_tasks(job_id) == {'bitcoin': ['2024-01-01']}
+        attempts, last_error = ledger.connection.execute(
+            "SELECT attempts, last_error FROM tasks WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        assert (attempts, last_error) == (1, "API Error")
+
+    def test_reset_failed_honors_max_attempts(self, ledger):
+        """Test that tasks attempted too many times stay failed"""
+        job_id = ledger.create_job({}, {'bitcoin': ['2024-01-01'], 'ethereum': ['2024-01-01']})
+        ledger.mark_failed(job_id, [('bitcoin', '2024-01-01')], "API Error")
+        ledger.mark_failed(job_id, [('bitcoin', '2024-01-01'), ('ethereum', '2024-01-01')], "API Error")
+
+        assert ledger.reset_failed(job_id, max_attempts=2) == 1
+        assert ledger.pending_tasks(job_id) == {'ethereum': ['2024-01-01']}
+
+    def test_ledger_survives_reopening(self, tmp_path):
+        """Test that the state of a job is durable"""
+        path = str(tmp_path / "tasks.sqlite")
+        ledger = TaskLedger(path)
+        job_id = ledger.create_job({}, {'bitcoin': ['2024-01-01', '2024-01-02']})
+        ledger.mark_done(job_id, [('bitcoin', '2024-01-01')])
+        ledger.close()
+
+        reopened = TaskLedger(path)
+        assert reopened.pending_tasks(job_id) == {'bitcoin': ['2024-01-02']}
+        reopened.close()
+
+    def test_latest_job_of_empty_ledger(self, ledger):
+        """Test that an empty ledger has no job to resume"""
+        assert ledger.latest_job_id() is None
+
+    def test_run_job_ids(self, ledger):
+        """Test that the shard jobs of one run are found from any of them"""
+        single = ledger.create_job({}, {'bitcoin': ['2024-01-01']})
+        first = ledger.create_job({}, {'bitcoin': ['2024-01-02']}, run_id='run-1')
+        second = ledger.create_job({}, {'ethereum': ['2024-01-02']}, run_id='run-1')
+
+        assert ledger.run_job_ids(second) == [first, second]
+        assert ledger.run_job_ids(single) == [single]
+        assert ledger.run_job_ids(42) == []
+
+    def test_ledger_without_run_ids_is_migrated(self, tmp_path):
+        """Test that a ledger created before run identifiers gets the column on opening"""
+        path = str(tmp_path / "tasks.sqlite")
+        connection = sqlite3.connect(path)
+        connection.execute("CREATE TABLE jobs (job_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                           "created_at TEXT NOT NULL, params TEXT NOT NULL)")
+        connection.execute("INSERT INTO jobs (created_at, params) VALUES ('2024-01-01', '{}')")
+        connection.commit()
+        connection.close()
+
+        ledger = TaskLedger(path)
+        job_id = ledger.create_job({}, {}, run_id='run-1')
+
+        assert ledger.run_job_ids(1) == [1]
+        assert ledger.run_job_ids(job_id) == [job_id]
+        ledger.close()
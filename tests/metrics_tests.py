@@ -0,0 +1,90 @@
+#External imports:
+import urllib.request
+from unittest.mock import Mock
+
+#Internal imports:
+from src.IngestionPipeline.metrics import PipelineMetrics
+from src.IngestionPipeline.sinks import FileSink, SinkPipeline
+
+
+class TestPipelineMetrics:
+    """Test suite for the ingestion pipeline metrics"""
+
+    def test_stats_and_quantiles(self):
+        """Test that runs, bytes and retries add up and quantiles fall in the right bucket"""
+        metrics = PipelineMetrics()
+        for _ in range(99):
+            metrics.observe('http_request', 0.02, size=1000)
+        metrics.observe('http_request', 3.0, size=500, error=True)
+        metrics.add_retry('http_request', 2)
+
+        stats = metrics.get_stats()['http_request']
+
+        assert (stats['count'], stats['bytes'], stats['items'], stats['errors'], stats['retries']) == (100, 99500, 100, 1, 2)
+        assert 0.01 < stats['p50'] <= 0.025
+        assert 0.01 < stats['p99'] <= 0.025
+        assert abs(stats['seconds'] - (99 * 0.02 + 3.0)) < 1e-9
+
+    def test_prometheus_format(self):
+        """Test that the histogram buckets are cumulative and every counter and gauge is exported"""
+        metrics = PipelineMetrics(buckets=(0.1, 1.0))
+        metrics.observe('file_write', 0.05, size=10)
+        metrics.observe('file_write', 0.5, size=20)
+        metrics.set_queue_depth('downloads', 5)
+        metrics.set_queue_depth('downloads', 2)
+
+        text = metrics.to_prometheus()
+
+        assert 'coingecko_ingestion_stage_duration_seconds_bucket{stage="file_write",le="0.1"} 1\n' in text
+        assert 'coingecko_ingestion_stage_duration_seconds_bucket{stage="file_write",le="1.0"} 2\n' in text
+        assert 'coingecko_ingestion_stage_duration_seconds_bucket{stage="file_write",le="+Inf"} 2\n' in text
+        assert 'coingecko_ingestion_stage_duration_seconds_count{stage="file_write"} 2\n' in text
+        assert 'coingecko_ingestion_stage_bytes_total{stage="file_write"} 30\n' in text
+        assert 'coingecko_ingestion_queue_depth{queue="downloads"} 2\n' in text
+        assert 'coingecko_ingestion_queue_depth_max{queue="downloads"} 5\n' in text
+        assert '# TYPE coingecko_ingestion_stage_retries_total counter\n' in text
+
+    def test_write_and_serve(self, tmp_path):
+        """Test that the metrics can be written to a file and scraped over HTTP"""
+        metrics = PipelineMetrics()
+        metrics.observe('pg_bulk_insert', 0.2, items=500)
+        path = tmp_path / "ingestion.prom"
+
+        metrics.write_prometheus(str(path))
+        server = metrics.serve(0, host='127.0.0.1')
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+                scraped = response.read().decode('utf-8')
+        finally:
+            server.shutdown()
+
+        assert path.read_text() == scraped == metrics.to_prometheus()
+        assert not (tmp_path / "ingestion.prom.tmp").exists()
+
+    def test_summary_table(self):
+        """Test that the summary lists every stage and queue"""
+        metrics = PipelineMetrics()
+        metrics.observe('json_decode', 0.0001, size=2000)
+        metrics.set_queue_depth('write_batches', 1)
+
+        table = metrics.summary_table()
+
+        assert 'json_decode' in table
+        assert 'write_batches' in table
+
+    def test_sinks_report_writes(self, tmp_path):
+        """Test that the sink pipeline times each sink and the file sink counts the bytes written"""
+        metrics = PipelineMetrics()
+        failing = Mock()
+        failing.name = 'postgres'
+        failing.write.side_effect = Exception("connection lost")
+        row = {'coin_id': 'bitcoin', 'date': '2024-01-15', 'full_response': {}, 'raw_response': b'{"id":"bitcoin"}'}
+        pipeline = SinkPipeline([FileSink(str(tmp_path), metrics), failing], metrics)
+
+        pipeline.write([row])
+        pipeline.close()
+
+        stats = metrics.get_stats()
+        assert stats['file_write']['bytes'] == len(b'{"id":"bitcoin"}')
+        assert (stats['sink_files']['items'], stats['sink_files']['errors']) == (1, 0)
+        assert stats['sink_postgres']['errors'] == 1
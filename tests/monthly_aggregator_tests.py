@@ -0,0 +1,60 @@
+#External imports:
+from datetime import date
+
+#Internal imports:
+from src.PGConnector.monthly_aggregator import MonthlyAggregator
+
+
+class TestMonthlyAggregator:
+    """Test suite for MonthlyAggregator"""
+
+    def test_flush_computes_month_statistics(self):
+        """Test that every month touched gets its min, max, sum, count, open and close"""
+        aggregator = MonthlyAggregator()
+        aggregator.add("bitcoin", "2024-01-03", 30.0)
+        aggregator.add("bitcoin", "2024-01-01", 10.0)
+        aggregator.add("bitcoin", "2024-01-02", 50.0)
+        aggregator.add("bitcoin", "2024-02-01", 60.0)
+
+        stats = {(stat['year'], stat['month']): stat for stat in aggregator.flush()}
+
+        assert stats[(2024, 1)] == {
+            'coin_id': "bitcoin", 'year': 2024, 'month': 1,
+            'min_price': 10.0, 'max_price': 50.0, 'sum_price': 90.0, 'day_count': 3,
+            'open_date': date(2024, 1, 1), 'open_price': 10.0,
+            'close_date': date(2024, 1, 3), 'close_price': 30.0,
+            'revised': False
+        }
+        assert stats[(2024, 2)]['day_count'] == 1
+
+    def test_same_day_is_counted_once(self):
+        """Test that a coin-day added twice keeps its latest price"""
+        aggregator = MonthlyAggregator()
+        aggregator.add("bitcoin", "2024-01-01", 10.0)
+        aggregator.add("bitcoin", date(2024, 1, 1), 20.0)
+
+        assert len(aggregator) == 1
+        [stat] = aggregator.flush()
+        assert (stat['day_count'], stat['sum_price']) == (1, 20.0)
+
+    def test_flush_starts_over(self):
+        """Test that overwritten days flag their month and a flush resets the aggregator"""
+        aggregator = MonthlyAggregator()
+        aggregator.add("bitcoin", "2024-01-01", 10.0, inserted=False)
+
+        assert aggregator.flush()[0]['revised'] is True
+        assert len(aggregator) == 0
+        assert aggregator.flush() == []
+
+    def test_split_stats(self):
+        """Test that revised months are recomputed, the others merged, and unmerged ones recomputed too"""
+        aggregator = MonthlyAggregator()
+        aggregator.add("bitcoin", "2024-01-01", 10.0)
+        aggregator.add("bitcoin", "2024-02-01", 20.0, inserted=False)
+        aggregator.add("ethereum", "2024-01-01", 5.0)
+
+        merged, recompute = MonthlyAggregator.split_stats(aggregator.flush())
+
+        assert sorted((stat['coin_id'], stat['month']) for stat in merged) == [("bitcoin", 1), ("ethereum", 1)]
+        assert recompute == [("bitcoin", 2024, 2)]
+        assert MonthlyAggregator.unmerged_months(merged, {("bitcoin", 2024, 1)}) == [("ethereum", 2024, 1)]
@@ -0,0 +1,33 @@
+#External imports:
+import pytest
+
+#Internal imports:
+from src.PGConnector.payload_archive import compress_payload, decompress_payload, market_values
+
+
+class TestPayloadArchive:
+    """Test suite for the payloads of the split storage layout"""
+
+    def test_compress_payload_round_trip(self):
+        """Test that a compressed payload is read back as the parsed response"""
+        full_response = {"id": "bitcoin", "market_data": {"current_price": {"usd": 50000.5}}}
+
+        payload = compress_payload(full_response)
+
+        assert decompress_payload(memoryview(payload)) == full_response
+
+    def test_compress_payload_keeps_raw_response(self):
+        """Test that the response body is archived as received instead of serializing it again"""
+        payload = compress_payload({"id": "bitcoin"}, raw_response=b'{"id":"bitcoin","raw":true}')
+
+        assert decompress_payload(payload) == {"id": "bitcoin", "raw": True}
+
+    @pytest.mark.parametrize("full_response, expected", [
+        ({"market_data": {"market_cap": {"usd": 1000.0}, "total_volume": {"usd": 20.0}}}, (1000.0, 20.0)),
+        ({"market_data": {"market_cap": {"eur": 900.0}}}, (None, None)),
+        ({"id": "bitcoin"}, (None, None)),
+        (None, (None, None))
+    ])
+    def test_market_values(self, full_response, expected):
+        """Test the typed columns extracted from a payload, missing values included"""
+        assert market_values(full_response) == expected
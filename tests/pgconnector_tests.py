@@ -1,17 +1,26 @@
 #External imports
 import unittest
 from unittest.mock import patch, MagicMock
-from datetime import datetime
+from datetime import datetime, date
+from decimal import Decimal
+from types import SimpleNamespace
+import io
 import os
+import psycopg2
 
 #Internal imports
 from src.PGConnector.pgconnector import PGConnector
+from src.PGConnector.payload_archive import compress_payload, decompress_payload
 
 
 class TestPGConnector(unittest.TestCase):
     def setUp(self):
         self.db_name = "test_database"
         self.connector = PGConnector(self.db_name)
+        # A plain daily prices table, so writes do not look up its partitions first
+        self.connector.partitions = set()
+        # ... with the payloads stored inline
+        self.connector.split_payload = False
 
     @patch('psycopg2.connect')
     def test_create_database(self, mock_connect):
@@ -99,6 +108,289 @@ class TestPGConnector(unittest.TestCase):
         )
         mock_conn.commit.assert_called_once()
 
+    @patch('psycopg2.connect')
+    def test_insert_daily_price_stores_raw_response(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        self.connector.connect()
+
+        # The body is stored as received, not serialized again from the parsed response
+        self.connector.insert_daily_price(
+            coin_id="bitcoin",
+            price_usd=50000.5,
+            date="2024-01-01",
+            full_response={"id": "bitcoin"},
+            raw_response=b'{"id":"bitcoin"}'
+        )
+
+        self.assertEqual(mock_cursor.execute.call_args[0][1], ("bitcoin", 50000.5, "2024-01-01", '{"id":"bitcoin"}'))
+
+    @patch('psycopg2.connect')
+    def test_insert_daily_price_split_payload(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        self.connector.connect()
+        self.connector.split_payload = True
+
+        full_response = {"market_data": {"market_cap": {"usd": 1000.0}, "total_volume": {"usd": 20.0}}}
+        self.connector.insert_daily_price("bitcoin", 50000.5, "2024-01-01", full_response)
+
+        (insert_query, insert_params), (archive_query, archive_params) = (
+            call[0] for call in mock_cursor.execute.call_args_list
+        )
+        # The daily prices table gets typed columns only, the payload goes compressed to the archive
+        self.assertIn("full_response = NULL", insert_query)
+        self.assertEqual(insert_params, ("bitcoin", 50000.5, "2024-01-01", 1000.0, 20.0))
+        self.assertIn("INSERT INTO cryptocurrency_raw_payloads", archive_query)
+        self.assertEqual(decompress_payload(archive_params[2].adapted), full_response)
+        mock_conn.commit.assert_called_once()
+
+    @patch('psycopg2.connect')
+    def test_load_raw_payload(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = (compress_payload({"id": "bitcoin"}),)
+        self.connector.connect()
+        self.connector.split_payload = True
+
+        payload = self.connector.load_raw_payload("bitcoin", "2024-01-01")
+
+        self.assertEqual(payload, {"id": "bitcoin"})
+        query, params = mock_cursor.execute.call_args[0]
+        self.assertIn("FROM cryptocurrency_raw_payloads", query)
+        self.assertEqual(params, ("bitcoin", "2024-01-01"))
+
+    @patch('psycopg2.connect')
+    def test_load_raw_payload_stored_inline(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = ({"id": "bitcoin"},)
+        self.connector.connect()
+
+        self.assertEqual(self.connector.load_raw_payload("bitcoin", "2024-01-01"), {"id": "bitcoin"})
+        self.assertIn("SELECT full_response FROM cryptocurrency_daily_prices", mock_cursor.execute.call_args[0][0])
+
+    @patch('psycopg2.connect')
+    def test_find_missing_dates(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [("bitcoin", datetime(2024, 1, 2).date())]
+        self.connector.connect()
+
+        missing = self.connector.find_missing_dates(["bitcoin", "ethereum"], "2024-01-01", "2024-01-02")
+
+        self.assertEqual(missing, {"bitcoin": ["2024-01-02"], "ethereum": []})
+        query, params = mock_cursor.execute.call_args[0]
+        self.assertIn("NOT EXISTS", query)
+        self.assertEqual(params, (["bitcoin", "ethereum"], "2024-01-01", "2024-01-02"))
+
+    @patch('psycopg2.connect')
+    def test_iter_query(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.description = [SimpleNamespace(name="coin_id"), SimpleNamespace(name="price_usd")]
+        mock_cursor.fetchmany.side_effect = [
+            [("bitcoin", Decimal("50000.5")), ("bitcoin", Decimal("51000.0"))],
+            [("bitcoin", Decimal("52000.0"))],
+            []
+        ]
+        self.connector.connect()
+
+        chunks = list(self.connector.iter_query(
+            "SELECT coin_id, price_usd FROM cryptocurrency_daily_prices WHERE coin_id = %s",
+            chunk_size=2, params=("bitcoin",), dtypes={"price_usd": "float64"}
+        ))
+
+        # Rows are fetched from a server-side cursor, one chunk at a time
+        self.assertTrue(mock_conn.cursor.call_args.kwargs["name"].startswith("iter_query_"))
+        mock_cursor.fetchmany.assert_called_with(2)
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        self.assertEqual(list(chunks[0].columns), ["coin_id", "price_usd"])
+        self.assertEqual(chunks[0]["price_usd"].dtype, "float64")
+        self.assertEqual(mock_cursor.execute.call_args[0][1], ("bitcoin",))
+        mock_conn.commit.assert_called_once()
+
+    @patch('psycopg2.connect')
+    def test_iter_query_arrow(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.description = [SimpleNamespace(name="coin_id"), SimpleNamespace(name="price_usd")]
+        mock_cursor.fetchmany.side_effect = [[("bitcoin", 50000.5)], []]
+        self.connector.connect()
+
+        batches = list(self.connector.iter_query("SELECT coin_id, price_usd FROM coin_data", arrow=True))
+
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(batches[0].schema.names, ["coin_id", "price_usd"])
+        self.assertEqual(batches[0].num_rows, 1)
+
+    @patch('psycopg2.connect')
+    def test_export_query(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.mogrify.return_value = b"SELECT coin_id, date FROM coin_data WHERE coin_id = 'bitcoin';"
+        mock_cursor.rowcount = 30
+        self.connector.connect()
+
+        destination = io.StringIO()
+        count = self.connector.export_query("SELECT coin_id, date FROM coin_data WHERE coin_id = %s;",
+                                            destination, params=("bitcoin",))
+
+        self.assertEqual(count, 30)
+        mock_cursor.copy_expert.assert_called_once_with(
+            "COPY (SELECT coin_id, date FROM coin_data WHERE coin_id = 'bitcoin') TO STDOUT WITH (FORMAT csv, HEADER)",
+            destination
+        )
+        mock_conn.commit.assert_called_once()
+
+    @patch('psycopg2.connect')
+    def test_recompute_monthly_aggregates(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.rowcount = 3
+        self.connector.connect()
+
+        count = self.connector.recompute_monthly_aggregates(["bitcoin"], "2024-01-15", "2024-03-10")
+
+        self.assertEqual(count, 3)
+        query, params = mock_cursor.execute.call_args[0]
+        self.assertIn("GROUP BY d.coin_id", query)
+        self.assertIn("AVG(d.price_usd)", query)
+        self.assertEqual(params, {'coin_ids': ["bitcoin"], 'start_date': "2024-01-15", 'end_date': "2024-03-10"})
+        mock_conn.commit.assert_called_once()
+
+    @patch('psycopg2.connect')
+    def test_refresh_analytics(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = ('', True)
+        self.connector.connect()
+
+        self.assertTrue(self.connector.refresh_analytics())
+
+        executed = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        self.assertIn("pg_advisory_xact_lock", executed[0])
+        self.assertEqual(executed[1:], [
+            "REFRESH MATERIALIZED VIEW CONCURRENTLY cryptocurrency_monthly_averages;",
+            "REFRESH MATERIALIZED VIEW CONCURRENTLY cryptocurrency_drop_streaks;"
+        ])
+        mock_conn.commit.assert_called_once()
+
+    @patch('psycopg2.connect')
+    def test_refresh_analytics_skips_while_another_runs(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = (False,)
+        self.connector.connect()
+
+        self.assertFalse(self.connector.refresh_analytics(wait=False))
+
+        self.assertIn("pg_try_advisory_xact_lock", mock_cursor.execute.call_args[0][0])
+        mock_conn.commit.assert_not_called()
+
+    @patch('psycopg2.connect')
+    def test_ensure_partitions_creates_missing_months(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = (True, ["cryptocurrency_daily_prices_2024_01"])
+        self.connector.partitions = None
+        self.connector.connect()
+
+        created = self.connector.ensure_partitions(["2024-01-31", "2024-02-01"])
+
+        self.assertEqual(created, 2)
+        executed = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        self.assertIn("pg_advisory_xact_lock", executed[1])
+        self.assertEqual(executed[-2:], [
+            'CREATE TABLE "cryptocurrency_daily_prices_2024_02" PARTITION OF cryptocurrency_daily_prices '
+            "FOR VALUES FROM ('2024-02-01') TO ('2024-03-01');",
+            'CREATE TABLE "cryptocurrency_daily_prices_2024_03" PARTITION OF cryptocurrency_daily_prices '
+            "FOR VALUES FROM ('2024-03-01') TO ('2024-04-01');"
+        ])
+
+        # Known partitions do not run any statement again
+        mock_cursor.execute.reset_mock()
+        self.assertEqual(self.connector.ensure_partitions(["2024-02-15"]), 0)
+        mock_cursor.execute.assert_not_called()
+
+    @patch('psycopg2.connect')
+    def test_ensure_partitions_plain_table(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = (False, [])
+        self.connector.partitions = None
+        self.connector.connect()
+
+        self.assertEqual(self.connector.ensure_partitions(["2024-01-31"]), 0)
+        self.assertEqual(mock_cursor.execute.call_count, 1)
+
+    @patch('psycopg2.connect')
+    def test_archive_partitions_detach(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        self.connector.connect()
+        self.connector.partitioned = True
+        self.connector.partitions = {
+            "cryptocurrency_daily_prices_2023_12",
+            "cryptocurrency_daily_prices_2024_01",
+            "cryptocurrency_daily_prices_2024_02"
+        }
+
+        archived = self.connector.archive_partitions("2024-02-01", "detach")
+
+        self.assertEqual(archived, ["cryptocurrency_daily_prices_2023_12", "cryptocurrency_daily_prices_2024_01"])
+        mock_cursor.execute.assert_called_with(
+            'ALTER TABLE cryptocurrency_daily_prices DETACH PARTITION "cryptocurrency_daily_prices_2024_01";'
+        )
+        self.assertEqual(self.connector.partitions, {"cryptocurrency_daily_prices_2024_02"})
+
+    @patch('psycopg2.connect')
+    def test_archive_partitions_rejects_unknown_compression(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        self.connector.connect()
+        self.connector.partitioned = True
+        self.connector.partitions = {"cryptocurrency_daily_prices_2023_12"}
+
+        with self.assertRaises(ValueError):
+            self.connector.archive_partitions("2024-02-01", "compress", "lz4; DROP TABLE cryptocurrency_daily_prices")
+        mock_cursor.execute.assert_not_called()
+
+        self.connector.archive_partitions("2024-02-01", "compress", "pglz")
+        mock_cursor.execute.assert_any_call(
+            'ALTER TABLE "cryptocurrency_daily_prices_2023_12" ALTER COLUMN full_response SET COMPRESSION pglz;'
+        )
+
     @patch('psycopg2.connect')
     def test_update_monthly_aggregates(self, mock_connect):
         mock_conn = MagicMock()
@@ -114,19 +406,210 @@ class TestPGConnector(unittest.TestCase):
             price_usd=50000.5
         )
 
-        expected_query = """
-            INSERT INTO cryptocurrency_monthly_aggregates 
-            (coin_id, year, month, min_price, max_price) 
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (coin_id, year, month) DO UPDATE 
-            SET min_price = LEAST(cryptocurrency_monthly_aggregates.min_price, EXCLUDED.min_price),
-                max_price = GREATEST(cryptocurrency_monthly_aggregates.max_price, EXCLUDED.max_price);
-            """
-        mock_cursor.execute.assert_called_with(
-            expected_query, ("bitcoin", 2024, 1, 50000.5, 50000.5)
+        # The month is recomputed from the stored daily prices
+        query, params = mock_cursor.execute.call_args[0]
+        self.assertIn("FROM unnest(%s::varchar[], %s::int[], %s::int[])", query)
+        self.assertEqual(params, (["bitcoin"], [2024], [1]))
+        mock_conn.commit.assert_called_once()
+
+
+    @patch('src.PGConnector.pgconnector.execute_values')
+    @patch('psycopg2.connect')
+    def test_insert_daily_prices_bulk(self, mock_connect, mock_execute_values):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.side_effect = [
+            [("bitcoin", date(2024, 1, 1), 50000.5, True), ("bitcoin", date(2024, 1, 2), 51000.0, True)],
+            [("bitcoin", 2024, 1)]
+        ]
+        self.connector.connect()
+
+        rows = [
+            {"coin_id": "bitcoin", "price_usd": 50000.5, "date": "2024-01-01", "full_response": {"id": "bitcoin"}},
+            {"coin_id": "bitcoin", "price_usd": 51000.0, "date": "2024-01-02", "full_response": {"id": "bitcoin"}}
+        ]
+        written = self.connector.insert_daily_prices_bulk(rows)
+
+        self.assertEqual(written, 2)
+        values = mock_execute_values.call_args[0][2]
+        self.assertEqual(values[0], ("bitcoin", 50000.5, "2024-01-01", '{"id": "bitcoin"}', False))
+        executed = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        self.assertEqual(len(executed), 4)
+        self.assertIn("ON COMMIT DROP", executed[0])
+        self.assertIn("pg_advisory_xact_lock", executed[1])
+        self.assertIn("ON CONFLICT (coin_id, date)", executed[2])
+        self.assertIn("INSERT INTO cryptocurrency_monthly_aggregates", executed[3])
+        # The batch is merged into its month in one statement
+        merged = mock_cursor.execute.call_args_list[3][0][1]
+        self.assertEqual(merged[:3], (["bitcoin"], [2024], [1]))
+        self.assertEqual(merged[6], [2])
+        mock_conn.commit.assert_called_once()
+
+    @patch('src.PGConnector.pgconnector.execute_values')
+    @patch('psycopg2.connect')
+    def test_insert_daily_prices_bulk_split_payload(self, mock_connect, mock_execute_values):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.side_effect = [[("bitcoin", date(2024, 1, 1), 50000.5, True)], [("bitcoin", 2024, 1)]]
+        self.connector.connect()
+        self.connector.split_payload = True
+
+        full_response = {"market_data": {"market_cap": {"usd": 1000.0}, "total_volume": {"usd": 20.0}}}
+        self.connector.insert_daily_prices_bulk(
+            [{"coin_id": "bitcoin", "price_usd": 50000.5, "date": "2024-01-01", "full_response": full_response}]
         )
+
+        statement, values = mock_execute_values.call_args[0][1:3]
+        self.assertIn("market_cap_usd, volume_usd, payload", statement)
+        self.assertEqual(values[0][:5], ("bitcoin", 50000.5, "2024-01-01", 1000.0, 20.0))
+        self.assertEqual(decompress_payload(values[0][5].adapted), full_response)
+        executed = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        self.assertEqual(len(executed), 5)
+        self.assertIn("full_response = NULL", executed[2])
+        self.assertIn("INSERT INTO cryptocurrency_raw_payloads", executed[3])
+        mock_conn.commit.assert_called_once()
+
+    @patch('src.PGConnector.pgconnector.execute_values')
+    @patch('psycopg2.connect')
+    def test_insert_daily_prices_bulk_prices_only_keeps_payloads(self, mock_connect, mock_execute_values):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.side_effect = [
+            [("bitcoin", date(2024, 1, 1), 50000.5, True)],
+            [("bitcoin", date(2024, 1, 2), 51000.0, False)],
+            [("bitcoin", 2024, 1)]
+        ]
+        self.connector.connect()
+        self.connector.split_payload = True
+
+        range_payload = {"market_data": {"current_price": {"usd": 51000.0}}}
+        self.connector.insert_daily_prices_bulk([
+            {"coin_id": "bitcoin", "price_usd": 50000.5, "date": "2024-01-01", "full_response": {"id": "bitcoin"}},
+            {"coin_id": "bitcoin", "price_usd": 51000.0, "date": "2024-01-02", "full_response": range_payload,
+             "prices_only": True}
+        ])
+
+        # Full payloads are merged first, then range payloads without touching the stored payloads
+        executed = [call[0] for call in mock_cursor.execute.call_args_list]
+        full_merge, full_archive, range_merge, range_archive = executed[2:6]
+        self.assertEqual((full_merge[1], range_merge[1]), ((False,), (True,)))
+        self.assertIn("full_response = NULL", full_merge[0])
+        self.assertNotIn("full_response", range_merge[0].split("DO UPDATE")[1])
+        self.assertIn("price_usd = EXCLUDED.price_usd", range_merge[0])
+        self.assertIn("DO UPDATE SET payload = EXCLUDED.payload", full_archive[0])
+        self.assertIn("DO NOTHING", range_archive[0])
         mock_conn.commit.assert_called_once()
 
+    @patch('psycopg2.connect')
+    def test_insert_daily_price_prices_only_keeps_payload(self, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        self.connector.connect()
+
+        self.connector.insert_daily_price("bitcoin", 50000.5, "2024-01-01", {"id": "bitcoin"}, prices_only=True)
+
+        query = mock_cursor.execute.call_args[0][0]
+        self.assertIn("SET price_usd = EXCLUDED.price_usd;", query)
+        self.assertNotIn("full_response = EXCLUDED", query)
+
+    @patch('src.PGConnector.pgconnector.execute_values')
+    @patch('psycopg2.connect')
+    def test_insert_daily_prices_bulk_recomputes_revised_months(self, mock_connect, mock_execute_values):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [("bitcoin", date(2024, 1, 1), 50000.5, False)]
+        self.connector.connect()
+
+        self.connector.insert_daily_prices_bulk(
+            [{"coin_id": "bitcoin", "price_usd": 50000.5, "date": "2024-01-01", "full_response": {}}]
+        )
+
+        # An overwritten day cannot be merged into the stored statistics of its month
+        query, params = mock_cursor.execute.call_args[0]
+        self.assertIn("JOIN cryptocurrency_daily_prices d", query)
+        self.assertEqual(params, (["bitcoin"], [2024], [1]))
+
+    @patch('src.PGConnector.pgconnector.execute_values', side_effect=Exception("connection lost"))
+    @patch('psycopg2.connect')
+    def test_insert_daily_prices_bulk_rolls_back(self, mock_connect, mock_execute_values):
+        mock_conn = MagicMock()
+        mock_connect.return_value = mock_conn
+        self.connector.connect()
+
+        written = self.connector.insert_daily_prices_bulk(
+            [{"coin_id": "bitcoin", "price_usd": 1.0, "date": "2024-01-01", "full_response": {}}]
+        )
+
+        self.assertEqual(written, 0)
+        mock_conn.rollback.assert_called_once()
+        mock_conn.commit.assert_not_called()
+
+    @patch('src.PGConnector.pgconnector.ThreadedConnectionPool')
+    def test_connect_pool(self, mock_pool_class):
+        self.connector.connect(pool_size=4)
+
+        self.assertEqual(mock_pool_class.call_args[0], (1, 4))
+        self.assertIsNone(self.connector.connection)
+        self.assertIs(self.connector.pool, mock_pool_class.return_value)
+
+    @patch('src.PGConnector.pgconnector.ThreadedConnectionPool')
+    def test_close_connection_pool_error(self, mock_pool_class):
+        mock_pool_class.return_value.closeall.side_effect = psycopg2.OperationalError("server closed")
+        self.connector.connect(pool_size=4)
+
+        with self.assertLogs(self.connector.logger, level='ERROR') as logs:
+            self.connector.close_connection()
+
+        self.assertIn("Error closing connection", logs.output[0])
+
+    @patch('src.PGConnector.pgconnector.ThreadedConnectionPool')
+    def test_borrow_connection_returns_connection_to_pool(self, mock_pool_class):
+        mock_pool = mock_pool_class.return_value
+        mock_conn = MagicMock(closed=0)
+        mock_pool.getconn.return_value = mock_conn
+        self.connector.connect(pool_size=2)
+
+        with self.connector.borrow_connection() as (connection, cursor):
+            self.assertIs(connection, mock_conn)
+
+        mock_pool.putconn.assert_called_once_with(mock_conn, close=False)
+
+    @patch('src.PGConnector.pgconnector.ThreadedConnectionPool')
+    def test_borrow_connection_replaces_dropped_connection(self, mock_pool_class):
+        mock_pool = mock_pool_class.return_value
+        dropped_conn = MagicMock(closed=2)
+        healthy_conn = MagicMock(closed=0)
+        mock_pool.getconn.side_effect = [dropped_conn, healthy_conn]
+        self.connector.connect(pool_size=2)
+
+        with self.connector.borrow_connection() as (connection, cursor):
+            self.assertIs(connection, healthy_conn)
+
+        mock_pool.putconn.assert_any_call(dropped_conn, close=True)
+        mock_pool.putconn.assert_any_call(healthy_conn, close=False)
+
+    @patch('src.PGConnector.pgconnector.ThreadedConnectionPool')
+    def test_borrow_connection_discards_connection_lost_mid_transaction(self, mock_pool_class):
+        mock_pool = mock_pool_class.return_value
+        mock_conn = MagicMock(closed=0)
+        mock_pool.getconn.return_value = mock_conn
+        self.connector.connect(pool_size=2)
+
+        with self.assertRaises(psycopg2.OperationalError):
+            with self.connector.borrow_connection() as (connection, cursor):
+                raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+        mock_pool.putconn.assert_called_once_with(mock_conn, close=True)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,112 @@
+#External imports:
+import pytest
+from unittest.mock import patch
+
+#Internal imports:
+from src.CoinGekoRetriever.rate_limiter import RateLimiter
+from src.CoinGekoRetriever.shared_rate_limiter import SharedRateLimiter
+
+
+@pytest.fixture
+def clock():
+    """Fixture with a controllable monotonic clock"""
+    now = [1000.0]
+    with patch('time.monotonic', side_effect=lambda: now[0]):
+        yield now
+
+
+class TestRateLimiter:
+    """Test suite for RateLimiter"""
+
+    def test_reserve_spaces_requests(self, clock):
+        """Test that reservations beyond the burst are spaced by the budget"""
+        limiter = RateLimiter(requests_per_minute=60, burst=1)
+
+        assert limiter.reserve() == 0
+        assert limiter.reserve() == pytest.approx(1.0)
+        assert limiter.reserve() == pytest.approx(2.0)
+
+    def test_tokens_refill_over_time(self, clock):
+        """Test that waiting refills the bucket"""
+        limiter = RateLimiter(requests_per_minute=60, burst=1)
+        limiter.reserve()
+
+        clock[0] += 1.0
+        assert limiter.reserve() == 0
+
+    def test_rate_limited_honors_retry_after(self, clock):
+        """Test that a 429 pauses every caller for Retry-After seconds"""
+        limiter = RateLimiter(requests_per_minute=600, burst=10)
+        limiter.on_rate_limited(retry_after=5)
+
+        assert limiter.reserve() >= 5
+
+    def test_rate_limited_shrinks_budget_once_per_cooldown(self, clock):
+        """Test that a burst of 429s halves the budget only once"""
+        limiter = RateLimiter(requests_per_minute=60)
+        limiter.on_rate_limited(retry_after=2)
+        limiter.on_rate_limited(retry_after=2)
+
+        assert limiter.requests_per_minute == pytest.approx(30)
+        assert limiter.get_stats()['throttled'] == 2
+
+        clock[0] += 3
+        limiter.on_rate_limited(retry_after=2)
+        assert limiter.requests_per_minute == pytest.approx(15)
+
+    def test_budget_never_below_minimum(self, clock):
+        """Test that the budget stops shrinking at the configured floor"""
+        limiter = RateLimiter(requests_per_minute=4, min_requests_per_minute=2)
+        for _ in range(5):
+            limiter.on_rate_limited(retry_after=0)
+            clock[0] += 100
+
+        assert limiter.requests_per_minute == pytest.approx(2)
+
+    def test_budget_recovers_after_successes(self, clock):
+        """Test that the budget grows back after enough successful requests"""
+        limiter = RateLimiter(requests_per_minute=60, recovery_successes=3)
+        limiter.on_rate_limited(retry_after=0)
+
+        for _ in range(3):
+            limiter.on_success()
+
+        assert limiter.requests_per_minute == pytest.approx(36)
+
+    def test_backoff_is_exponential_with_jitter(self):
+        """Test that backoff grows with the attempt and respects Retry-After"""
+        limiter = RateLimiter(base_backoff=1.0, max_backoff=8.0)
+
+        assert 0.5 <= limiter.backoff(0) <= 1.0
+        assert 2.0 <= limiter.backoff(2) <= 4.0
+        assert 4.0 <= limiter.backoff(10) <= 8.0
+        assert limiter.backoff(0, retry_after=30) == 30
+
+
+class TestSharedRateLimiter:
+    """Test suite for SharedRateLimiter"""
+
+    def test_limiters_share_one_budget(self, tmp_path):
+        """Test that two limiters on the same state file spend the same tokens"""
+        state_file = str(tmp_path / "rate_limit.json")
+        now = [1000.0]
+        with patch('time.time', side_effect=lambda: now[0]):
+            first = SharedRateLimiter(state_file, requests_per_minute=60, burst=2)
+            second = SharedRateLimiter(state_file, requests_per_minute=60, burst=2)
+
+            assert first.reserve() == 0
+            assert second.reserve() == 0
+            # The burst is spent, so the next request waits for one token of the shared bucket
+            assert first.reserve() == pytest.approx(1.0)
+
+    def test_rate_limited_pauses_every_limiter(self, tmp_path):
+        """Test that a 429 seen by one process pauses the others"""
+        state_file = str(tmp_path / "rate_limit.json")
+        now = [1000.0]
+        with patch('time.time', side_effect=lambda: now[0]):
+            first = SharedRateLimiter(state_file, requests_per_minute=60)
+            second = SharedRateLimiter(state_file, requests_per_minute=60)
+
+            first.on_rate_limited(retry_after=10)
+
+            assert second.reserve() >= 10
@@ -0,0 +1,94 @@
+#External imports:
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import train_test_split
+
+#Internal imports:
+from src.FeatureEngineering.time_series_features import create_time_series_features
+from src.Forecasting.regression import train_and_predict, solve_grouped_least_squares, split_test_positions
+from benchmarks.task4_reference import load_notebook_functions, synthetic_coin_data
+
+
+def assert_metrics_equal(result, expected, rtol=1e-6):
+    assert list(result) == list(expected)
+    for coin, metrics in expected.items():
+        assert list(result[coin]) == list(metrics)
+        for name, value in metrics.items():
+            if name == 'feature_coefficients':
+                assert list(result[coin][name]) == list(value)
+                np.testing.assert_allclose(list(result[coin][name].values()), list(value.values()), rtol=1e-5, atol=1e-6)
+            else:
+                np.testing.assert_allclose(result[coin][name], value, rtol=rtol, atol=1e-9, err_msg=f"{coin} {name}")
+
+
+class TestRegression:
+    """Test suite for the batched per-coin regression"""
+
+    @pytest.mark.parametrize('volume', [True, False])
+    def test_train_and_predict_matches_notebook(self, volume):
+        """Test that the predictions and metrics are those of the notebook's per-coin LinearRegression loop"""
+        features = create_time_series_features(synthetic_coin_data(coins=4, days=120, volume=volume, seed=1))
+        notebook_function, = load_notebook_functions('train_and_predict')
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            expected, expected_metrics = notebook_function(features)
+        result, metrics = train_and_predict(features)
+
+        pd.testing.assert_frame_equal(result, expected, rtol=1e-6)
+        assert_metrics_equal(metrics, expected_metrics)
+
+    def test_coins_in_order_of_appearance(self):
+        """Test that coins keep the order of the input frame, each with its rows in frame order"""
+        features = create_time_series_features(synthetic_coin_data(coins=3, days=40, seed=2))
+        features = features.sample(frac=1.0, random_state=0)
+
+        result, metrics = train_and_predict(features)
+
+        assert list(metrics) == list(features['coin'].unique())
+        assert list(result['coin'].unique()) == list(features['coin'].unique())
+        expected_index = features.dropna().index
+        for coin in metrics:
+            assert list(result.index[result['coin'] == coin]) == list(expected_index[features.loc[expected_index, 'coin'] == coin])
+
+    def test_split_test_positions(self):
+        """Test that every coin gets the test rows train_test_split would give it"""
+        _, expected = train_test_split(np.arange(50), test_size=0.2, random_state=7)
+
+        assert split_test_positions(50, 0.2, 7).tolist() == sorted(expected)
+
+    def test_grouped_least_squares_matches_linear_regression(self):
+        """Test the batched solver against one LinearRegression per group, rank-deficient groups included"""
+        rng = np.random.default_rng(0)
+        counts = [30, 5, 80, 12]
+        X = rng.normal(size=(sum(counts), 4))
+        y = rng.normal(size=sum(counts))
+        group_ids = np.repeat(np.arange(len(counts)), counts)
+        # Constant and duplicated columns in the second group
+        X[group_ids == 1, 2] = 3.0
+        X[group_ids == 1, 3] = X[group_ids == 1, 0]
+        shuffle = rng.permutation(len(y))
+
+        coef, intercept = solve_grouped_least_squares(X[shuffle], y[shuffle], group_ids[shuffle], max_chunk_values=200)
+
+        for group in range(len(counts)):
+            model = LinearRegression().fit(X[group_ids == group], y[group_ids == group])
+            np.testing.assert_allclose(coef[group], model.coef_, rtol=1e-8, atol=1e-10)
+            assert intercept[group] == pytest.approx(model.intercept_, rel=1e-8)
+
+    def test_grouped_least_squares_in_processes(self):
+        """Test that chunks solved in a process pool give the same coefficients"""
+        rng = np.random.default_rng(1)
+        group_ids = rng.integers(0, 6, size=300)
+        X = rng.normal(size=(300, 3))
+        y = X @ [1.0, -2.0, 0.5] + group_ids
+
+        coef, intercept = solve_grouped_least_squares(X, y, group_ids, groups=7, max_chunk_values=400, processes=2)
+
+        np.testing.assert_allclose(coef[:6], np.tile([1.0, -2.0, 0.5], (6, 1)), atol=1e-10)
+        np.testing.assert_allclose(intercept[:6], np.arange(6), atol=1e-10)
+        # A group without rows has no model
+        assert np.isnan(coef[6]).all() and np.isnan(intercept[6])
@@ -0,0 +1,78 @@
+#External imports:
+import pytest
+from unittest.mock import patch
+from freezegun import freeze_time
+
+#Internal imports:
+from src.CoinGekoRetriever.response_cache import ResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Fixture to create a cache in a temporary directory"""
+    return ResponseCache(str(tmp_path / "cache"), max_bytes=10_000, recent_ttl=60)
+
+
+class TestResponseCache:
+    """Test suite for ResponseCache"""
+
+    def test_make_key_ignores_param_order(self):
+        """Test that the key depends on the request content only"""
+        assert ResponseCache.make_key('coins/bitcoin/history', {'a': 1, 'b': 2}) == \
+            ResponseCache.make_key('coins/bitcoin/history', {'b': 2, 'a': 1})
+        assert ResponseCache.make_key('coins/bitcoin/history', {'date': '01-01-2024'}) != \
+            ResponseCache.make_key('coins/bitcoin/history', {'date': '02-01-2024'})
+
+    def test_get_set_counts_hits_and_misses(self, cache):
+        """Test that stored responses are served back and counted"""
+        key = cache.make_key('ping')
+        assert cache.get(key) is None
+
+        cache.set(key, {"geko_says": "(V3) To the Moon!"})
+
+        assert cache.get(key) == {"geko_says": "(V3) To the Moon!"}
+        stats = cache.get_stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['entries'] == 1
+
+    def test_entries_expire_after_ttl(self, cache):
+        """Test that an entry with a TTL is dropped once it expires"""
+        key = cache.make_key('coins/bitcoin/history', {'date': '15-01-2024'})
+        with patch('time.time', return_value=1000.0):
+            cache.set(key, {"id": "bitcoin"}, ttl=60)
+        with patch('time.time', return_value=1059.0):
+            assert cache.get(key) == {"id": "bitcoin"}
+        with patch('time.time', return_value=1061.0):
+            assert cache.get(key) is None
+        assert cache.get_stats()['entries'] == 0
+
+    @freeze_time("2024-01-15")
+    def test_ttl_for_past_and_recent_dates(self, cache):
+        """Test that past dates never expire and today's date does"""
+        assert cache.ttl_for('2024-01-14') is None
+        assert cache.ttl_for('2024-01-15') == 60
+
+    def test_lru_eviction(self, tmp_path):
+        """Test that the least recently used entries are evicted first"""
+        cache = ResponseCache(str(tmp_path / "cache"), max_bytes=250)
+        payload = {"data": "x" * 60}
+        keys = [cache.make_key('coins', {'n': n}) for n in range(3)]
+
+        cache.set(keys[0], payload)
+        cache.set(keys[1], payload)
+        cache.get(keys[0])
+        cache.set(keys[2], payload)
+
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) == payload
+        assert cache.get_stats()['evictions'] == 1
+
+    def test_index_survives_restart(self, tmp_path):
+        """Test that a new cache instance finds the entries written by a previous run"""
+        first = ResponseCache(str(tmp_path / "cache"))
+        key = first.make_key('ping')
+        first.set(key, {"ok": True})
+
+        second = ResponseCache(str(tmp_path / "cache"))
+        assert second.get(key) == {"ok": True}
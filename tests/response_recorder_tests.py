@@ -0,0 +1,198 @@
+#External imports:
+import gzip
+import json
+import time
+import pytest
+import requests
+
+#Internal imports:
+from benchmarks.fake_coingecko import FakeCoinGecko, coin_price
+from src.CoinGekoRetriever.coin_geko_retriever import CoinGekoRetriever
+from src.CoinGekoRetriever.rate_limiter import RateLimiter
+from src.CoinGekoRetriever.response_recorder import ResponseRecorder, ResponseReplayer
+
+
+def record(path, fake, coins, date='2024-01-15'):
+    """Fetch a day of the coins from the stand-in while recording the responses"""
+    client = CoinGekoRetriever(pool_size=2, recorder=ResponseRecorder(str(path)),
+                               rate_limiter=RateLimiter(requests_per_minute=600000, base_backoff=0.01))
+    client.BASE_URL = fake.url
+    try:
+        assert client.check_geko_api_status()
+        return [client.fetch_coin_data(coin, date) for coin in coins]
+    finally:
+        client.close()
+
+
+@pytest.fixture
+def api_key(monkeypatch):
+    monkeypatch.setenv('GEKO_API_KEY', 'secret_key_123')
+
+
+class TestResponseRecorder:
+    """Test suite for recording and replaying the API responses"""
+
+    def test_replay_serves_recorded_data_offline(self, tmp_path, api_key, monkeypatch):
+        """Test that a replay without network nor API key returns what was recorded"""
+        path = tmp_path / "recording.jsonl.gz"
+        with FakeCoinGecko(payload_bytes=3000) as fake:
+            recorded = record(path, fake, ['bitcoin', 'ethereum'])
+        monkeypatch.delenv('GEKO_API_KEY')
+
+        # The stand-in is stopped, the client keeps the real API URL
+        client = CoinGekoRetriever(replayer=ResponseReplayer(str(path)))
+        replayed = [client.fetch_coin_data(coin, '2024-01-15') for coin in ['bitcoin', 'ethereum']]
+        client.close()
+
+        assert replayed == recorded
+        assert replayed[0][0]['market_data']['current_price']['usd'] == coin_price('bitcoin', '15-01-2024')
+        assert client.replayer.get_stats() == {'served': 2, 'missing': 0}
+
+    def test_archive_format_and_no_api_key(self, tmp_path, api_key):
+        """Test that the archive holds a header and one line per response, never the API key"""
+        path = tmp_path / "recording.jsonl.gz"
+        with FakeCoinGecko(payload_bytes=3000) as fake:
+            record(path, fake, ['bitcoin'])
+
+        with gzip.open(path, 'rt') as f:
+            text = f.read()
+        header, *entries = [json.loads(line) for line in text.splitlines()]
+
+        assert 'secret_key_123' not in text
+        assert header['format'] == 'coingecko-recording'
+        assert [entry['path'] for entry in entries] == ['/api/v3/ping', '/api/v3/coins/bitcoin/history']
+        assert entries[1]['params'] == {'date': '15-01-2024'}
+        assert entries[1]['status'] == 200 and entries[1]['elapsed'] > 0
+        assert path.stat().st_size < len(entries[1]['body'])
+
+    def test_rate_limited_responses_are_replayed_in_order(self, tmp_path, api_key):
+        """Test that a recorded 429 is replayed before the response of its retry"""
+        path = tmp_path / "recording.jsonl.gz"
+        with FakeCoinGecko(rate_limit_fraction=0.5, retry_after=5, seed=3) as fake:
+            client = CoinGekoRetriever(recorder=ResponseRecorder(str(path)), max_retries=10,
+                                       rate_limiter=RateLimiter(requests_per_minute=600000, base_backoff=0.0))
+            client.BASE_URL = fake.url
+            client._parse_retry_after = lambda response: None
+            recorded = [client.fetch_coin_data('bitcoin', f"2024-01-{day:02d}") for day in range(1, 9)]
+            client.close()
+            throttled = fake.get_stats()['rate_limited']
+        assert throttled > 0
+
+        replayer = ResponseReplayer(str(path))
+        client = CoinGekoRetriever(replayer=replayer, max_retries=10)
+        start = time.perf_counter()
+        replayed = [client.fetch_coin_data('bitcoin', f"2024-01-{day:02d}") for day in range(1, 9)]
+
+        assert replayed == recorded
+        assert client.rate_limiter.get_stats()['throttled'] == throttled
+        # speed 0 ignores the recorded Retry-After of 5 seconds
+        assert time.perf_counter() - start < 2
+
+    def test_unrecorded_requests(self, tmp_path, api_key):
+        """Test that ping always succeeds and other unrecorded requests fail with a 404"""
+        path = tmp_path / "recording.jsonl.gz"
+        ResponseRecorder(str(path)).close()
+
+        client = CoinGekoRetriever(replayer=ResponseReplayer(str(path)), max_retries=0)
+
+        assert client.check_geko_api_status()
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.fetch_coin_data('bitcoin', '2024-01-15')
+        assert client.replayer.get_stats() == {'served': 0, 'missing': 1}
+
+    def test_replay_speed(self, tmp_path, api_key):
+        """Test that a replay waits the recorded latency divided by the speed"""
+        path = tmp_path / "recording.jsonl.gz"
+        with FakeCoinGecko(latency=0.2, compress=False) as fake:
+            record(path, fake, ['bitcoin'])
+
+        timings = {}
+        for speed in (0, 1, 4):
+            replayer = ResponseReplayer(str(path), speed=speed)
+            client = CoinGekoRetriever(replayer=replayer)
+            start = time.perf_counter()
+            client.fetch_coin_data('bitcoin', '2024-01-15')
+            timings[speed] = time.perf_counter() - start
+
+        assert timings[0] < 0.1
+        assert 0.2 <= timings[1] < 0.4
+        assert 0.05 <= timings[4] < 0.15
+
+    def test_truncated_archive(self, tmp_path, api_key):
+        """Test that a recording interrupted mid-write is replayed up to its last whole response"""
+        path = tmp_path / "recording.jsonl.gz"
+        with FakeCoinGecko() as fake:
+            record(path, fake, ['bitcoin', 'ethereum'])
+        with gzip.open(path, 'rb') as f:
+            content = f.read()
+        with gzip.open(path, 'wb') as f:
+            f.write(content[:-20])
+
+        replayer = ResponseReplayer(str(path))
+
+        assert sum(len(entries) for entries in replayer.responses.values()) == 2
+
+    def test_recording_again_appends(self, tmp_path, api_key):
+        """Test that recording to an existing archive, e.g. when resuming a run, keeps its responses"""
+        path = tmp_path / "recording.jsonl.gz"
+        with FakeCoinGecko() as fake:
+            record(path, fake, ['bitcoin'])
+            record(path, fake, ['ethereum'])
+
+        with gzip.open(path, 'rt') as f:
+            lines = [json.loads(line) for line in f]
+        replayer = ResponseReplayer(str(path))
+
+        assert [line.get('format') for line in lines].count('coingecko-recording') == 1
+        assert {'bitcoin', 'ethereum'} <= {entry['path'].split('/')[-2] for entry in lines[1:]}
+        assert sum(len(entries) for entries in replayer.responses.values()) == 4
+
+    def test_recording_again_after_interruption(self, tmp_path, api_key):
+        """Test that a recording interrupted mid-write is extended from its last whole response"""
+        path = tmp_path / "recording.jsonl.gz"
+        with FakeCoinGecko() as fake:
+            record(path, fake, ['bitcoin', 'ethereum'])
+            with open(path, 'rb') as f:
+                content = f.read()
+            # Cut in the middle of the gzip stream, as a killed process would leave it
+            with open(path, 'wb') as f:
+                f.write(content[:len(content) // 2])
+            record(path, fake, ['solana'])
+
+        replayer = ResponseReplayer(str(path))
+        client = CoinGekoRetriever(replayer=replayer, max_retries=0)
+
+        assert client.fetch_coin_data('solana', '2024-01-15')[0]['id'] == 'solana'
+
+    def test_recording_over_another_file(self, tmp_path):
+        """Test that a file which is not a recording is left untouched"""
+        path = tmp_path / "recording.jsonl.gz"
+        with gzip.open(path, 'wt') as f:
+            f.write('{"coin_id": "bitcoin"}\n')
+
+        with pytest.raises(ValueError):
+            ResponseRecorder(str(path))
+        with gzip.open(path, 'rt') as f:
+            assert f.read() == '{"coin_id": "bitcoin"}\n'
+        assert [file.name for file in tmp_path.iterdir()] == ['recording.jsonl.gz']
+
+    def test_recording_over_a_file_that_is_not_gzip(self, tmp_path):
+        """Test that a plain file is not mistaken for an interrupted recording and overwritten"""
+        path = tmp_path / "recording.jsonl.gz"
+        path.write_text('important data\n')
+
+        with pytest.raises(ValueError):
+            ResponseRecorder(str(path))
+        assert path.read_text() == 'important data\n'
+        assert [file.name for file in tmp_path.iterdir()] == ['recording.jsonl.gz']
+
+    def test_recording_over_a_header_cut_off(self, tmp_path):
+        """Test that a recording interrupted while writing its header is started over"""
+        path = tmp_path / "recording.jsonl.gz"
+        header = gzip.compress(b'{"format": "coingecko-recording", "version": 1, "created_at": "2024-01-15T')
+        path.write_bytes(header[:len(header) - 12])
+
+        ResponseRecorder(str(path)).close()
+
+        with gzip.open(path, 'rt') as f:
+            assert [json.loads(line)['format'] for line in f] == ['coingecko-recording']
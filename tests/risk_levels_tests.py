@@ -0,0 +1,57 @@
+#External imports:
+import numpy as np
+import pandas as pd
+
+#Internal imports:
+from src.FeatureEngineering.risk_levels import classify_risk_levels
+from benchmarks.task4_reference import load_notebook_functions, synthetic_coin_data
+
+
+def prices_frame(prices, start_date='2024-01-01', coin='bitcoin'):
+    return pd.DataFrame({
+        'coin': coin,
+        'date': pd.date_range(start_date, periods=len(prices), freq='D').strftime('%Y-%m-%d'),
+        'price': prices
+    })
+
+
+class TestRiskLevels:
+    """Test suite for the vectorized risk classification"""
+
+    def test_classify_risk_levels_matches_notebook(self):
+        """Test that every (coin, month) gets the level of the notebook's groupby().apply()"""
+        coin_data = synthetic_coin_data(coins=5, days=200, crash_rate=0.03, seed=3)
+        calculate_risk_level, = load_notebook_functions('calculate_risk_level')
+        frame = coin_data.copy()
+        frame['date'] = pd.to_datetime(frame['date'])
+        frame = frame.sort_values(['coin', 'date'])
+        expected = frame.groupby(['coin', frame['date'].dt.to_period('M').rename('year_month')])[['price']] \
+            .apply(calculate_risk_level).rename('risk_level').reset_index()
+
+        result = classify_risk_levels(coin_data)
+
+        pd.testing.assert_frame_equal(result, expected)
+        assert set(result['risk_level']) == {'High Risk', 'Medium Risk', 'Low Risk'}
+
+    def test_drops_must_be_consecutive_and_in_the_month(self):
+        """Test that separate drops, and drops across two months, do not raise the level"""
+        separate = prices_frame([100.0, 40.0, 45.0, 20.0, 22.0])
+        across_months = prices_frame([100.0, 40.0, 16.0, 17.0], start_date='2024-01-30')
+
+        assert classify_risk_levels(separate)['risk_level'].tolist() == ['Low Risk']
+        assert classify_risk_levels(across_months)['risk_level'].tolist() == ['Low Risk', 'Low Risk']
+
+    def test_thresholds_are_configurable(self):
+        """Test the levels with custom drop thresholds"""
+        coin_data = prices_frame([100.0, 85.0, 72.0, 75.0])
+
+        assert classify_risk_levels(coin_data)['risk_level'].tolist() == ['Low Risk']
+        assert classify_risk_levels(coin_data, medium_drop=0.1)['risk_level'].tolist() == ['Medium Risk']
+        assert classify_risk_levels(coin_data, high_drop=0.1, medium_drop=0.05)['risk_level'].tolist() == ['High Risk']
+
+    def test_missing_prices_are_padded(self):
+        """Test that a missing price is padded with the previous one, as pct_change does"""
+        coin_data = prices_frame([100.0, 40.0, np.nan, 16.0])
+
+        assert classify_risk_levels(coin_data)['risk_level'].tolist() == ['Low Risk']
+        assert classify_risk_levels(prices_frame([100.0, 40.0, 16.0, np.nan]))['risk_level'].tolist() == ['High Risk']
@@ -0,0 +1,35 @@
+#External imports:
+import pytest
+from datetime import datetime
+
+#Internal imports:
+from src.IngestionPipeline.sharding import shard_of, shard_coin_dates
+
+
+class TestSharding:
+    """Test suite for the coin-day sharding"""
+
+    def test_shard_of_is_stable_within_a_month(self):
+        """Test that every day of a (coin, month) goes to the same shard"""
+        shards = {shard_of("bitcoin", f"2024-01-{day:02d}", 4) for day in range(1, 32)}
+
+        assert len(shards) == 1
+        assert shard_of("bitcoin", datetime(2024, 1, 15), 4) in shards
+
+    def test_shards_partition_the_coin_days(self):
+        """Test that every coin-day belongs to exactly one shard"""
+        coin_dates = {
+            coin_id: [f"{year}-{month:02d}-01" for year in (2023, 2024) for month in range(1, 13)]
+            for coin_id in ("bitcoin", "ethereum", "cardano")
+        }
+
+        parts = [shard_coin_dates(coin_dates, 3, shard_index) for shard_index in range(3)]
+
+        for coin_id, dates in coin_dates.items():
+            assert sorted(date for part in parts for date in part[coin_id]) == dates
+        assert all(any(part.values()) for part in parts)
+
+    def test_bad_shard_index(self):
+        """Test that a shard index outside the shards is rejected"""
+        with pytest.raises(ValueError):
+            shard_coin_dates({"bitcoin": ["2024-01-01"]}, 2, 2)
@@ -0,0 +1,117 @@
+#External imports:
+import json
+from unittest.mock import Mock
+
+#Internal imports:
+from src.IngestionPipeline.sinks import FileSink, PostgresSink, ColumnarSink, SinkPipeline
+
+
+def make_row(raw_response=None):
+    return {
+        'coin_id': 'bitcoin',
+        'date': '2024-01-15',
+        'price_usd': 42800.23,
+        'full_response': {'id': 'bitcoin'},
+        'raw_response': raw_response
+    }
+
+
+class TestSinks:
+    """Test suite for the storage sinks"""
+
+    def test_file_sink_writes_body_as_received(self, tmp_path):
+        """Test that the response body is written without being serialized again"""
+        sink = FileSink(str(tmp_path / "coin_data"))
+
+        sink.write([make_row(b'{"id":"bitcoin"}')])
+
+        assert (tmp_path / "coin_data" / "bitcoin_2024-01-15.json").read_bytes() == b'{"id":"bitcoin"}'
+
+    def test_file_sink_serializes_rows_without_body(self, tmp_path):
+        """Test that cached or range payloads are still written as JSON"""
+        sink = FileSink(str(tmp_path / "coin_data"))
+
+        sink.write([make_row()])
+
+        with open(sink.path_for('bitcoin', '2024-01-15')) as f:
+            assert json.load(f) == {'id': 'bitcoin'}
+
+    def test_file_sink_keeps_files_over_range_payloads(self, tmp_path):
+        """Test that a range payload never replaces the file of a coin-day already written"""
+        sink = FileSink(str(tmp_path / "coin_data"))
+        sink.write([make_row(b'{"id":"bitcoin","full":true}')])
+
+        written = sink.write([dict(make_row(), prices_only=True),
+                              dict(make_row(), date='2024-01-16', prices_only=True)])
+
+        assert written == 2
+        assert (tmp_path / "coin_data" / "bitcoin_2024-01-15.json").read_bytes() == b'{"id":"bitcoin","full":true}'
+        with open(sink.path_for('bitcoin', '2024-01-16')) as f:
+            assert json.load(f) == {'id': 'bitcoin'}
+
+    def test_postgres_sink_batched(self):
+        """Test that a batched sink writes the rows in one call"""
+        pg_connector = Mock()
+        pg_connector.insert_daily_prices_bulk.return_value = 2
+
+        assert PostgresSink(pg_connector).write([make_row(), make_row()]) == 2
+        pg_connector.insert_daily_price.assert_not_called()
+
+    def test_postgres_sink_row_by_row(self):
+        """Test that an unbatched sink inserts each row and updates its aggregates"""
+        pg_connector = Mock()
+
+        PostgresSink(pg_connector, batched=False).write([make_row(b'{}')])
+
+        pg_connector.insert_daily_price.assert_called_once_with(
+            coin_id='bitcoin', price_usd=42800.23, date='2024-01-15',
+            full_response={'id': 'bitcoin'}, raw_response=b'{}', prices_only=False
+        )
+        pg_connector.update_monthly_aggregates.assert_called_once_with(
+            coin_id='bitcoin', date='2024-01-15', price_usd=42800.23
+        )
+
+    def test_postgres_sink_row_by_row_counts_failed_inserts(self):
+        """Test that a row the connector could not insert is not counted nor aggregated"""
+        pg_connector = Mock()
+        pg_connector.insert_daily_price.return_value = False
+
+        assert PostgresSink(pg_connector, batched=False).write([make_row()]) == 0
+        pg_connector.update_monthly_aggregates.assert_not_called()
+
+    def test_postgres_sink_updates_features(self):
+        """Test that the features of a batch are updated once its prices are stored"""
+        pg_connector = Mock()
+        pg_connector.insert_daily_prices_bulk.return_value = 1
+        feature_store = Mock()
+
+        PostgresSink(pg_connector, feature_store=feature_store).write([make_row()])
+
+        feature_store.update.assert_called_once_with([('bitcoin', '2024-01-15')])
+
+    def test_postgres_sink_skips_features_of_failed_batch(self):
+        """Test that a rolled back batch does not update the features"""
+        pg_connector = Mock()
+        pg_connector.insert_daily_prices_bulk.return_value = 0
+        feature_store = Mock()
+
+        PostgresSink(pg_connector, feature_store=feature_store).write([make_row()])
+
+        feature_store.update.assert_not_called()
+
+    def test_pipeline_isolates_failing_sink(self):
+        """Test that a failing sink does not stop the others"""
+        store = Mock()
+        store.append.side_effect = IOError("disk full")
+        pg_connector = Mock()
+        pg_connector.insert_daily_prices_bulk.return_value = 1
+        pipeline = SinkPipeline([PostgresSink(pg_connector), ColumnarSink(store)])
+
+        counts = pipeline.write([make_row()])
+        pipeline.close()
+
+        assert counts == {'postgres': 1, 'parquet': 0}
+
+    def test_empty_pipeline(self):
+        """Test that a pipeline without sinks accepts writes"""
+        assert SinkPipeline([]).write([make_row()]) == {}
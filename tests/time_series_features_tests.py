@@ -0,0 +1,68 @@
+#External imports:
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import skew
+
+#Internal imports:
+from src.FeatureEngineering.time_series_features import (
+    create_time_series_features, add_features, window_stats, lag_matrix, group_positions, holiday_flags
+)
+from benchmarks.task4_reference import load_notebook_functions, synthetic_coin_data
+
+
+class TestTimeSeriesFeatures:
+    """Test suite for the feature engineering library extracted from the Task 4 notebook"""
+
+    def test_create_time_series_features_matches_notebook(self):
+        """Test that the library builds the same frame as the notebook"""
+        coin_data = synthetic_coin_data(coins=3, days=120, crash_rate=0.0, seed=1)
+        notebook_function, = load_notebook_functions('create_time_series_features')
+
+        expected = notebook_function(coin_data.copy())
+        result = create_time_series_features(coin_data)
+
+        pd.testing.assert_frame_equal(result, expected, rtol=1e-6)
+
+    def test_create_time_series_features_without_volume(self):
+        """Test the frame built from prices only"""
+        coin_data = synthetic_coin_data(coins=2, days=30, volume=False, crash_rate=0.0, seed=1)
+        notebook_function, = load_notebook_functions('create_time_series_features')
+
+        expected = notebook_function(coin_data.copy())
+        result = create_time_series_features(coin_data)
+
+        pd.testing.assert_frame_equal(result, expected, rtol=1e-6)
+        assert 'volume_7d_mean' not in result.columns
+        # The input frame is left as is
+        assert coin_data['date'].dtype == object
+
+    def test_add_features_matches_notebook(self):
+        """Test that the risk levels, variances and trends are the same as in the notebook"""
+        coin_data = synthetic_coin_data(coins=4, days=150, crash_rate=0.03, seed=2)
+        notebook_function, = load_notebook_functions('add_features')
+
+        expected = notebook_function(coin_data.copy())
+        result = add_features(coin_data)
+
+        pd.testing.assert_frame_equal(result, expected, rtol=1e-6)
+        assert set(result['risk_level']) == {'High Risk', 'Medium Risk', 'Low Risk'}
+
+    def test_window_stats_are_exact_after_large_swings(self):
+        """Test that each window is computed on its own, unaffected by the prices before it"""
+        prices = np.array([50000.0, 49000.0, 0.01, 2.6013, 2.6640, 2.6215, 2.7527, 2.7831, 2.6746, 2.5636])
+        positions, _ = group_positions(np.array(['bitcoin'] * len(prices), dtype=object))
+
+        _, std, skewness, _ = window_stats(lag_matrix(prices, positions, 6))
+
+        window = prices[-7:]
+        assert std[-1] == pytest.approx(np.std(window, ddof=1), rel=1e-12)
+        assert skewness[-1] == pytest.approx(skew(window, bias=False), rel=1e-9)
+        assert np.isnan(std[0]) and np.isnan(skewness[1])
+
+    def test_holiday_flags(self):
+        """Test the holidays looked up in the precomputed calendars"""
+        dates = pd.to_datetime(['2024-07-04', '2024-10-01', '2024-10-15']).to_numpy()
+
+        assert holiday_flags(dates, 'US').tolist() == [1, 0, 0]
+        assert holiday_flags(dates, 'CN').tolist() == [0, 1, 0]